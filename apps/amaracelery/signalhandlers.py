@@ -0,0 +1,44 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+"""amaracelery.signalhandlers -- Track metrics for celery tasks."""
+
+import logging
+
+from celery.signals import task_prerun, task_postrun
+
+from utils import metrics
+
+logger = logging.getLogger('task_metrics')
+
+metrics.install()
+
+@task_prerun.connect
+def on_task_prerun(sender, task_id, task, **kwargs):
+    if not task.request.is_eager:
+        # Running in a worker, make sure we start fresh for each task
+        metrics.reset()
+    metrics.start()
+
+@task_postrun.connect
+def on_task_postrun(sender, task_id, task, **kwargs):
+    data = metrics.stop()
+    metrics.aggregator.add('task:{}'.format(task.name), data)
+    logger.info(u'{} ({:.3f}s)'.format(task.name, data.get('time', 0)),
+                extra={'task': task.name, 'metrics': data})
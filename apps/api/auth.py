@@ -16,7 +16,9 @@
 # with this program.  If not, see http://www.gnu.org/licenses/agpl-3.0.html.
 
 from __future__ import absolute_import
+import hashlib
 
+from django.core.cache import cache
 from rest_framework import authentication
 from rest_framework import exceptions
 # Need to use tastypie's ApiKey, since that's what the apiv2 app uses.  Once
@@ -26,6 +28,19 @@ from tastypie.models import ApiKey
 
 from auth.models import CustomUser as User
 
+# How long to remember verified credentials for.  Regenerating the API key or
+# saving the user invalidates the user's cache group, which also invalidates
+# the credentials, so this only needs to limit how long we trust the cache if
+# something else changes the DB.
+CREDENTIALS_CACHE_TIMEOUT = 5 * 60
+
+def _credentials_cache_key(username, api_key):
+    # Hash the credentials so that API keys are never stored in the cache
+    data = '\0'.join((username, api_key or ''))
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return 'api-auth:{}'.format(hashlib.sha1(data).hexdigest())
+
 class TokenAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
         username = request.META.get('HTTP_X_API_USERNAME')
@@ -37,6 +52,14 @@ class TokenAuthentication(authentication.BaseAuthentication):
         if not username:
             return None
 
+        cache_key = _credentials_cache_key(username, api_key)
+        user = self.get_cached_user(cache_key)
+        if user is None:
+            user = self.check_credentials(username, api_key)
+            self.cache_credentials(cache_key, user)
+        return (user, None)
+
+    def check_credentials(self, username, api_key):
         try:
             user = User.objects.get(username=username)
         except User.DoesNotExist:
@@ -48,4 +71,30 @@ class TokenAuthentication(authentication.BaseAuthentication):
         if not ApiKey.objects.filter(user=user, key=api_key).exists():
             raise exceptions.AuthenticationFailed('Invalid API Key')
 
-        return (user, None)
+        return user
+
+    def get_cached_user(self, cache_key):
+        """Get the user for credentials that we've already verified
+
+        We store the user id in the cache, then store a flag in the user's
+        cache group to mark the credentials as valid.  This way we can
+        invalidate the credentials by invalidating the cache group.
+
+        Returns:
+            User fetched with User.cache.get_instance() or None if the
+            credentials aren't in the cache
+        """
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            return None
+        try:
+            user = User.cache.get_instance(user_id)
+        except User.DoesNotExist:
+            return None
+        if not user.cache.get(cache_key) or not user.is_active:
+            return None
+        return user
+
+    def cache_credentials(self, cache_key, user):
+        cache.set(cache_key, user.id, CREDENTIALS_CACHE_TIMEOUT)
+        user.cache.set(cache_key, True, CREDENTIALS_CACHE_TIMEOUT)
@@ -21,6 +21,7 @@ from django.test import TestCase
 from django.http import HttpRequest
 from nose.tools import *
 from rest_framework.exceptions import AuthenticationFailed
+from tastypie.models import ApiKey
 
 from api.auth import TokenAuthentication
 from utils.factories import *
@@ -49,3 +50,26 @@ class TestAPIAuth(TestCase):
     def test_no_token(self):
         request = self.make_request(None, None)
         assert_equal(self.auth.authenticate(request), None)
+
+    def test_cached_credentials(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        with self.assertNumQueries(0):
+            assert_equal(self.auth.authenticate(request), (self.user, None))
+
+    def test_regenerate_key_invalidates_cache(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        api_key = ApiKey.objects.get(user=self.user)
+        api_key.key = api_key.generate_key()
+        api_key.save()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
+
+    def test_deactivate_user_invalidates_cache(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        self.user.is_active = False
+        self.user.save()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
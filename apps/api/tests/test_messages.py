@@ -44,8 +44,8 @@ class ActivityTestCase(TestCase):
         all_messages = list(Message.objects.all())
         assert_items_equal([m.user for m in all_messages], recipients)
         for m in all_messages:
-            assert_equal(m.subject, correct_subject)
-            assert_equal(m.content, correct_content)
+            assert_equal(m.get_subject(), correct_subject)
+            assert_equal(m.get_text(), correct_content)
             assert_equal(m.author, self.user)
 
     def check_validation_error(self, data):
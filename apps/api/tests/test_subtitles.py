@@ -17,9 +17,11 @@
 
 from __future__ import absolute_import
 import json
+import time
 
 from django.http import Http404
 from django.test import TestCase
+from django.utils.http import http_date
 from nose.tools import *
 from rest_framework import status
 from rest_framework.exceptions import PermissionDenied, ValidationError
@@ -532,6 +534,64 @@ class SubtitlesViewTest(TestCase):
         assert_equal(response.content,
                      babelsubs.to(self.version.get_subtitles(), 'dfxp'))
 
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        assert_equal(response.content, '')
+        assert_equal(response['ETag'], etag)
+        # other formats should have a different ETag
+        response = self.client.get(self.url, HTTP_ACCEPT='text/srt',
+                                   HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        # so should new versions
+        pipeline.add_subtitles(self.video, 'en',
+                               SubtitleSetFactory(num_subs=1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        # We don't send Last-Modified, since unpublishing or publishing a
+        # version changes which version we serve without changing any
+        # created date.  If-Modified-Since should never result in a 304.
+        v2 = pipeline.add_subtitles(self.video, 'en',
+                                    SubtitleSetFactory(num_subs=2))
+        response = self.client.get(self.url)
+        assert_false(response.has_header('Last-Modified'))
+        assert_equal(response.data['version_number'], 2)
+        if_modified_since = http_date(time.time() + 3600)
+        v2.unpublish()
+        response = self.client.get(self.url,
+                                   HTTP_IF_MODIFIED_SINCE=if_modified_since)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_equal(response.data['version_number'], 1)
+        v2.publish()
+        response = self.client.get(self.url,
+                                   HTTP_IF_MODIFIED_SINCE=if_modified_since)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_equal(response.data['version_number'], 2)
+
+    def test_cache_control(self):
+        response = self.client.get(self.url)
+        assert_true('public' in response['Cache-Control'])
+        pipeline.add_subtitles(self.video, 'en',
+                               SubtitleSetFactory(num_subs=1),
+                               visibility='private')
+        response = self.client.get(self.url, {'version_number': 'last'})
+        assert_true('private' in response['Cache-Control'])
+
+    @test_utils.patch_for_test(
+        'subtitles.permissions.user_can_access_subtitles_format')
+    def test_cache_control_restricted_format(self, mock_can_access_format):
+        # If anonymous users can't access the format, then the response
+        # shouldn't be cached by shared caches.
+        mock_can_access_format.side_effect = (
+            lambda user, sub_format: user.is_authenticated())
+        response = self.client.get(self.url, HTTP_ACCEPT='text/srt')
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_true('private' in response['Cache-Control'])
+        assert_false('public' in response['Cache-Control'])
+
     def run_get_object(self, **query_params):
         view = SubtitlesView()
         view.kwargs = {
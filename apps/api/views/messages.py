@@ -44,7 +44,8 @@ from rest_framework.response import Response
 from api.fields import UserField
 from auth.models import CustomUser as User
 from teams.models import Team
-from messages.models import Message
+from messages.models import BroadcastMessage, Message
+from messages.tasks import send_broadcast_message
 import teams.permissions
 
 class MessagesSerializer(serializers.Serializer):
@@ -73,25 +74,27 @@ class MessagesSerializer(serializers.Serializer):
             self.fail('no-user-or-team')
         return data
 
-    def recipients(self):
+    def create_messages(self):
         if 'user' in self.validated_data:
-            yield self.validated_data['user']
+            user = self.validated_data['user']
+            if user != self.context['user']:
+                Message.objects.bulk_create([
+                    Message(user=user,
+                            content=self.validated_data['content'],
+                            subject=self.validated_data['subject'],
+                            message_type='M',
+                            author=self.context['user'])
+                ])
         else:
-            qs = self.validated_data['team'].members.select_related('user')
-            for member in qs:
-                yield member.user
-
-    def create_messages(self):
-        messages = [
-            Message(user=user,
-                    content=self.validated_data['content'],
-                    subject=self.validated_data['subject'],
-                    message_type='M',
-                    author=self.context['user'])
-            for user in self.recipients()
-            if user != self.context['user']
-        ]
-        Message.objects.bulk_create(messages)
+            # Teams can be large, so store the message once and create the
+            # messages for each member in a task.
+            broadcast = BroadcastMessage.objects.create(
+                content=self.validated_data['content'],
+                subject=self.validated_data['subject'],
+                message_type='M',
+                author=self.context['user'])
+            send_broadcast_message.delay(broadcast.id,
+                                         self.validated_data['team'].id)
 
 class Messages(views.APIView):
     def get_serializer(self):
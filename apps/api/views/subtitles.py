@@ -173,6 +173,13 @@ WEBVTT                text/vtt                vtt
     GET /api/videos/(video-id)/languages/(language-code)/subtitles/
     Accept: application/ttml+xml
 
+Conditional requests
+^^^^^^^^^^^^^^^^^^^^
+
+Subtitle responses include an ``ETag`` header.  If you poll for subtitles,
+send it back using the ``If-None-Match`` header.  If the subtitles haven't
+changed, we will return a ``304 Not Modified`` response with no body.
+
 Creating new subtitles
 ^^^^^^^^^^^^^^^^^^^^^^
 
@@ -268,6 +275,7 @@ from __future__ import absolute_import
 import json
 import logging
 
+from django.conf import settings
 from django.db import IntegrityError
 from django.http import Http404
 from django.shortcuts import get_object_or_404
@@ -301,6 +309,7 @@ from subtitles.permissions import user_can_access_subtitles_format
 from subtitles.types import SubtitleFormatList
 import babelsubs
 from babelsubs.storage import SubtitleSet
+from utils.http import not_modified, not_modified_response, set_cache_headers
 from utils.subtitles import load_subtitles
 import videos.tasks
 
@@ -698,7 +707,9 @@ class SubtitlesSerializer(serializers.Serializer):
             metadata=validated_data.get('metadata'),
             author=self.context['user'],
             committer=self.context['user'],
-            origin=origin)
+            origin=origin,
+            skip_unchanged=(origin == ORIGIN_API and
+                            settings.API_SKIP_UNCHANGED_SUBTITLES))
 
 class SubtitlesView(generics.CreateAPIView):
     # Note that even though we only inherit from CreateAPIView, we support
@@ -749,18 +760,30 @@ class SubtitlesView(generics.CreateAPIView):
 
     def get(self, request, *args, **kwargs):
         version = self.get_object()
+        if isinstance(request.accepted_renderer, SubtitleRenderer):
+            sub_format = request.accepted_renderer.format
+        else:
+            sub_format = request.query_params.get('sub_format', 'json')
+        if not user_can_access_subtitles_format(request.user, sub_format):
+            raise PermissionDenied()
+        # Handle conditional GETs before we load the subtitles
+        cache_info = self.get_cache_info(version, sub_format)
+        if not_modified(request, cache_info['etag']):
+            return not_modified_response(**cache_info)
         # If we're rendering the subtitles directly, then we skip creating a
         # serializer and return the subtitles instead
         if isinstance(request.accepted_renderer, SubtitleRenderer):
-            if user_can_access_subtitles_format(request.user, request.accepted_renderer.format):
-                return Response(version.get_subtitles())
-            else:
-                raise PermissionDenied()
-        serializer = self.get_serializer(version)
-        if user_can_access_subtitles_format(request.user, serializer.context['sub_format']):
-            return Response(serializer.data)
+            response = Response(version.get_subtitles())
         else:
-            raise PermissionDenied()
+            response = Response(self.get_serializer(version).data)
+        set_cache_headers(response, **cache_info)
+        return response
+
+    def get_cache_info(self, version, sub_format):
+        cache_info = version.http_cache_info(
+            sub_format, self.request.accepted_media_type)
+        cache_info['vary'] = ['Accept']
+        return cache_info
 
     def get_object(self):
         video = self.get_video()
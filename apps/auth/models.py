@@ -17,6 +17,7 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from datetime import datetime, timedelta
+import collections
 import hashlib
 import hmac
 import random
@@ -29,13 +30,14 @@ from django.contrib.auth.models import UserManager, User as BaseUser
 from django.contrib.sites.models import Site
 from django.core.cache import cache
 from django.core.cache import cache
-from django.core.exceptions import MultipleObjectsReturned, ValidationError
+from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.db import IntegrityError
+from django.db import connection
 from django.db import models
 from django.db import transaction
 from django.db.models.loading import get_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.utils.http import urlquote
 from django.utils.translation import ugettext_lazy as _, ugettext
 from tastypie.models import ApiKey
@@ -206,6 +208,9 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
             self.check_profile_changed()
         super(CustomUser, self).save(*args, **kwargs)
         self.start_tracking_profile_fields()
+        # Invalidate the cache, since things like the API credentials depend
+        # on is_active
+        self.cache.invalidate()
 
         if send_confirmation and send_email_confirmation:
             EmailConfirmation.objects.send_confirmation(self)
@@ -241,7 +246,11 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
         return qs
 
     def unread_messages_count(self, hidden_meassage_id=None):
-        return self.unread_messages(hidden_meassage_id).count()
+        from messages.models import UnreadMessageCount
+
+        if hidden_meassage_id:
+            return self.unread_messages(hidden_meassage_id).count()
+        return UnreadMessageCount.objects.get_count(self)
 
     def tutorial_was_shown(self):
         CustomUser.objects.filter(pk=self.id).update(show_tutorial=False)
@@ -255,67 +264,98 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
 
     @classmethod
     def video_followers_change_handler(cls, sender, instance, action, reverse, model, pk_set, **kwargs):
-        from videos.models import SubtitleLanguage
-
+        # Keep CustomUser.videos in sync with Video.followers.  We work on the
+        # entire pk_set at once, since bulk follows can contain a lot of pks.
+        through = cls.videos.through
         if reverse and action == 'post_add':
             #instance is User
-            for video_pk in pk_set:
-                cls.videos.through.objects.get_or_create(video__pk=video_pk, customuser=instance, defaults={'video_id': video_pk})
+            cls._add_followed_videos([(instance.pk, video_pk)
+                                      for video_pk in pk_set])
         elif reverse and action == 'post_remove':
             #instance is User
-            for video_pk in pk_set:
-                if not SubtitleLanguage.objects.filter(followers=instance, video__pk=video_pk).exists():
-                    instance.videos.remove(video_pk)
+            through.objects.filter(customuser=instance, video__in=pk_set) \
+                .exclude(video__subtitlelanguage__followers=instance).delete()
         elif not reverse and action == 'post_add':
             #instance is Video
-            for user_pk in pk_set:
-                cls.videos.through.objects.get_or_create(video=instance, customuser__pk=user_pk, defaults={'customuser_id': user_pk})
+            cls._add_followed_videos([(user_pk, instance.pk)
+                                      for user_pk in pk_set])
         elif not reverse and action == 'post_remove':
             #instance is Video
-            for user_pk in pk_set:
-                if not SubtitleLanguage.objects.filter(followers__pk=user_pk, video=instance).exists():
-                    instance.customuser_set.remove(user_pk)
+            through.objects.filter(video=instance, customuser__in=pk_set) \
+                .exclude(customuser__followed_languages__video=instance).delete()
         elif reverse and action == 'post_clear':
             #instance is User
-            cls.videos.through.objects.filter(customuser=instance) \
+            through.objects.filter(customuser=instance) \
                 .exclude(video__subtitlelanguage__followers=instance).delete()
         elif not reverse and action == 'post_clear':
             #instance is Video
-            cls.videos.through.objects.filter(video=instance) \
+            through.objects.filter(video=instance) \
                 .exclude(customuser__followed_languages__video=instance).delete()
 
     @classmethod
     def sl_followers_change_handler(cls, sender, instance, action, reverse, model, pk_set, **kwargs):
-        from videos.models import Video, SubtitleLanguage
+        from videos.models import SubtitleLanguage
 
+        through = cls.videos.through
         if reverse and action == 'post_add':
             #instance is User
-            for sl_pk in pk_set:
-                sl = SubtitleLanguage.objects.get(pk=sl_pk)
-                cls.videos.through.objects.get_or_create(video=sl.video, customuser=instance)
+            video_ids = (SubtitleLanguage.objects.filter(pk__in=pk_set)
+                         .values_list('video_id', flat=True))
+            cls._add_followed_videos([(instance.pk, video_id)
+                                      for video_id in video_ids])
         elif reverse and action == 'post_remove':
             #instance is User
-            for sl_pk in pk_set:
-                if not Video.objects.filter(followers=instance, subtitlelanguage__pk=sl_pk).exists():
-                    sl = SubtitleLanguage.objects.get(pk=sl_pk)
-                    instance.videos.remove(sl.video)
+            video_ids = (SubtitleLanguage.objects.filter(pk__in=pk_set)
+                         .values_list('video_id', flat=True))
+            through.objects.filter(customuser=instance, video__in=video_ids) \
+                .exclude(video__followers=instance).delete()
         elif not reverse and action == 'post_add':
             #instance is SubtitleLanguage
-            for user_pk in pk_set:
-                cls.videos.through.objects.get_or_create(video=instance.video, customuser__pk=user_pk, defaults={'customuser_id': user_pk})
+            cls._add_followed_videos([(user_pk, instance.video_id)
+                                      for user_pk in pk_set])
         elif not reverse and action == 'post_remove':
             #instance is SubtitleLanguage
-            for user_pk in pk_set:
-                if not Video.objects.filter(followers__pk=user_pk, subtitlelanguage=instance).exists():
-                    instance.video.customuser_set.remove(user_pk)
+            through.objects.filter(video=instance.video_id,
+                                   customuser__in=pk_set) \
+                .exclude(customuser__followed_videos=instance.video_id) \
+                .delete()
         elif reverse and action == 'post_clear':
             #instance is User
-            cls.videos.through.objects.filter(customuser=instance) \
+            through.objects.filter(customuser=instance) \
                 .exclude(video__subtitlelanguage__followers=instance).delete()
         elif not reverse and action == 'post_clear':
             #instance is SubtitleLanguage
-            cls.videos.through.objects.filter(video=instance) \
-                .exclude(customuser__followed_languages__video=instance.video).delete()
+            through.objects.filter(video=instance.video_id) \
+                .exclude(customuser__followed_languages__video=instance.video_id).delete()
+
+    @classmethod
+    def _add_followed_videos(cls, pairs):
+        """Add rows to the CustomUser.videos table
+
+        Args:
+            pairs: list of (user_id, video_id) tuples.  Rows that already
+                exist will be skipped.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return
+        through = cls.videos.through
+        if connection.vendor == 'mysql':
+            # INSERT IGNORE lets the unique index on the table skip existing
+            # rows, without a race between checking and inserting.
+            sql = ('INSERT IGNORE INTO {0} (customuser_id, video_id) '
+                   'VALUES (%s, %s)'.format(through._meta.db_table))
+            connection.cursor().executemany(sql, list(pairs))
+            transaction.commit_unless_managed()
+        else:
+            existing = set(through.objects
+                           .filter(customuser__in=[p[0] for p in pairs],
+                                   video__in=[p[1] for p in pairs])
+                           .values_list('customuser_id', 'video_id'))
+            through.objects.bulk_create([
+                through(customuser_id=user_id, video_id=video_id)
+                for (user_id, video_id) in pairs - existing
+            ])
 
     def get_languages(self):
         """Get a list of language codes that the user speaks."""
@@ -497,6 +537,57 @@ def create_custom_user(sender, instance, created, **kwargs):
 
 post_save.connect(create_custom_user, BaseUser)
 
+def on_api_key_changed(sender, instance, **kwargs):
+    # The API credentials cache is stored in the user's cache group
+    CustomUser.cache.invalidate_by_pk(instance.user_id)
+
+post_save.connect(on_api_key_changed, ApiKey)
+post_delete.connect(on_api_key_changed, ApiKey)
+
+class AwardsManager(models.Manager):
+    def process_events(self, chunk_size=1000):
+        """Convert pending AwardEvents into Awards
+
+        AwardEvents are processed in chunks.  For each chunk we create the
+        Awards that users don't have yet with a single INSERT, then update
+        CustomUser.award_points once per user.
+
+        Returns:
+            number of Awards created
+        """
+        created_count = 0
+        while True:
+            with transaction.commit_on_success():
+                events = list(AwardEvent.objects.order_by('id')
+                              .values_list('id', 'user_id', 'type')
+                              [:chunk_size])
+                if not events:
+                    break
+                pairs = set((user_id, type)
+                            for (event_id, user_id, type) in events)
+                existing = set(self.filter(
+                    user__in=set(user_id for (user_id, type) in pairs)
+                ).values_list('user_id', 'type'))
+                new_awards = [
+                    Awards(user_id=user_id, type=type,
+                           points=Awards.points_for_type(type))
+                    for (user_id, type) in pairs - existing
+                ]
+                self.bulk_create(new_awards)
+                points = collections.defaultdict(int)
+                for award in new_awards:
+                    points[award.user_id] += award.points
+                for user_id, user_points in points.items():
+                    if user_points:
+                        CustomUser.objects.filter(pk=user_id).update(
+                            award_points=models.F('award_points') +
+                            user_points)
+                AwardEvent.objects.filter(id__lte=events[-1][0]).delete()
+                created_count += len(new_awards)
+            if len(events) < chunk_size:
+                break
+        return created_count
+
 class Awards(models.Model):
     COMMENT = 1
     START_SUBTITLES = 2
@@ -511,24 +602,29 @@ class Awards(models.Model):
         (EDIT_SUBTITLES, _(u'Edit subtitles')),
         (EDIT_TRANSLATION, _(u'Edit translation'))
     )
+    POINTS = {
+        COMMENT: 10,
+        START_SUBTITLES: 100,
+        START_TRANSLATION: 100,
+        EDIT_SUBTITLES: 50,
+        EDIT_TRANSLATION: 50,
+    }
     points = models.IntegerField()
     type = models.IntegerField(choices=TYPE_CHOICES)
     user = models.ForeignKey(CustomUser, null=True)
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = AwardsManager()
+
+    class Meta:
+        unique_together = (('user', 'type'),)
+
+    @classmethod
+    def points_for_type(cls, type):
+        return cls.POINTS.get(type, 0)
+
     def _set_points(self):
-        if self.type == self.COMMENT:
-            self.points = 10
-        elif self.type == self.START_SUBTITLES:
-            self.points = 100
-        elif self.type == self.START_TRANSLATION:
-            self.points = 100
-        elif self.type == self.EDIT_SUBTITLES:
-            self.points = 50
-        elif self.type == self.EDIT_TRANSLATION:
-            self.points = 50
-        else:
-            self.points = 0
+        self.points = self.points_for_type(self.type)
 
     def save(self, *args, **kwrags):
         self.points or self._set_points()
@@ -536,13 +632,14 @@ class Awards(models.Model):
             CustomUser.objects.filter(pk=self.user.pk).update(award_points=models.F('award_points')+self.points)
         return super(Awards, self).save(*args, **kwrags)
 
+    # The signal handlers run on hot paths (for example saving subtitles),
+    # so they only append an AwardEvent.  The auth.tasks.process_award_events
+    # periodic task converts those to Awards.
     @classmethod
     def on_comment_save(cls, sender, instance, created, **kwargs):
-        if created:
-            try:
-                cls.objects.get_or_create(user=instance.user, type = cls.COMMENT)
-            except MultipleObjectsReturned:
-                pass
+        if created and instance.user_id:
+            AwardEvent.objects.create(user_id=instance.user_id,
+                                      type=cls.COMMENT)
 
     @classmethod
     def on_subtitle_version_save(cls, sender, instance, created, timestamp=None, **kwargs):
@@ -559,10 +656,17 @@ class Awards(models.Model):
                 type = cls.EDIT_SUBTITLES
             else:
                 type = cls.EDIT_TRANSLATION
-        try:
-            cls.objects.get_or_create(user=instance.user, type=type)
-        except MultipleObjectsReturned:
-            pass
+        AwardEvent.objects.create(user_id=instance.user_id, type=type)
+
+class AwardEvent(models.Model):
+    """Action that may earn a user an award.
+
+    This is an append-only buffer that Awards.objects.process_events()
+    aggregates in bulk.
+    """
+    user = models.ForeignKey(CustomUser)
+    type = models.IntegerField(choices=Awards.TYPE_CHOICES)
+    created = models.DateTimeField(auto_now_add=True)
 
 class UserLanguage(models.Model):
     PROFICIENCY_CHOICES = (
@@ -16,10 +16,23 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import logging
+
 from celery.task import task
 
-from auth.models import LoginToken
+from auth.models import Awards, LoginToken
+from utils import applock
+
+logger = logging.getLogger(__name__)
 
 @task
 def expire_login_tokens():
     LoginToken.objects.get_expired().delete()
+
+@task
+def process_award_events():
+    try:
+        with applock.lock('auth.process_award_events'):
+            Awards.objects.process_events()
+    except applock.LockBusy:
+        logger.info('process_award_events already running, skipping')
@@ -29,7 +29,7 @@ from django.test import TestCase
 
 from auth import signals
 from auth.models import CustomUser as User, UserLanguage
-from auth.models import LoginToken
+from auth.models import AwardEvent, Awards, LoginToken
 from caching.tests.utils import assert_invalidates_model_cache
 from utils.factories import *
 from utils import test_utils
@@ -232,3 +232,55 @@ class LoginTokenViewsTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 403)
 
+
+class AwardsTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def add_event(self, type, user=None):
+        if user is None:
+            user = self.user
+        AwardEvent.objects.create(user=user, type=type)
+
+    def award_points(self, user=None):
+        if user is None:
+            user = self.user
+        return User.objects.get(pk=user.pk).award_points
+
+    def test_comment_creates_event(self):
+        comment = mock.Mock(user_id=self.user.id)
+        Awards.on_comment_save(sender=None, instance=comment, created=True)
+        assert_equal(list(AwardEvent.objects.values_list('user', 'type')),
+                     [(self.user.id, Awards.COMMENT)])
+        assert_false(Awards.objects.exists())
+
+    def test_process_events(self):
+        other_user = UserFactory()
+        self.add_event(Awards.COMMENT)
+        self.add_event(Awards.COMMENT)
+        self.add_event(Awards.START_SUBTITLES)
+        self.add_event(Awards.COMMENT, other_user)
+        assert_equal(Awards.objects.process_events(), 3)
+        assert_equal(
+            sorted(Awards.objects.values_list('user', 'type')),
+            sorted([(self.user.id, Awards.COMMENT),
+                    (self.user.id, Awards.START_SUBTITLES),
+                    (other_user.id, Awards.COMMENT)]))
+        assert_equal(self.award_points(), 110)
+        assert_equal(self.award_points(other_user), 10)
+        assert_false(AwardEvent.objects.exists())
+
+    def test_existing_awards_arent_duplicated(self):
+        Awards.objects.create(user=self.user, type=Awards.COMMENT)
+        self.add_event(Awards.COMMENT)
+        assert_equal(Awards.objects.process_events(), 0)
+        assert_equal(Awards.objects.filter(user=self.user).count(), 1)
+        assert_equal(self.award_points(), 10)
+
+    def test_process_events_in_chunks(self):
+        self.add_event(Awards.COMMENT)
+        self.add_event(Awards.START_SUBTITLES)
+        self.add_event(Awards.EDIT_SUBTITLES)
+        assert_equal(Awards.objects.process_events(chunk_size=2), 3)
+        assert_equal(self.award_points(), 160)
+        assert_false(AwardEvent.objects.exists())
@@ -143,6 +143,28 @@ get.  If the version changes between the get() and set() calls, then the
 value stored with set() will not be valid.  This works somewhat similarly to
 the memcached GETS and CAS operations.
 
+.. _cache-stampede-prevention:
+
+Stampede prevention
+^^^^^^^^^^^^^^^^^^^
+
+When a popular cache group gets invalidated, many processes can miss the
+cache at the same time and all calculate the same value.  get_or_calc()
+avoids this by using cache.add() to take a lease on the key before
+calculating the value.  Processes that don't get the lease return the
+previous value, even though it's from an old version, rather than
+calculating it again.  If there is no previous value, then they calculate it
+like before.
+
+get_or_calc() can also store values with a soft timeout, set with the
+CACHE_GROUP_SOFT_TIMEOUT setting.  After the soft timeout, the value gets
+recalculated in the same way as if it was invalidated.
+CACHE_GROUP_HARD_TIMEOUT controls how long the values are kept in the cache,
+which is also how long previous values are available.
+
+We count the calculations that we avoided in the cache, see
+get_stampedes_prevented().
+
 Cache Groups and DB Models
 ^^^^^^^^^^^^^^^^^^^^^^^^^^
 
@@ -161,15 +183,38 @@ attribute to your class definition.
 """
 from __future__ import absolute_import
 import collections
+import time
 
 from django.conf import settings
 from django.core.cache import cache
 
 from utils import codes
+from utils import metrics
+
+# How long a process can take to calculate a value in get_or_calc() before
+# other processes stop waiting for it.
+LEASE_TIMEOUT = 30
+STAMPEDES_PREVENTED_KEY = 'cachegroup-stampedes-prevented'
+STAMPEDES_PREVENTED_TIMEOUT = 30 * 24 * 60 * 60
 
 def get_commit_id():
     return settings.LAST_COMMIT_GUID
 
+def get_stampedes_prevented():
+    """Get the number of calculations that get_or_calc() avoided
+
+    This counts the times that we returned a previous value because another
+    process was calculating the new one.
+    """
+    return cache.get(STAMPEDES_PREVENTED_KEY) or 0
+
+def _record_stampede_prevented():
+    metrics.incr('cache_stampede_prevented')
+    try:
+        cache.incr(STAMPEDES_PREVENTED_KEY)
+    except ValueError:
+        cache.add(STAMPEDES_PREVENTED_KEY, 1, STAMPEDES_PREVENTED_TIMEOUT)
+
 class _CacheWrapper(object):
     """Wrap cache access for CacheGroup.
 
@@ -199,7 +244,7 @@ class _CacheWrapper(object):
             self._cache_data[key] = result.get(self._prefix_key(key))
 
     def set(self, key, value, timeout=None):
-        cache.set(self._prefix_key(key), value)
+        cache.set(self._prefix_key(key), value, timeout)
         self._cache_data[key] = value
 
     def set_many(self, values, timeout=None):
@@ -230,6 +275,7 @@ class CacheGroup(object):
     .. automethod:: get_model
     .. automethod:: set_model
     .. automethod:: invalidate
+    .. automethod:: get_version
 
     """
 
@@ -257,6 +303,15 @@ class CacheGroup(object):
         self.current_version = codes.make_code()
         self.cache_wrapper.set(self.version_key, self.current_version)
 
+    def get_version(self):
+        """Get the current version for this CacheGroup
+
+        The version changes each time the group is invalidated, which makes
+        it useful for things like HTTP ETags.
+        """
+        self.ensure_version()
+        return self.current_version
+
     def ensure_version(self):
         if self.current_version is not None:
             return
@@ -301,7 +356,8 @@ class CacheGroup(object):
         result = {}
         for key in keys:
             cache_value = get_many_result.get(key)
-            version, value = self._unpack_cache_value(cache_value)
+            version, value, soft_expires = self._unpack_cache_value(
+                cache_value)
             if version == self.current_version:
                 result[key] = value
         return result
@@ -331,12 +387,48 @@ class CacheGroup(object):
 
           - call work_func() to calculate the value
           - store it in the cache
+
+        If another process is already calculating the value, we return the
+        previous value instead (see :ref:`cache-stampede-prevention`).
         """
-        cached_value = self.get(key)
-        if cached_value is not None:
-            return cached_value
+        version, value, soft_expires = self._get_raw(key)
+        if value is None:
+            return self._calc_and_set(key, work_func, args, kwargs)
+        if (version == self.current_version and
+                (soft_expires is None or soft_expires > time.time())):
+            return value
+        # The value is out of date, only recalculate it if we get the lease
+        lease_key = self.cache_wrapper._prefix_key(key + ':lease')
+        if not cache.add(lease_key, 1, LEASE_TIMEOUT):
+            _record_stampede_prevented()
+            return value
+        try:
+            return self._calc_and_set(key, work_func, args, kwargs)
+        finally:
+            cache.delete(lease_key)
+
+    def _get_raw(self, key):
+        """Get a (version, value, soft_expires) tuple from the cache
+
+        Unlike get(), this returns values for old versions.
+        """
+        self.get_many([key])
+        # get_many() stored the raw value in our cache wrapper, so this
+        # doesn't need another cache request
+        raw_value = self.cache_wrapper.get_many([key])[key]
+        return self._unpack_cache_value(raw_value)
+
+    def _calc_and_set(self, key, work_func, args, kwargs):
         calculated_value = work_func(*args, **kwargs)
-        self.set(key, calculated_value)
+        soft_timeout = getattr(settings, 'CACHE_GROUP_SOFT_TIMEOUT', None)
+        hard_timeout = getattr(settings, 'CACHE_GROUP_HARD_TIMEOUT', None)
+        self.ensure_version()
+        if soft_timeout is not None:
+            cache_value = self._pack_cache_value(calculated_value,
+                                                 time.time() + soft_timeout)
+        else:
+            cache_value = self._pack_cache_value(calculated_value)
+        self.cache_wrapper.set(key, cache_value, hard_timeout)
         return calculated_value
 
     def get_model(self, ModelClass, key):
@@ -389,11 +481,16 @@ class CacheGroup(object):
             value = 'does-not-exist'
         self.set(key, value, timeout)
 
-    def _pack_cache_value(self, value):
+    def _pack_cache_value(self, value, soft_expires=None):
         """Combine our version and value together to get a value to store in
         the cache.
+
+        If soft_expires is given, we also store it so that get_or_calc() can
+        recalculate the value after that time.
         """
-        if isinstance(value, basestring):
+        if soft_expires is not None:
+            return (self.current_version, value, soft_expires)
+        elif isinstance(value, basestring):
             # if the value is a string, let's not create a tuple.  This avoids
             # having to pickle the data
             return ':'.join((self.current_version, value))
@@ -401,16 +498,19 @@ class CacheGroup(object):
             return (self.current_version, value)
 
     def _unpack_cache_value(self, cache_value):
-        """Unpack a value stored in the cache to a (version, value) tuple
+        """Unpack a value stored in the cache to a (version, value,
+        soft_expires) tuple
         """
         if isinstance(cache_value, basestring):
             split = cache_value.split(':', 1)
             if len(split) == 2:
-                return split
+                return (split[0], split[1], None)
         elif isinstance(cache_value, tuple):
             if len(cache_value) == 2:
+                return (cache_value[0], cache_value[1], None)
+            elif len(cache_value) == 3:
                 return cache_value
-        return (None, None)
+        return (None, None, None)
 
     @staticmethod
     def _model_to_tuple(instance):
@@ -439,6 +539,7 @@ class ModelCacheManager(object):
 
     .. automethod:: get_cache_group
     .. automethod:: invalidate_by_pk
+    .. automethod:: invalidate_many_by_pk
     .. automethod:: get_instance
 
     """
@@ -470,6 +571,20 @@ class ModelCacheManager(object):
         """
         return self.get_cache_group(pk).invalidate()
 
+    def invalidate_many_by_pk(self, pks):
+        """Invalidate CacheGroups for many instances
+
+        This works like calling invalidate_by_pk() for each pk, but only
+        makes 1 cache call.
+        """
+        new_versions = {}
+        for pk in pks:
+            wrapper = _CacheWrapper(self._make_prefix(pk))
+            version_key = 'version:{0}'.format(get_commit_id())
+            new_versions[wrapper._prefix_key(version_key)] = codes.make_code()
+        if new_versions:
+            cache.set_many(new_versions)
+
     def get_instance(self, pk, cache_pattern=None):
         """Get a cached instance from it's cache group
 
@@ -59,11 +59,8 @@ class CacheNode(template.Node):
         except StandardError:
             logger.warn("error getting cache group", exc_info=True)
             return self.nodelist.render(context)
-        content = cache_group.get(self.key)
-        if content is None:
-            content = self.nodelist.render(context)
-            cache_group.set(self.key, content)
-        return content
+        return cache_group.get_or_calc(self.key, self.nodelist.render,
+                                       context)
 
 class CacheByUserNode(CacheNode):
     def get_cache_group(self, context):
@@ -26,7 +26,7 @@ from nose.tools import *
 import mock
 
 from caching.cachegroup import (CacheGroup, _cache_pattern_memory,
-                                ModelCacheManager)
+                                ModelCacheManager, get_stampedes_prevented)
 from utils import test_utils
 from utils.factories import *
 from videos.models import Video
@@ -120,6 +120,35 @@ class CacheGroupTest(TestCase):
         assert_equal(result, self.CACHE_VALUE)
         assert_equal(func.call_count, 0)
 
+    def test_get_or_calc_during_recalculation(self):
+        # If another process is recalculating an invalidated value,
+        # get_or_calc() should return the previous value rather than
+        # calling work_func
+        self.populate_key('key')
+        self.invalidate_group()
+        cache_group = make_cache_group()
+        lease_key = cache_group.cache_wrapper._prefix_key('key:lease')
+        cache.add(lease_key, 1)
+        stampedes_prevented = get_stampedes_prevented()
+        result = cache_group.get_or_calc('key', self.work_func)
+        assert_equal(result, self.CACHE_VALUE)
+        assert_equal(self.work_func.call_count, 0)
+        assert_equal(get_stampedes_prevented(), stampedes_prevented + 1)
+        # Once the lease is released, we should recalculate the value
+        cache.delete(lease_key)
+        self.work_func.return_value = 'new-value'
+        result = make_cache_group().get_or_calc('key', self.work_func)
+        assert_equal(result, 'new-value')
+        assert_equal(self.work_func.call_count, 1)
+
+    @override_settings(CACHE_GROUP_SOFT_TIMEOUT=-1)
+    def test_get_or_calc_soft_timeout(self):
+        make_cache_group().get_or_calc('key', self.work_func)
+        make_cache_group().get_or_calc('key', self.work_func)
+        assert_equal(self.work_func.call_count, 2)
+        # get() ignores the soft timeout
+        self.check_cache_hit('key')
+
     def patch_get_commit_id(self):
         return mock.patch('caching.cachegroup.get_commit_id')
 
@@ -311,6 +340,15 @@ class ModelCacheManagerTest(TestCase):
         cache_group2 = self.model_cache_manager.get_cache_group(self.pk)
         assert_equal(cache_group2.get('key'), None)
 
+    def test_invalidate_many_by_pk(self):
+        user2 = User.objects.create_user('test-user2')
+        for pk in (self.pk, user2.pk):
+            self.model_cache_manager.get_cache_group(pk).set('key', 'value')
+        self.model_cache_manager.invalidate_many_by_pk([self.pk, user2.pk])
+        for pk in (self.pk, user2.pk):
+            cache_group = self.model_cache_manager.get_cache_group(pk)
+            assert_equal(cache_group.get('key'), None)
+
     def test_get_instance(self):
         # Since the instance is not cached at this point, calling
         # get_instance() should fetch it from the DB
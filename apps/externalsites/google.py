@@ -54,6 +54,11 @@ OpenIDProfile = namedtuple('OpenIDProfile',
 
 logger = logging.getLogger(__name__)
 
+# Timeout (in seconds) for fetching video metadata from the youtube API
+VIDEO_INFO_TIMEOUT = 10
+# Max number of ids that we can pass to the videos API in one request
+VIDEO_GET_MAX_IDS = 50
+
 def youtube_scopes():
     return [
         "https://www.googleapis.com/auth/youtube",
@@ -261,7 +266,7 @@ def video_get(access_token, video_id, part):
     return _make_youtube_api_request('get', access_token, 'videos', params={
         'id': video_id,
         'part': ','.join(part),
-    })
+    }, timeout=VIDEO_INFO_TIMEOUT)
 
 def get_uploads_playlist_id(channel_id):
     response = channel_get(None, ['contentDetails'], channel_id)
@@ -431,16 +436,40 @@ def _get_video_info(video_id):
     response = video_get(None, video_id, ['snippet', 'contentDetails'])
     try:
         response_data = response.json()
-        snippet = response_data['items'][0]['snippet']
-        content_details = response_data['items'][0]['contentDetails']
-        return VideoInfo(snippet['channelId'],
-                         snippet['title'],
-                         snippet['description'],
-                         isodate.parse_duration(content_details['duration']).total_seconds(),
-                         snippet['thumbnails']['high']['url'])
+        return _parse_video_info(response_data['items'][0])
     except StandardError, e:
         raise APIError("get_video_info: Unexpected content: %s" % e)
 
+def get_video_infos(video_ids):
+    """Get VideoInfo objects for several videos at once
+
+    This makes 1 API request for each VIDEO_GET_MAX_IDS video ids, rather
+    than 1 per video.  Videos that the API doesn't return (private, deleted,
+    etc) are left out of the result.
+
+    :returns: dict mapping video ids to VideoInfo objects
+    """
+    video_ids = list(video_ids)
+    rv = {}
+    for i in xrange(0, len(video_ids), VIDEO_GET_MAX_IDS):
+        response = video_get(None, ','.join(video_ids[i:i+VIDEO_GET_MAX_IDS]),
+                             ['snippet', 'contentDetails'])
+        try:
+            for item in response.json()['items']:
+                rv[item['id']] = _parse_video_info(item)
+        except StandardError, e:
+            raise APIError("get_video_infos: Unexpected content: %s" % e)
+    return rv
+
+def _parse_video_info(item):
+    snippet = item['snippet']
+    content_details = item['contentDetails']
+    return VideoInfo(snippet['channelId'],
+                     snippet['title'],
+                     snippet['description'],
+                     isodate.parse_duration(content_details['duration']).total_seconds(),
+                     snippet['thumbnails']['high']['url'])
+
 
 def get_direct_url_to_audio(video_id):
     """
@@ -37,6 +37,7 @@ from teams.models import Team, TeamVideo
 from utils.text import fmt
 from videos.models import Video, VideoUrl, VideoFeed
 from videos.permissions import can_user_resync_own_video
+from videos.types.youtube import prefetch_video_info
 import videos.models
 import videos.tasks
 
@@ -490,9 +491,13 @@ class YouTubeAccount(ExternalAccount):
         video_ids = google.get_uploaded_video_ids(self.channel_id)
         if not video_ids:
             return
-        for video_id in video_ids:
-            if video_id == self.last_import_video_id:
-                break
+        if self.last_import_video_id in video_ids:
+            new_video_ids = video_ids[:video_ids.index(
+                self.last_import_video_id)]
+        else:
+            new_video_ids = video_ids
+        prefetch_video_info(new_video_ids)
+        for video_id in new_video_ids:
             video_url = 'http://youtube.com/watch?v={}'.format(video_id)
             if self.type == ExternalAccount.TYPE_USER:
                 try:
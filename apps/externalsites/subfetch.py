@@ -21,6 +21,7 @@
 
 import logging
 
+from babelsubs.storage import SubtitleSet
 import unilangs
 
 from externalsites import google
@@ -76,17 +77,27 @@ def fetch_subs_youtube(video_url):
 
     access_token = google.get_new_access_token(account.oauth_refresh_token)
     captions_list = google.captions_list(access_token, video_id)
-    versions = []
+    subtitles_list = []
     for caption_id, language_code, caption_name in captions_list:
         language_code = convert_language_code(language_code)
         if language_code and language_code not in existing_langs:
             dfxp = google.captions_download(access_token, caption_id)
+            # Parse the subtitles now so that one bad caption track doesn't
+            # stop us from importing the others.
             try:
-                version = pipeline.add_subtitles(video_url.video, language_code, dfxp,
-                                       note="From youtube", complete=True,
-                                       origin=ORIGIN_IMPORTED)
-                versions.append(version)
+                subtitles = SubtitleSet(language_code, initial_data=dfxp)
             except Exception, e:
-                logger.error("Exception while importing subtitles " + str(e))
-    if len(versions) > 0:
-        subtitles_imported.send(sender=versions[0].subtitle_language, versions=versions)
+                logger.error("Exception while parsing subtitles " + str(e))
+                continue
+            subtitles_list.append((language_code, subtitles))
+    if not subtitles_list:
+        return
+    try:
+        versions = pipeline.add_subtitles_batch(
+            video_url.video, subtitles_list, note="From youtube",
+            complete=True, origin=ORIGIN_IMPORTED)
+    except Exception, e:
+        logger.error("Exception while importing subtitles " + str(e))
+        return
+    subtitles_imported.send(sender=versions[0].subtitle_language,
+                            versions=versions)
@@ -227,6 +227,54 @@ class YouTubeTestCase(TestCase):
             with assert_raises(google.APIError):
                 google.get_video_info('test-video-id')
 
+    def make_video_item(self, video_id):
+        return {
+            'id': video_id,
+            'snippet': {
+                'title': 'title-' + video_id,
+                'channelId': 'test-channel-id',
+                'description': 'test-description',
+                'thumbnails': {
+                    'high': {
+                        'url': 'test-thumbnail-url',
+                    }
+                }
+            },
+            'contentDetails': {
+                'duration': 'PT1M',
+            }
+        }
+
+    def test_get_video_infos(self):
+        video_ids = ['test-video-id{}'.format(i) for i in range(60)]
+        mocker = test_utils.RequestsMocker()
+        mocker.expect_request(
+            'get', 'https://www.googleapis.com/youtube/v3/videos', params={
+                'part': 'snippet,contentDetails',
+                'id': ','.join(video_ids[:50]),
+                'key': settings.YOUTUBE_API_KEY,
+            }, body=json.dumps({
+                'items': [self.make_video_item(v) for v in video_ids[:50]],
+            })
+        )
+        # The API leaves out videos that it can't find
+        mocker.expect_request(
+            'get', 'https://www.googleapis.com/youtube/v3/videos', params={
+                'part': 'snippet,contentDetails',
+                'id': ','.join(video_ids[50:]),
+                'key': settings.YOUTUBE_API_KEY,
+            }, body=json.dumps({
+                'items': [self.make_video_item(v) for v in video_ids[50:59]],
+            })
+        )
+        google.get_video_infos.run_original_for_test()
+        with mocker:
+            video_infos = google.get_video_infos(video_ids)
+        assert_equal(sorted(video_infos.keys()), sorted(video_ids[:59]))
+        assert_equal(video_infos['test-video-id5'].title,
+                     'title-test-video-id5')
+        assert_equal(video_infos['test-video-id5'].duration, 60)
+
     def test_update_video_description(self):
         mocker = test_utils.RequestsMocker()
         mocker.expect_request(
@@ -0,0 +1,66 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from messages import retention
+
+class Command(BaseCommand):
+    help = ("Apply the message retention policies.  Use --dry-run to see "
+            "how many messages would be changed.")
+    option_list = BaseCommand.option_list + (
+        make_option('-n', '--dry-run', dest='dry-run', action='store_true',
+                    default=False,
+                    help="Count the messages to change, but don't change "
+                    "them"),
+        make_option('-c', '--chunk-size', dest='chunk-size', default=10000,
+                    type='int', help='Number of ids to handle at once'),
+        make_option('-d', '--delay', dest='delay', default=0.1,
+                    type='float', help='Seconds to sleep between chunks'),
+        make_option('-t', '--time-limit', dest='time-limit', default=None,
+                    type='int', help='Stop after this many seconds'),
+        make_option('--reset', dest='reset', action='store_true',
+                    default=False,
+                    help='Forget the checkpoints and start from the '
+                    'beginning'),
+    )
+
+    def handle(self, **options):
+        if options['reset']:
+            retention.reset_checkpoints()
+        self.stdout.write('policies: {}\n'.format(
+            ', '.join('{}={} days'.format(message_type, days)
+                      for message_type, days in retention.get_policies())
+            or 'none'))
+        results = retention.MessageRetention(
+            chunk_size=options['chunk-size'], delay=options['delay'],
+            time_limit=options['time-limit'], dry_run=options['dry-run'],
+            progress_callback=self.progress).run()
+        self.stdout.write('\n')
+        for result in results:
+            self.stdout.write(
+                '{}: ids {}-{}, {} messages{}{}\n'.format(
+                    result.name, result.start_id, result.end_id, result.rows,
+                    ' would be changed' if options['dry-run'] else '',
+                    '' if result.finished else ' (stopped early)'))
+
+    def progress(self, name, last_id):
+        self.stdout.write('\r{}: processed up to id {}'.format(name, last_id))
+        self.stdout.flush()
@@ -1,41 +1,59 @@
 from optparse import make_option
+import datetime
+import time
+
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db.models import Max, Min
 import logging
 from messages.models import Message
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
+    help = "Recalculate the has_reply_for_user/has_reply_for_author flags"
     option_list = BaseCommand.option_list + (
         make_option('--days',
-                    action='store_true',
                     dest='days',
                     default=None,
+                    type='int',
                     help='Days of history of threads to process, by default all messages in history'),
+        make_option('-b', '--batch-size', dest='batch-size', default=1000,
+                    type='int',
+                    help='Number of thread ids to process at once'),
+        make_option('-s', '--start-id', dest='start-id', default=None,
+                    type='int',
+                    help='Start with this thread id (to resume a run)'),
+        make_option('-d', '--delay', dest='delay', default=0, type='float',
+                    help='Seconds to sleep between batches'),
     )
     def handle(self, *args, **kwargs):
-        threads = Message.objects.filter(thread__isnull=False)
-        if kwargs['days'] is not None:
-            threads = threads.filter(created__gt=datetime.datetime.now() - datetime.timedelta(days=kwargs['days']))
-        threads = set(threads.values_list('thread', flat=True))
-        num_threads = len(threads)
-        self.stdout.write("Adding thread tips, found {} threads to process\n".format(num_threads))
-        processed = 0
-        for thread in threads:
-            messages = Message.objects.filter(Q(thread=thread) | Q(id=thread), deleted_for_user=False).order_by('-created')
-            if messages.count() > 0:
-                messages.update(has_reply_for_user = True)
-                last_message = messages[0]
-                last_message.has_reply_for_user = False
-                last_message.save()
-            messages = Message.objects.filter(Q(thread=thread) | Q(id=thread), deleted_for_author=False).order_by('-created')
-            if messages.count() > 0:
-                messages.update(has_reply_for_author = True)
-                last_message = messages[0]
-                last_message.has_reply_for_author = False
-                last_message.save()
-            processed += 1
-            self.stdout.write("\rProcessed {}/{} threads".format(processed, num_threads))
+        max_id = Message.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            return
+        start_id = kwargs['start-id']
+        if start_id is None:
+            start_id = self.calc_start_id(kwargs['days'])
+        batch_size = kwargs['batch-size']
+        while start_id <= max_id:
+            end_id = start_id + batch_size - 1
+            Message.objects.update_thread_tips(start_id, end_id)
+            self.stdout.write("Processed threads up to id {}/{}\n".format(
+                end_id, max_id))
             self.stdout.flush()
-        self.stdout.write('\nSuccessfully processed all threads\n')
+            start_id = end_id + 1
+            if kwargs['delay']:
+                time.sleep(kwargs['delay'])
+        self.stdout.write('Successfully processed all threads\n')
+
+    def calc_start_id(self, days):
+        if days is None:
+            return 0
+        # Find the first thread that has a message in the time period.
+        # Threads are identified by the id of their first message, so we need
+        # to check the thread column as well as the id.
+        start = datetime.datetime.now() - datetime.timedelta(days=days)
+        result = (Message.objects.filter(created__gt=start)
+                  .aggregate(min_id=Min('id'), min_thread=Min('thread')))
+        if result['min_id'] is None:
+            return 0
+        return min(result['min_id'], result['min_thread'] or result['min_id'])
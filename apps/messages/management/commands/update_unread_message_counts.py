@@ -0,0 +1,56 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from auth.models import CustomUser as User
+from messages.models import UnreadMessageCount
+
+class Command(BaseCommand):
+    help = "Recalculate the unread message counts for users"
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', dest='batch-size', default=1000,
+                    type='int',
+                    help='Number of user ids to process at once'),
+        make_option('-s', '--start-id', dest='start-id', default=0,
+                    type='int',
+                    help='Start with this user id (to resume a run)'),
+        make_option('-d', '--delay', dest='delay', default=0, type='float',
+                    help='Seconds to sleep between batches'),
+    )
+
+    def handle(self, **options):
+        max_id = User.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            return
+        start_id = options['start-id']
+        while start_id <= max_id:
+            end_id = start_id + options['batch-size'] - 1
+            UnreadMessageCount.objects.recalculate(
+                User.objects.filter(id__range=(start_id, end_id))
+                .values_list('id', flat=True))
+            self.stdout.write('updated users up to id {}/{}\n'.format(
+                end_id, max_id))
+            self.stdout.flush()
+            start_id = end_id + 1
+            if options['delay']:
+                time.sleep(options['delay'])
@@ -16,9 +16,10 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import collections
 import json, datetime
 
-from django.db import models
+from django.db import connection, models, transaction, IntegrityError
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext, ugettext_lazy as _
@@ -28,7 +29,7 @@ from django.conf import settings
 from django.db.models.signals import post_save
 from django.core.urlresolvers import reverse
 from django.utils.html import escape, urlize
-from django.db.models import Q
+from django.db.models import Q, F
 
 from auth.models import CustomUser as User
 MESSAGE_MAX_LENGTH = getattr(settings,'MESSAGE_MAX_LENGTH', 1000)
@@ -46,20 +47,25 @@ MESSAGE_TYPE_CHOICES = (
 class MessageManager(models.Manager):
     use_for_related_fields = True
 
+    def inbox_query_set(self):
+        # Inbox queries need the BroadcastMessage to display broadcasts, so
+        # fetch it with the same query.
+        return self.get_query_set().select_related('broadcast')
+
     def for_user(self, user, thread_tip_only=False):
-        qs = self.get_query_set().filter(user=user).exclude(deleted_for_user=True)
+        qs = self.inbox_query_set().filter(user=user).exclude(deleted_for_user=True)
         if thread_tip_only:
             qs = qs.filter(has_reply_for_user=False)
         return qs
 
     def for_author(self, user, thread_tip_only=False):
-        qs = self.get_query_set().filter(author=user).exclude(deleted_for_author=True)
+        qs = self.inbox_query_set().filter(author=user).exclude(deleted_for_author=True)
         if thread_tip_only:
             qs = qs.filter(has_reply_for_author=False)
         return qs
 
     def for_user_or_author(self, user, thread_tip_only=False):
-        qs = self.get_query_set().filter((Q(author=user) & Q(deleted_for_author=False)) | (Q(user=user) & Q(deleted_for_user=False)))
+        qs = self.inbox_query_set().filter((Q(author=user) & Q(deleted_for_author=False)) | (Q(user=user) & Q(deleted_for_user=False)))
         if thread_tip_only:
             qs = qs.filter(Q(has_reply_for_author=False) | Q(has_reply_for_user=False))
         return qs
@@ -69,7 +75,7 @@ class MessageManager(models.Manager):
             thread_id = message.thread
         else:
             thread_id = message.id
-        return self.get_query_set().filter(Q(thread=thread_id) | Q(id=thread_id)).filter((Q(author=user) & Q(deleted_for_author=False)) | (Q(user=user) & Q(deleted_for_user=False)))
+        return self.inbox_query_set().filter(Q(thread=thread_id) | Q(id=thread_id)).filter((Q(author=user) & Q(deleted_for_author=False)) | (Q(user=user) & Q(deleted_for_user=False)))
 
     def previous_in_thread(self, message, user):
         if message.thread:
@@ -85,15 +91,179 @@ class MessageManager(models.Manager):
         return self.get_query_set().filter(read=False)
 
     def bulk_create(self, object_list, **kwargs):
-        super(MessageManager, self).bulk_create(object_list, **kwargs)
-        for user_id in set(m.user_id for m in object_list):
-            User.cache.invalidate_by_pk(user_id)
+        with transaction.commit_on_success():
+            super(MessageManager, self).bulk_create(object_list, **kwargs)
+            unread_counts = collections.Counter(
+                m.user_id for m in object_list if m.counts_as_unread())
+            # Group users by their count, so that sending to many users
+            # only takes a few UPDATE statements.
+            users_by_count = collections.defaultdict(list)
+            for user_id, count in unread_counts.items():
+                users_by_count[count].append(user_id)
+            for count, user_ids in users_by_count.items():
+                UnreadMessageCount.objects.adjust_many(user_ids, count)
+        User.cache.invalidate_many_by_pk(set(m.user_id for m in object_list))
+
+    def mark_read(self, user, qs):
+        """Mark messages sent to user as read
+
+        Use this rather than calling update() directly so that the unread
+        message count gets updated.
+
+        Args:
+            user: User to mark the messages read for.  Messages in qs sent to
+                other users are left alone.
+            qs: Message queryset to mark read
+        """
+        qs = qs.filter(user=user, read=False)
+        with transaction.commit_on_success():
+            count = qs.filter(deleted_for_user=False).update(read=True)
+            qs.update(read=True)
+            UnreadMessageCount.objects.adjust(user.id, -count)
+        User.cache.invalidate_by_pk(user.id)
+
+    def update_thread_tips(self, start_id, end_id):
+        """Recalculate the thread tip flags for a range of threads
+
+        Threads are identified by the id of their first message.  This makes
+        a fixed number of queries, no matter how many threads are in the
+        range.
+        """
+        self._update_thread_tips(Q(thread__range=(start_id, end_id)) |
+                                 Q(thread__isnull=True,
+                                   id__range=(start_id, end_id)))
+
+    def update_thread_tips_for_threads(self, thread_ids):
+        """Recalculate the thread tip flags for a list of threads."""
+        thread_ids = list(thread_ids)
+        if thread_ids:
+            self._update_thread_tips(Q(thread__in=thread_ids) |
+                                     Q(thread__isnull=True, id__in=thread_ids))
+
+    def _update_thread_tips(self, thread_filter):
+        rows = list(self.get_query_set()
+                    .filter(thread_filter)
+                    .values_list('id', 'thread', 'created',
+                                 'deleted_for_user', 'deleted_for_author',
+                                 'has_reply_for_user',
+                                 'has_reply_for_author'))
+        # Fields to calculate and the column that says if the message is
+        # deleted for that side of the thread.  Rows are in the same order as
+        # values_list() above.
+        fields = [
+            ('has_reply_for_user', 3, 5),
+            ('has_reply_for_author', 4, 6),
+        ]
+        # map (field_name, thread_id) to the (created, id) for the tip
+        tips = {}
+        for row in rows:
+            thread_id = row[1] or row[0]
+            for field_name, deleted_index, current_index in fields:
+                if not row[deleted_index]:
+                    key = (field_name, thread_id)
+                    tips[key] = max(tips.get(key), (row[2], row[0]))
+        # map (field_name, value) to the message ids to set it for
+        updates = collections.defaultdict(list)
+        for row in rows:
+            thread_id = row[1] or row[0]
+            for field_name, deleted_index, current_index in fields:
+                if row[deleted_index]:
+                    continue
+                has_reply = tips[field_name, thread_id][1] != row[0]
+                if row[current_index] != has_reply:
+                    updates[field_name, has_reply].append(row[0])
+        with transaction.commit_on_success():
+            for (field_name, value), ids in updates.items():
+                self.filter(id__in=ids).update(**{field_name: value})
+
+    def bulk_delete_for_user(self, user, message_ids):
+        """Delete messages for a user
+
+        This is the bulk version of Message.delete_for_user().  Messages sent
+        to the user get deleted_for_user set.  Messages sent by the user get
+        deleted_for_author set.
+
+        Returns:
+            list of ids for the messages that were deleted.  ids for messages
+            that don't exist or that the user can't delete are left out.
+        """
+        message_ids = set(message_ids)
+        with transaction.commit_on_success():
+            deleted = self._delete_for(
+                user, self.for_user(user).filter(id__in=message_ids),
+                'deleted_for_user', 'has_reply_for_user')
+            deleted.extend(self._delete_for(
+                user,
+                self.for_author(user).filter(
+                    id__in=message_ids.difference(deleted)),
+                'deleted_for_author', 'has_reply_for_author'))
+        User.cache.invalidate_by_pk(user.id)
+        return deleted
+
+    def bulk_delete_for_author(self, author, message_ids):
+        """Delete messages for their author
+
+        This is the bulk version of Message.delete_for_author().
+
+        Returns:
+            list of ids for the messages that were deleted.
+        """
+        with transaction.commit_on_success():
+            deleted = self._delete_for(
+                author, self.for_author(author).filter(id__in=message_ids),
+                'deleted_for_author', 'has_reply_for_author')
+        User.cache.invalidate_by_pk(author.id)
+        return deleted
+
+    def _delete_for(self, user, qs, field_name, tip_field_name):
+        rows = list(qs.select_for_update()
+                    .values_list('id', 'thread', 'read', tip_field_name))
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        self.filter(id__in=ids).update(**{field_name: True})
+        if field_name == 'deleted_for_user':
+            UnreadMessageCount.objects.adjust(
+                user.id, -len([row for row in rows if not row[2]]))
+        # If we deleted the tip of a thread, then we need to pick a new one
+        self.update_thread_tips_for_threads(set(
+            row[1] for row in rows if row[1] is not None and not row[3]))
+        return ids
 
     def cleanup(self, days, message_type=None):
-        messages_to_clean = self.get_query_set().filter(created__lte=datetime.datetime.now() - datetime.timedelta(days=days))
-        if message_type:
-            messages_to_clean = messages_to_clean.filter(message_type=message_type)
-        messages_to_clean.delete()
+        from messages.retention import MessageRetention
+        MessageRetention(use_checkpoints=False).delete_old_messages(
+            days, message_type)
+
+class BroadcastMessage(models.Model):
+    """Message sent to a large group of users, for example a whole team.
+
+    We store the subject/content once here.  Each recipient gets a Message
+    row that links back to us with blank subject/content.  This keeps the
+    per-recipient rows small and lets the inbox code handle broadcasts like
+    any other message.
+
+    Message rows are created in chunks by the send_broadcast_message task,
+    in user id order.  If the task gets interrupted, it resumes after the
+    last user that has a Message row.
+    """
+    author = models.ForeignKey(User, blank=True, null=True,
+                               related_name='broadcast_messages')
+    subject = models.CharField(max_length=100, blank=True)
+    content = models.TextField(blank=True, max_length=MESSAGE_MAX_LENGTH)
+    message_type = models.CharField(max_length=1,
+                                    choices=MESSAGE_TYPE_CHOICES)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.BooleanField(default=False)
+
+    def __unicode__(self):
+        return u'BroadcastMessage: {}'.format(self.subject)
+
+    def save(self, *args, **kwargs):
+        max_length = self._meta.get_field('subject').max_length
+        if len(self.subject) > max_length:
+            self.subject = self.subject[:max_length-3] + '...'
+        super(BroadcastMessage, self).save(*args, **kwargs)
 
 class Message(models.Model):
     user = models.ForeignKey(User)
@@ -114,6 +284,7 @@ class Message(models.Model):
     thread = models.PositiveIntegerField(blank=True, null=True, db_index=True)
     has_reply_for_author = models.BooleanField(default=False)
     has_reply_for_user = models.BooleanField(default=False)
+    broadcast = models.ForeignKey(BroadcastMessage, blank=True, null=True)
     hide_cookie_name = 'hide_new_messages'
 
     def validate_message_type(value):
@@ -125,35 +296,68 @@ class Message(models.Model):
     class Meta:
         ordering = ['-created']
 
+    def __init__(self, *args, **kwargs):
+        super(Message, self).__init__(*args, **kwargs)
+        # Track if we are counted in the UnreadMessageCount table, so that
+        # save() can update it.
+        self._counted_as_unread = (self.pk is not None and
+                                   self.counts_as_unread())
+
     def __unicode__(self):
-        if self.subject and not u' ' in self.subject:
-            return self.subject[:40]+u'...'
-        return self.subject or ugettext('[no subject]')
+        subject = self.get_subject()
+        if subject and not u' ' in subject:
+            return subject[:40]+u'...'
+        return subject or ugettext('[no subject]')
+
+    def get_subject(self):
+        if self.broadcast_id is not None:
+            return self.broadcast.subject
+        return self.subject
+
+    def get_text(self):
+        """Get the message text, before it's converted to HTML."""
+        if self.broadcast_id is not None:
+            return self.broadcast.content
+        return self.content
 
     def get_reply_url(self):
         return '%s?reply=%s' % (reverse('messages:inbox'), self.pk)
 
+    def counts_as_unread(self):
+        return not (self.read or self.deleted_for_user)
+
     def delete_for_user(self, user):
         if self.user == user:
-            self.deleted_for_user = True
-            if self.thread is not None and not self.has_reply_for_user:
-                previous_in_thread = Message.objects.previous_in_thread(self, self.user)
-                if previous_in_thread is not None:
-                    previous_in_thread.has_reply_for_user = False
-                    previous_in_thread.save()
-            self.save()
+            with transaction.commit_on_success():
+                self.deleted_for_user = True
+                self.remove_thread_tip('has_reply_for_user')
+                self.save()
         elif self.author == user:
             self.delete_for_author(user)
 
     def delete_for_author(self, author):
         if self.author == author:
-            self.deleted_for_author = True
-            if self.thread is not None and not self.has_reply_for_author:
-                previous_in_thread = Message.objects.previous_in_thread(self, self.user)
-                if previous_in_thread is not None:
-                    previous_in_thread.has_reply_for_author = False
-                    previous_in_thread.save()
-            self.save()
+            with transaction.commit_on_success():
+                self.deleted_for_author = True
+                self.remove_thread_tip('has_reply_for_author')
+                self.save()
+
+    def remove_thread_tip(self, field_name):
+        """Update the thread tips when this message is removed from a thread
+
+        If this message was the tip of its thread, then the previous message
+        becomes the new tip.
+
+        Args:
+            field_name: has_reply_for_user or has_reply_for_author
+        """
+        if self.thread is None or getattr(self, field_name):
+            return
+        previous_in_thread = Message.objects.previous_in_thread(
+            self, self.user_id)
+        if previous_in_thread is not None:
+            Message.objects.filter(pk=previous_in_thread.pk).update(
+                **{field_name: False})
 
     def json_data(self):
         data = {
@@ -166,7 +370,7 @@ class Message(models.Model):
             'user-username': self.user and unicode(self.user) or '',
             'user-id': self.user and self.user.pk or '',
             'message-content': self.get_content(),
-            'message-subject': self.subject,
+            'message-subject': self.get_subject(),
             'message-subject-display': unicode(self),
             'is-read': self.read,
             'can-reply': bool(self.author_id)
@@ -177,12 +381,13 @@ class Message(models.Model):
 
     def get_content(self):
         content = []
+        text = self.get_text()
 
-        if self.content:
+        if text:
             if self.message_type == SYSTEM_NOTIFICATION:
-                escaped_content = self.content
+                escaped_content = text
             else:
-                escaped_content = escape(self.content)
+                escaped_content = escape(text)
             try:
                 my_content_with_links = urlize(escaped_content)
             except ValueError:
@@ -201,7 +406,8 @@ class Message(models.Model):
     def clean(self):
         from django.core.exceptions import ValidationError
 
-        if not self.subject and not self.content and not self.object:
+        if (not self.get_subject() and not self.get_text() and
+                not self.object):
             raise ValidationError(_(u'You should enter subject or message.'))
 
     def save(self, *args, **kwargs):
@@ -215,13 +421,18 @@ class Message(models.Model):
         if getattr(settings, "MESSAGES_DISABLED", False):
             return
         self.auto_truncate_subject()
-        if self.thread is not None and self.pk is None:
-            previous_in_thread = Message.objects.previous_in_thread(self, self.user)
-            if previous_in_thread is not None:
-                previous_in_thread.has_reply_for_author = True
-                previous_in_thread.has_reply_for_user = True
-                previous_in_thread.save()
-        super (Message, self).save(*args, **kwargs)
+        with transaction.commit_on_success():
+            if self.thread is not None and self.pk is None:
+                previous_in_thread = Message.objects.previous_in_thread(self, self.user)
+                if previous_in_thread is not None:
+                    Message.objects.filter(pk=previous_in_thread.pk).update(
+                        has_reply_for_author=True, has_reply_for_user=True)
+            super (Message, self).save(*args, **kwargs)
+            counts_as_unread = self.counts_as_unread()
+            if counts_as_unread != self._counted_as_unread:
+                UnreadMessageCount.objects.adjust(
+                    self.user_id, 1 if counts_as_unread else -1)
+                self._counted_as_unread = counts_as_unread
 
     def auto_truncate_subject(self):
          max_length = self._meta.get_field('subject').max_length
@@ -233,3 +444,79 @@ class Message(models.Model):
         ct = ContentType.objects.get_for_model(sender)
         cls.objects.filter(content_type__pk=ct.pk, object_pk=instance.pk).delete()
 
+
+class UnreadMessageCountManager(models.Manager):
+    def get_count(self, user):
+        """Get the number of unread messages for a user."""
+        try:
+            return max(self.get(user=user).count, 0)
+        except UnreadMessageCount.DoesNotExist:
+            # We haven't calculated the count for this user yet.  Create the
+            # row before counting, so that adjust() calls from other requests
+            # apply to it.  Then calculate the count with a single UPDATE.  If
+            # we counted first, adjustments made between the COUNT and the
+            # INSERT would be lost.
+            sid = transaction.savepoint()
+            try:
+                self.create(user=user, count=0)
+            except IntegrityError:
+                # Another request created the row first
+                transaction.savepoint_rollback(sid)
+            else:
+                transaction.savepoint_commit(sid)
+            self._calc_count(user.id)
+            return max(self.get(user=user).count, 0)
+
+    def _calc_count(self, user_id):
+        qn = connection.ops.quote_name
+        sql = ('UPDATE messages_unreadmessagecount SET count=('
+               'SELECT COUNT(*) FROM messages_message m '
+               'WHERE m.user_id=messages_unreadmessagecount.user_id AND '
+               'm.{0}=%s AND m.deleted_for_user=%s) '
+               'WHERE user_id=%s'.format(qn('read')))
+        cursor = connection.cursor()
+        cursor.execute(sql, [False, False, user_id])
+        transaction.commit_unless_managed()
+
+    def adjust(self, user_id, delta):
+        """Add delta to the unread count for a user.
+
+        If we haven't calculated the count for the user yet, this is a no-op.
+        get_count() will calculate the full count when it's needed.
+        """
+        if delta:
+            self.filter(user=user_id).update(count=F('count') + delta)
+
+    def adjust_many(self, user_ids, delta):
+        """Add delta to the unread count for a group of users."""
+        if delta and user_ids:
+            self.filter(user__in=user_ids).update(count=F('count') + delta)
+
+    def recalculate(self, user_ids):
+        """Recalculate the unread counts for a group of users."""
+        user_ids = list(user_ids)
+        counts = dict((user_id, 0) for user_id in user_ids)
+        counts.update(Message.objects
+                      .filter(user__in=user_ids, read=False,
+                              deleted_for_user=False)
+                      .values_list('user')
+                      .annotate(count=models.Count('id')))
+        with transaction.commit_on_success():
+            self.filter(user__in=user_ids).delete()
+            self.bulk_create([
+                UnreadMessageCount(user_id=user_id, count=count)
+                for user_id, count in counts.items()
+            ])
+        for user_id in user_ids:
+            User.cache.invalidate_by_pk(user_id)
+
+class UnreadMessageCount(models.Model):
+    """Tracks the number of unread messages for a user
+
+    This gets updated as messages are created/read/deleted, which saves us
+    from running a COUNT query to display the message count on every page.
+    """
+    user = models.OneToOneField(User, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    objects = UnreadMessageCountManager()
@@ -0,0 +1,225 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""messages.retention -- Delete old messages
+
+The messages table is huge, so we never touch it with a single big UPDATE
+or DELETE.  Instead we work through it in ranges of primary keys, running
+one small statement per range and optionally sleeping in between.
+
+Retention policies are set with the MESSAGE_RETENTION_POLICIES setting,
+which maps message types to the number of days to keep them for.  For
+example:
+
+    MESSAGE_RETENTION_POLICIES = {
+        'S': 365,
+        'M': 2 * 365,
+    }
+
+Message types without a policy are kept forever.  We also convert legacy
+OLD_MESSAGE messages to the new types.
+
+We store a checkpoint in the cache after each range, so that a run that
+gets stopped (because of the time limit for example) picks up where it
+left off next time.  If the checkpoint is lost, we start over from the
+beginning, which is slower but still correct.
+"""
+
+from collections import namedtuple
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+
+from auth.models import CustomUser as User
+from messages.models import (Message, UnreadMessageCount, OLD_MESSAGE,
+                             SYSTEM_NOTIFICATION, MESSAGE)
+
+# How long to keep checkpoints for
+CHECKPOINT_TIMEOUT = 30 * 24 * 60 * 60
+
+RetentionResult = namedtuple('RetentionResult',
+                             'name start_id end_id rows finished')
+
+def get_policies():
+    """Get the retention policies from the settings
+
+    Returns:
+        list of (message_type, days) tuples
+    """
+    policies = getattr(settings, 'MESSAGE_RETENTION_POLICIES', {})
+    return sorted(policies.items())
+
+class MessageRetention(object):
+    """Runs the retention policies for messages
+
+    Args:
+        chunk_size: number of ids to handle with each statement
+        delay: seconds to sleep after each chunk
+        time_limit: stop after this many seconds.  The next run will pick
+            up where we left off.
+        dry_run: Only count the messages that would be changed
+        use_checkpoints: Set to False to always start from the beginning
+        progress_callback: function to call after each chunk.  It's passed
+            the name of the step and the last id processed.
+    """
+    def __init__(self, chunk_size=10000, delay=0, time_limit=None,
+                 dry_run=False, use_checkpoints=True, progress_callback=None):
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.time_limit = time_limit
+        self.dry_run = dry_run
+        self.use_checkpoints = use_checkpoints
+        self.progress_callback = progress_callback
+        self.start_time = time.time()
+
+    def run(self):
+        """Run the legacy conversion and all retention policies.
+
+        Returns:
+            list of RetentionResult objects
+        """
+        results = [self.convert_legacy_messages()]
+        for message_type, days in get_policies():
+            results.append(self.delete_old_messages(days, message_type))
+        return results
+
+    def convert_legacy_messages(self):
+        """Convert OLD_MESSAGE messages to the newer types."""
+        max_id = Message.objects.aggregate(max_id=Max('id'))['max_id']
+        return self._run_chunks('convert-legacy', self._min_id(), max_id,
+                                self._convert_chunk)
+
+    def delete_old_messages(self, days, message_type=None):
+        """Delete messages older than a number of days
+
+        Args:
+            days: delete messages older than this
+            message_type: only delete messages of this type
+        """
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+        def delete_chunk(start_id, end_id):
+            return self._delete_chunk(start_id, end_id, cutoff, message_type)
+        return self._run_chunks('delete-{}'.format(message_type or 'all'),
+                                self._min_id(), self._find_cutoff_id(cutoff),
+                                delete_chunk)
+
+    def _min_id(self):
+        return Message.objects.aggregate(min_id=Min('id'))['min_id']
+
+    def _find_cutoff_id(self, cutoff):
+        """Find the last message id created before cutoff
+
+        Ids are assigned in creation order, so we can binary search for the
+        boundary using the primary key index, rather than scanning the
+        created column.
+        """
+        result = Message.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        low, high = result['min_id'], result['max_id']
+        if low is None or not self._created_before(low, cutoff):
+            return None
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self._created_before(mid, cutoff):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _created_before(self, message_id, cutoff):
+        # Check if the first message at or after message_id was created
+        # before cutoff
+        created = list(Message.objects.filter(id__gte=message_id)
+                       .order_by('id').values_list('created', flat=True)[:1])
+        return bool(created) and created[0] <= cutoff
+
+    def _run_chunks(self, name, start_id, end_id, func):
+        if start_id is None or end_id is None:
+            return RetentionResult(name, start_id, end_id, 0, True)
+        checkpoint_key = 'messages-retention:{}'.format(name)
+        if self.use_checkpoints:
+            start_id = max(start_id, cache.get(checkpoint_key) or 0)
+        first_id = start_id
+        rows = 0
+        while start_id <= end_id:
+            if self._out_of_time():
+                return RetentionResult(name, first_id, start_id - 1, rows,
+                                       False)
+            chunk_end = min(start_id + self.chunk_size - 1, end_id)
+            rows += func(start_id, chunk_end)
+            if self.use_checkpoints and not self.dry_run:
+                cache.set(checkpoint_key, chunk_end + 1, CHECKPOINT_TIMEOUT)
+            if self.progress_callback:
+                self.progress_callback(name, chunk_end)
+            start_id = chunk_end + 1
+            if self.delay:
+                time.sleep(self.delay)
+        return RetentionResult(name, first_id, end_id, rows, True)
+
+    def _out_of_time(self):
+        return (self.time_limit is not None and
+                time.time() - self.start_time > self.time_limit)
+
+    def _convert_chunk(self, start_id, end_id):
+        qs = Message.objects.filter(id__range=(start_id, end_id),
+                                    message_type=OLD_MESSAGE)
+        if self.dry_run:
+            return qs.count()
+        with transaction.commit_on_success():
+            return (qs.filter(author__isnull=True)
+                    .update(message_type=SYSTEM_NOTIFICATION) +
+                    qs.filter(author__isnull=False)
+                    .update(message_type=MESSAGE))
+
+    def _delete_chunk(self, start_id, end_id, cutoff, message_type):
+        qs = Message.objects.filter(id__range=(start_id, end_id),
+                                    created__lte=cutoff)
+        if message_type is not None:
+            qs = qs.filter(message_type=message_type)
+        if self.dry_run:
+            return qs.count()
+        with transaction.commit_on_success():
+            unread_counts = list(qs.filter(read=False, deleted_for_user=False)
+                                 .values_list('user')
+                                 .annotate(count=Count('id')))
+            for user_id, count in unread_counts:
+                UnreadMessageCount.objects.adjust(user_id, -count)
+            # Use a raw DELETE rather than QuerySet.delete(), which would
+            # fetch all the rows and send signals for each one.
+            sql = ("DELETE FROM messages_message "
+                   "WHERE id BETWEEN %s AND %s AND created <= %s")
+            params = [start_id, end_id, cutoff]
+            if message_type is not None:
+                sql += " AND message_type = %s"
+                params.append(message_type)
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.rowcount
+        for user_id, count in unread_counts:
+            User.cache.invalidate_by_pk(user_id)
+        return rows
+
+def reset_checkpoints():
+    names = ['convert-legacy', 'delete-all']
+    names.extend('delete-{}'.format(message_type)
+                 for message_type, days in get_policies())
+    cache.delete_many(['messages-retention:{}'.format(name)
+                       for name in names])
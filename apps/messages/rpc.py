@@ -25,33 +25,43 @@ class MessagesApiClass(object):
     def remove(self, message_ids, user):
         if not user.is_authenticated():
             return {'error': _('You should be authenticated.')}
-        if not isinstance(message_ids, list):
-            message_ids = [message_ids]
-        for message_id in message_ids:
-            try:
-                try:
-                    msg = Message.objects.for_user(user).get(pk=message_id)
-                except Message.DoesNotExist:
-                    msg = Message.objects.for_author(user).get(pk=message_id)
-            except Message.DoesNotExist:
-                return {'error': _('Message does not exist.')}
-
-            msg.delete_for_user(user)
+        message_ids, invalid_ids = self._clean_message_ids(message_ids)
+        deleted = Message.objects.bulk_delete_for_user(user, message_ids)
+        return self._removed_response(message_ids, invalid_ids, deleted)
 
-        return {}
     def remove_sent(self, message_ids, user):
         if not user.is_authenticated():
             return {'error': _('You should be authenticated.')}
+        message_ids, invalid_ids = self._clean_message_ids(message_ids)
+        deleted = Message.objects.bulk_delete_for_author(user, message_ids)
+        return self._removed_response(message_ids, invalid_ids, deleted)
+
+    def _clean_message_ids(self, message_ids):
+        """Convert message ids from the client to ints
+
+        Returns:
+            (valid_ids, invalid_ids) tuple
+        """
         if not isinstance(message_ids, list):
             message_ids = [message_ids]
+        valid_ids = []
+        invalid_ids = []
         for message_id in message_ids:
             try:
-                msg = Message.objects.for_author(user).get(pk=message_id)
-            except Message.DoesNotExist:
-                return {'error': _('Message does not exist.')}
-
-            msg.delete_for_author(user)
+                valid_ids.append(int(message_id))
+            except (ValueError, TypeError):
+                invalid_ids.append(message_id)
+        return valid_ids, invalid_ids
 
+    def _removed_response(self, message_ids, invalid_ids, deleted):
+        # We delete all the messages we can, then report the ones that we
+        # couldn't delete.
+        failed = invalid_ids + sorted(set(message_ids).difference(deleted))
+        if failed:
+            return {
+                'error': _('Message does not exist.'),
+                'failed': failed,
+            }
         return {}
 
     def mark_as_read(self, message_ids, user):
@@ -59,14 +69,15 @@ class MessagesApiClass(object):
             return {'error': _('You should be authenticated.')}
         if not isinstance(message_ids, list):
             message_ids = [message_ids]
-        Message.objects.filter(pk__in=message_ids, user=user).update(read=True)
+        Message.objects.mark_read(user,
+                                  Message.objects.filter(pk__in=message_ids))
         return {}
 
     def mark_all_read(self, user):
         if not user.is_authenticated():
             return {'error': _('You should be authenticated.')}
 
-        Message.objects.filter(user=user).update(read=True)
+        Message.objects.mark_read(user, Message.objects.all())
 
         return {}
 
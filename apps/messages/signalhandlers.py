@@ -20,9 +20,16 @@ from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 
 from auth.models import CustomUser as User
-from messages.models import Message
+from messages.models import Message, UnreadMessageCount
 
 @receiver(post_save, sender=Message)
 @receiver(post_delete, sender=Message)
 def on_message_saved(sender, instance, **kwargs):
     User.cache.invalidate_by_pk(instance.user_id)
+
+@receiver(post_delete, sender=Message)
+def on_message_deleted(sender, instance, **kwargs):
+    if instance.counts_as_unread():
+        UnreadMessageCount.objects.adjust(instance.user_id, -1)
+    instance.remove_thread_tip('has_reply_for_user')
+    instance.remove_thread_tip('has_reply_for_author')
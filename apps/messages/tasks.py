@@ -29,6 +29,7 @@ import logging
 
 from celery.task import task
 from django.conf import settings
+from django.db.models import Max
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _, ugettext
@@ -39,11 +40,16 @@ from auth.models import CustomUser as User, UserLanguage
 from localeurl.utils import universal_url
 from teams.moderation_const import REVIEWED_AND_PUBLISHED, \
      REVIEWED_AND_PENDING_APPROVAL, REVIEWED_AND_SENT_BACK
-from messages.models import Message
+from messages.models import BroadcastMessage, Message
+from messages.retention import MessageRetention
+from utils import applock
 from utils import send_templated_email
 from utils.text import fmt
 from utils.translation import get_language_label
-BATCH_SIZE = 1000
+RETENTION_CHUNK_SIZE = 10000
+RETENTION_DELAY = 0.1
+RETENTION_TIME_LIMIT = 20 * 60
+BROADCAST_CHUNK_SIZE = 1000
 
 logger = logging.getLogger(__name__)
 
@@ -56,21 +62,19 @@ def team_sends_notification(team, notification_setting_name):
 
 @task()
 def cleanup():
-    # These numbers have to be chosen. Do not cleanup for now
-    # Message.objects.cleanup(364, message_type='S')
-    # Message.objects.cleanup(2*365, message_type='M')
-    # For now we just convert old messages, by small bulks.
-    # We have to do this way because we can not update on
-    # a sliced query
-    for i in range(10):
-        messages = []
-        for message in Message.objects.all().filter(message_type='O', author__isnull=True)[:BATCH_SIZE]:
-            messages.append(message.id)
-        Message.objects.all().filter(id__in=messages).update(message_type='S')
-        messages = []
-        for message in Message.objects.all().filter(message_type='O', author__isnull=False)[:BATCH_SIZE]:
-            messages.append(message.id)
-        Message.objects.all().filter(id__in=messages).update(message_type='M')
+    # Convert legacy messages and apply the retention policies from the
+    # MESSAGE_RETENTION_POLICIES setting.  We run every hour, but stop well
+    # before then.  Anything left over gets handled on the next run.
+    try:
+        with applock.lock('messages.cleanup'):
+            results = MessageRetention(
+                chunk_size=RETENTION_CHUNK_SIZE, delay=RETENTION_DELAY,
+                time_limit=RETENTION_TIME_LIMIT).run()
+    except applock.LockBusy:
+        logger.info("messages.cleanup already running")
+        return
+    for result in results:
+        logger.info("messages.cleanup: %s", result)
 
 @task()
 def send_new_messages_notifications(message_ids):
@@ -97,7 +101,8 @@ def send_new_message_notification(message_id):
         subject = _(u"New message from %(author)s on Amara: %(subject)s")
     else:
         subject = _("New message on Amara: %(subject)s")
-    subject = fmt(subject, author=message.author, subject=message.subject)
+    subject = fmt(subject, author=message.author,
+                  subject=message.get_subject())
 
     context = {
         "message": message,
@@ -106,6 +111,67 @@ def send_new_message_notification(message_id):
     }
     send_templated_email(user, subject, "messages/email/message_received.html", context)
 
+@task()
+def send_broadcast_message(broadcast_id, team_id, language=None,
+                           send_notifications=False):
+    """Send a BroadcastMessage to the members of a team
+
+    We create the Message rows in chunks of BROADCAST_CHUNK_SIZE users,
+    ordered by user id.  It's safe to run this again if it gets interrupted,
+    it will pick up after the last user that got a message.
+
+    Args:
+        broadcast_id: BroadcastMessage id
+        team_id: Team to send to
+        language: Only send to members that speak this language
+        send_notifications: Send email notifications for the messages
+    """
+    from teams.models import TeamMember
+    if getattr(settings, "MESSAGES_DISABLED", False):
+        return
+    try:
+        broadcast = BroadcastMessage.objects.get(id=broadcast_id)
+    except BroadcastMessage.DoesNotExist:
+        logger.warn('send_broadcast_message: BroadcastMessage does not '
+                    'exist. ID: %s', broadcast_id)
+        return
+    if broadcast.finished:
+        return
+
+    members = TeamMember.objects.filter(team_id=team_id)
+    if broadcast.author_id is not None:
+        members = members.exclude(user=broadcast.author_id)
+    if language:
+        members = members.filter(user__userlanguage__language=language)
+    members = (members.order_by('user')
+               .values_list('user', 'user__notify_by_message').distinct())
+    last_user_id = (Message.objects.filter(broadcast=broadcast)
+                    .aggregate(last_user_id=Max('user'))['last_user_id'])
+
+    while True:
+        if last_user_id is not None:
+            chunk = members.filter(user__gt=last_user_id)
+        else:
+            chunk = members
+        chunk = list(chunk[:BROADCAST_CHUNK_SIZE])
+        if not chunk:
+            break
+        Message.objects.bulk_create([
+            Message(user_id=user_id, author_id=broadcast.author_id,
+                    message_type=broadcast.message_type, broadcast=broadcast,
+                    read=not notify_by_message)
+            for user_id, notify_by_message in chunk
+        ])
+        user_ids = [user_id for user_id, notify_by_message in chunk]
+        if send_notifications:
+            send_new_messages_notifications.delay(list(
+                Message.objects.filter(broadcast=broadcast,
+                                       user__in=user_ids)
+                .values_list('id', flat=True)))
+        last_user_id = user_ids[-1]
+
+    BroadcastMessage.objects.filter(id=broadcast.id).update(finished=True)
+
 @task()
 def team_invitation_sent(invite_pk):
     from messages.models import Message
@@ -36,12 +36,14 @@ def messages(context):
     if isinstance(cached, tuple) and cached[0] == hidden_message_id:
         return cached[1]
 
-    qs = user.unread_messages(hidden_message_id)
-    try:
-        last_unread = qs[:1].get().pk
-    except Message.DoesNotExist:
-        last_unread = ''
     count = user.unread_messages_count(hidden_message_id)
+    last_unread = ''
+    if count:
+        qs = user.unread_messages(hidden_message_id)
+        try:
+            last_unread = qs[:1].get().pk
+        except Message.DoesNotExist:
+            pass
     
     content = render_to_string('messages/_messages.html',  {
         'msg_count': count,
@@ -20,9 +20,12 @@ import datetime
 from django.core import mail
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.test.utils import override_settings
 
 from auth.models import CustomUser as User, EmailConfirmation
-from messages.models import Message
+from messages.models import BroadcastMessage, Message, UnreadMessageCount
+from messages.retention import MessageRetention
+from messages.rpc import MessagesApiClass
 from subtitles import models as sub_models
 from subtitles.pipeline import add_subtitles
 from teams import tasks as team_tasks
@@ -37,6 +40,7 @@ from utils.factories import *
 from videos.models import Video
 from videos.tasks import video_changed_tasks
 import messages.tasks
+import mock
 
 class MessageTest(TestCase):
     def setUp(self):
@@ -79,6 +83,36 @@ class MessageTest(TestCase):
         Message.objects.cleanup(4, message_type='M')
         self.assertEquals(Message.objects.filter(user=self.user).count(), 0)
 
+    @override_settings(MESSAGE_RETENTION_POLICIES={'M': 4})
+    def test_message_retention(self):
+        old = [self._create_message(self.user) for i in range(3)]
+        system = self._create_message(self.user, message_type='S')
+        legacy = self._create_message(self.user, message_type='O')
+        new = self._create_message(self.user)
+        Message.objects.filter(id__lte=legacy.id).update(
+            created=datetime.datetime.now() - datetime.timedelta(days=5))
+        old[0].read = True
+        old[0].save()
+        self.assertEquals(self.user.unread_messages_count(), 5)
+        # dry runs should only count the messages
+        results = MessageRetention(chunk_size=2, dry_run=True).run()
+        self.assertEquals([(r.name, r.rows) for r in results],
+                          [('convert-legacy', 1), ('delete-M', 3)])
+        self.assertEquals(Message.objects.count(), 6)
+        # if we run out of time, we should stop before doing anything
+        results = MessageRetention(chunk_size=2, time_limit=-1).run()
+        self.assertEquals([r.finished for r in results], [False, False])
+        self.assertEquals(Message.objects.count(), 6)
+        # a real run should convert the legacy message, then delete it along
+        # with the other old messages of type M.
+        results = MessageRetention(chunk_size=2).run()
+        self.assertEquals([(r.rows, r.finished) for r in results],
+                          [(1, True), (4, True)])
+        self.assertEquals(
+            sorted(Message.objects.values_list('id', flat=True)),
+            [system.id, new.id])
+        self.assertEquals(self.user.unread_messages_count(), 2)
+
     def test_message_threads(self):
         m = self._create_message(self.user)
         self._create_message(self.user, reply_to=m)
@@ -124,6 +158,127 @@ class MessageTest(TestCase):
         p = self._create_message(self.user)
         self.assertEquals(Message.objects.for_user(self.user, thread_tip_only=True).count(), 2)
         
+    def test_update_thread_tips(self):
+        m = self._create_message(self.user)
+        n = self._create_message(self.user, reply_to=m)
+        o = self._create_message(self.user, reply_to=n)
+        o.delete_for_author(o.author)
+        # mess up the flags, then check that update_thread_tips() fixes them
+        Message.objects.all().update(has_reply_for_user=False,
+                                     has_reply_for_author=True)
+        Message.objects.update_thread_tips(m.id, m.id)
+        def tips(field_name):
+            return [Message.objects.get(id=msg.id).__dict__[field_name]
+                    for msg in (m, n, o)]
+        self.assertEquals(tips('has_reply_for_user'), [True, True, False])
+        # o is deleted for the author, so n is the tip.  We don't touch the
+        # flag on deleted messages.
+        self.assertEquals(tips('has_reply_for_author'), [True, False, True])
+
+    def test_unread_count_row_created_before_counting(self):
+        # Adjustments made while get_count() calculates the count shouldn't
+        # be lost.  Simulate one happening right after the row is created.
+        self._create_message(self.user)
+        self._create_message(self.user)
+        orig_create = UnreadMessageCount.objects.create
+        def create(**kwargs):
+            rv = orig_create(**kwargs)
+            self._create_message(self.user)
+            return rv
+        with mock.patch.object(UnreadMessageCount.objects, 'create', create):
+            self.assertEquals(
+                UnreadMessageCount.objects.get_count(self.user), 3)
+        self.assertEquals(UnreadMessageCount.objects.get_count(self.user), 3)
+
+    def test_unread_count(self):
+        def check_count(count):
+            self.assertEquals(self.user.unread_messages_count(), count)
+            self.assertEquals(self.user.unread_messages().count(), count)
+        check_count(0)
+        m = self._create_message(self.user)
+        n = self._create_message(self.user)
+        o = self._create_message(self.user)
+        check_count(3)
+        m.read = True
+        m.save()
+        check_count(2)
+        n.delete_for_user(self.user)
+        check_count(1)
+        Message.objects.mark_read(self.user, Message.objects.all())
+        check_count(0)
+        p = self._create_message(self.user)
+        check_count(1)
+        p.delete()
+        check_count(0)
+        Message.objects.bulk_create([
+            Message(user=self.user, author=self.author, message_type='M',
+                    subject=self.subject)
+            for i in range(3)
+        ])
+        check_count(3)
+
+    def test_broadcast_message(self):
+        team = TeamFactory()
+        members = [TeamMemberFactory(team=team).user for i in range(3)]
+        optout_user = TeamMemberFactory(
+            team=team, user=UserFactory(notify_by_message=False)).user
+        TeamMemberFactory(team=team, user=self.author)
+        recipients = members + [optout_user]
+        counts_before = dict((u.id, u.unread_messages_count())
+                             for u in recipients)
+        broadcast = BroadcastMessage.objects.create(
+            author=self.author, subject=self.subject, content=self.body,
+            message_type='M')
+        def send_broadcast():
+            with mock.patch.object(messages.tasks, 'BROADCAST_CHUNK_SIZE', 2):
+                messages.tasks.send_broadcast_message.delay(broadcast.id,
+                                                            team.id)
+        send_broadcast()
+        sent = Message.objects.filter(broadcast=broadcast)
+        self.assertEquals(sorted(m.user_id for m in sent),
+                          sorted(u.id for u in recipients))
+        for m in sent:
+            self.assertEquals(m.author, self.author)
+            self.assertEquals(m.get_subject(), self.subject)
+            self.assertEquals(m.get_text(), self.body)
+        for user in members:
+            self.assertEquals(user.unread_messages_count(),
+                              counts_before[user.id] + 1)
+        self.assertEquals(optout_user.unread_messages_count(),
+                          counts_before[optout_user.id])
+        self.assertTrue(BroadcastMessage.objects.get(id=broadcast.id).finished)
+        # if the task gets run again, it should pick up where it left off,
+        # rather than sending duplicate messages
+        BroadcastMessage.objects.filter(id=broadcast.id).update(finished=False)
+        send_broadcast()
+        self.assertEquals(sent.count(), len(recipients))
+
+    def test_rpc_remove(self):
+        m = self._create_message(self.user)
+        n = self._create_message(self.user, reply_to=m)
+        sent = Message.objects.create(user=self.author, author=self.user,
+                                      message_type='M', subject='sent')
+        other = self._create_message(UserFactory())
+        rv = MessagesApiClass().remove(
+            [str(n.id), sent.id, other.id, 'invalid'], self.user)
+        self.assertEquals(rv['failed'], ['invalid', other.id])
+        self.assertTrue(Message.objects.get(id=n.id).deleted_for_user)
+        self.assertTrue(Message.objects.get(id=sent.id).deleted_for_author)
+        self.assertFalse(Message.objects.get(id=other.id).deleted_for_user)
+        # m should be the thread tip now
+        self.assertFalse(Message.objects.get(id=m.id).has_reply_for_user)
+        self.assertEquals(self.user.unread_messages_count(), 1)
+        self.assertEquals(MessagesApiClass().remove([m.id], self.user), {})
+
+    def test_rpc_remove_sent(self):
+        m = self._create_message(self.user)
+        rv = MessagesApiClass().remove_sent([m.id], self.user)
+        self.assertEquals(rv['failed'], [m.id])
+        self.assertEquals(MessagesApiClass().remove_sent([m.id], self.author),
+                          {})
+        self.assertTrue(Message.objects.get(id=m.id).deleted_for_author)
+        self.assertFalse(Message.objects.get(id=m.id).deleted_for_user)
+
     def test_send_email_to_allowed_user(self):
         self.user.notify_by_email = True
         self.user.save()
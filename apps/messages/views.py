@@ -31,11 +31,10 @@ from django.db.models import Q
 from django.db.models import Max
 
 from auth.models import CustomUser as User
-from auth.models import UserLanguage
 from messages.forms import SendMessageForm, NewMessageForm
-from messages.models import Message
+from messages.models import BroadcastMessage, Message
 from messages.rpc import MessagesApiClass
-from messages.tasks import send_new_message_notification, send_new_messages_notifications
+from messages.tasks import send_new_message_notification, send_broadcast_message
 from utils import render_to_json, render_to
 from utils.objectlist import object_list
 from utils.rpc import RpcRouter
@@ -71,13 +70,13 @@ def message(request, message_id):
         except (Message.DoesNotExist, ValueError):
             pass
 
-    messages.filter(user=user).update(read=True)
+    Message.objects.mark_read(user, messages)
     
     extra_context = {
         'send_message_form': SendMessageForm(request.user, auto_id='message_form_id_%s'),
         'messages_display': True,
         'user_info': user,
-        'subject': messages[0].subject,
+        'subject': messages[0].get_subject(),
         'mid': message_id,
         'thread_length': message_thread_length
     }
@@ -175,31 +174,16 @@ def new(request):
                 m.save()
                 send_new_message_notification.delay(m.pk)
             elif form.cleaned_data['team']:
-                # TODO: Move this into a task for performance?
-                language = form.cleaned_data['language']
-                # We create messages using bulk_create, so that only one transaction is needed
-                # But that means that we need to sort out the pk of newly created messages to
-                # be able to send the notifications
-                message_list = []
-                members = []
-                if len(language) == 0:
-                    members = map(lambda member: member.user, form.cleaned_data['team'].members.all().exclude(user__exact=request.user).select_related('user'))
-                else:
-                    members = map(lambda member: member.user, UserLanguage.objects.filter(user__in=form.cleaned_data['team'].members.values('user')).filter(language__exact=language).exclude(user__exact=request.user).select_related('user'))
-                for member in members:
-                    message_list.append(Message.objects.create(
-                        user=member, author=request.user,
-                        message_type='M',
-                        content=form.cleaned_data['content'],
-                        subject=form.cleaned_data['subject']))
-                # Creating a bunch of reasonably-sized tasks
-                batch = 0
-                batch_size = 1000
-                while batch < len(message_list):
-                    send_new_messages_notifications.delay(
-                        [m.pk for m in message_list[batch:batch+batch_size]]
-                    )
-                    batch += batch_size
+                # Store the message once and let a task create the messages
+                # for each team member.
+                broadcast = BroadcastMessage.objects.create(
+                    author=request.user, message_type='M',
+                    content=form.cleaned_data['content'],
+                    subject=form.cleaned_data['subject'])
+                send_broadcast_message.delay(
+                    broadcast.id, form.cleaned_data['team'].id,
+                    language=form.cleaned_data['language'] or None,
+                    send_notifications=True)
 
             messages.success(request, _(u'Message sent.'))
             return HttpResponseRedirect(reverse('messages:inbox'))
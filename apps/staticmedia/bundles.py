@@ -26,9 +26,21 @@ the files does several things.
     - Optionally processes them through a preprocessor like SASS
 
 See the bundle_* functions for exactly what we do for various media types.
+
+Building a bundle means running uglifyjs or sass, which is slow, so we store
+the output in an on-disk build cache (STATIC_MEDIA_BUILD_CACHE_DIR), keyed by
+a hash of all the bundle inputs.  build_bundles() builds several bundles at
+once, which is what send_to_s3 uses.  send_to_s3 also calls
+prune_build_cache() to remove entries that haven't been used for a while.
 """
 
+from multiprocessing.pool import ThreadPool
+import errno
+import hashlib
+import logging
 import os
+import stat
+import tempfile
 import time
 
 from django.contrib.sites.models import Site
@@ -40,6 +52,8 @@ from django.template.loader import render_to_string
 from staticmedia import utils
 import optionalapps
 
+logger = logging.getLogger(__name__)
+
 def media_directories():
     dirs = [
         os.path.join(settings.PROJECT_ROOT, 'media')
@@ -70,18 +84,67 @@ class Bundle(object):
     def paths(self):
         return [self.path(p) for p in self.config['files']]
 
+    def dependency_paths(self):
+        """Get paths to files that the build uses besides paths()
+
+        For example, SASS partials that our CSS files import.
+        """
+        return []
+
     def concatinate_files(self):
         return ''.join(open(p).read() for p in self.paths())
 
-    def build_contents(self):
-        """Build the contents of this bundle
+    def build_command(self):
+        """Get the command line to process the concatinated files with
 
         Subclasses of Bundle must implement this function
 
-        :returns: string representing the bundle
+        :returns: list of arguments or None to use the files unprocessed
         """
         raise NotImplementedError()
 
+    def compile(self, source):
+        return utils.run_command(self.build_command(), stdin=source)
+
+    def build_contents(self, source=None):
+        """Build the contents of this bundle
+
+        If the build cache has output for our inputs, then we return that
+        rather than running the build command again.
+
+        :param source: concatinated bundle files, if we already have them
+        :returns: string representing the bundle
+        """
+        if source is None:
+            source = self.concatinate_files()
+        if self.build_command() is None:
+            return source
+        cache_path = build_cache_path(self.fingerprint(source))
+        if cache_path is not None and os.path.exists(cache_path):
+            # Update the mtime so that prune_build_cache() keeps the entry
+            _touch(cache_path)
+            with open(cache_path) as f:
+                return f.read()
+        contents = self.compile(source)
+        if cache_path is not None:
+            _write_build_cache(cache_path, contents)
+        return contents
+
+    def fingerprint(self, source):
+        """Calculate a hash of everything that goes into building the bundle
+        """
+        if isinstance(source, unicode):
+            source = source.encode('utf-8')
+        hasher = hashlib.sha1()
+        hasher.update(repr(self.build_command()))
+        hasher.update('\0')
+        hasher.update(source)
+        for path in self.dependency_paths():
+            hasher.update('\0%s\0' % path)
+            with open(path) as f:
+                hasher.update(f.read())
+        return hasher.hexdigest()
+
     def get_url(self):
         """Get an URL that points to this bundle."""
         if settings.STATIC_MEDIA_USES_S3:
@@ -101,7 +164,8 @@ class Bundle(object):
     def modified_since(self, since):
         """Check if any of our files has been modified after a certain time
         """
-        return max(os.path.getmtime(p) for p in self.paths()) > since
+        paths = self.paths() + self.dependency_paths()
+        return max(os.path.getmtime(p) for p in paths) > since
 
     def cache_key(self):
         return 'staticmedia:bundle:%s' % self.name
@@ -112,16 +176,27 @@ class Bundle(object):
         The first time this method is called, we will build the bundle, then
         store the result in the django cache.
 
-        On subsequent calls, we will only build the bundle again if one of our
-        files has been modified since the last build.
+        If DEBUG is set, then on subsequent calls we will build the bundle
+        again if one of our files has been modified since the last build.
+        Otherwise we keep the built bundle in memory and never check the files
+        again.
         """
-        cached_value = cache.get(self.cache_key())
-        if cached_value is not None:
-            if not self.modified_since(cached_value[0]):
-                return cached_value[1]
+        if not settings.DEBUG:
+            try:
+                return _built_contents[self.name]
+            except KeyError:
+                pass
+        else:
+            cached_value = cache.get(self.cache_key())
+            if cached_value is not None:
+                if not self.modified_since(cached_value[0]):
+                    return cached_value[1]
         cache_time = time.time()
         rv = self.build_contents()
-        cache.set(self.cache_key(), (cache_time, rv))
+        if not settings.DEBUG:
+            _built_contents[self.name] = rv
+        else:
+            cache.set(self.cache_key(), (cache_time, rv))
         return rv
 
 class JavascriptBundle(Bundle):
@@ -150,12 +225,11 @@ class JavascriptBundle(Bundle):
         else:
             return content
 
-    def build_contents(self):
-        source_code = self.concatinate_files()
+    def build_command(self):
         if settings.STATIC_MEDIA_COMPRESSED:
-            return utils.run_command(['uglifyjs'], stdin=source_code)
+            return ['uglifyjs']
         else:
-            return source_code
+            return None
 
 class CSSBundle(Bundle):
     """Bundle CSS files
@@ -173,8 +247,7 @@ class CSSBundle(Bundle):
     mime_type = 'text/css'
     bundle_type = 'css'
 
-    def build_contents(self):
-        source_css = self.concatinate_files()
+    def build_command(self):
         if settings.STATIC_MEDIA_COMPRESSED:
             sass_type = 'compressed'
         else:
@@ -185,7 +258,113 @@ class CSSBundle(Bundle):
         for path in media_directories():
             cmdline.extend(['--load-path', os.path.join(path, 'css')])
         cmdline.extend(['--scss', '--stdin'])
-        return utils.run_command(cmdline, stdin=source_css)
+        return cmdline
+
+    def dependency_paths(self):
+        paths = []
+        for media_dir in media_directories():
+            css_dir = os.path.join(media_dir, 'css')
+            for dirpath, dirs, files in os.walk(css_dir):
+                dirs.sort()
+                paths.extend(
+                    os.path.join(dirpath, filename)
+                    for filename in sorted(files)
+                    if filename.startswith('_') and
+                    filename.endswith(('.scss', '.sass'))
+                )
+        return paths
+
+# Bundles built when DEBUG is False, keyed by name
+_built_contents = {}
+
+def build_cache_dir():
+    """Get the build cache directory, creating it if needed
+
+    We use whatever we find in the directory as the bundle output, so we
+    only use it if it's owned by us and nobody else can write to it.
+
+    :returns: directory path, or None if the build cache is disabled or the
+        directory isn't safe to use
+    """
+    cache_dir = settings.STATIC_MEDIA_BUILD_CACHE_DIR
+    if cache_dir is None:
+        return None
+    try:
+        os.makedirs(cache_dir, 0700)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            raise
+    st = os.stat(cache_dir)
+    if (st.st_uid != os.getuid() or
+            st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+        logger.warn("Not using bundle build cache %s: it must be owned by "
+                    "us and not writable by others", cache_dir)
+        return None
+    return cache_dir
+
+def build_cache_path(fingerprint):
+    cache_dir = build_cache_dir()
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, fingerprint)
+
+def prune_build_cache(max_age=None):
+    """Remove build cache entries that haven't been used recently
+
+    :param max_age: remove entries older than this many seconds.  Defaults
+        to STATIC_MEDIA_BUILD_CACHE_MAX_AGE.
+    """
+    cache_dir = build_cache_dir()
+    if cache_dir is None:
+        return
+    if max_age is None:
+        max_age = settings.STATIC_MEDIA_BUILD_CACHE_MAX_AGE
+    cutoff = time.time() - max_age
+    for filename in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, filename)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            # Another process removed the file first
+            pass
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _write_build_cache(cache_path, contents):
+    cache_dir = os.path.dirname(cache_path)
+    # Write to a temp file, then rename it so that other processes never see
+    # a partially written file.
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(contents)
+    os.rename(temp_path, cache_path)
+
+def build_bundles(bundle_list, threads=4):
+    """Build several bundles at once
+
+    The slow part of building bundles is running uglifyjs/sass, which happens
+    in a subprocess.  We use a pool of threads to run several of those
+    subprocesses at once.  The bundle files are read and concatinated in the
+    calling thread, since that can touch the database.
+
+    :returns: list of bundle contents, in the same order as bundle_list
+    """
+    sources = [bundle.concatinate_files() for bundle in bundle_list]
+    pool = ThreadPool(threads)
+    try:
+        return pool.map(_build_bundle, zip(bundle_list, sources))
+    finally:
+        pool.close()
+        pool.join()
+
+def _build_bundle(args):
+    bundle, source = args
+    return bundle.build_contents(source)
 
 _type_to_bundle_class = {
     'js': JavascriptBundle,
@@ -0,0 +1,99 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Compiled per-locale javascript
+
+We serve 2 scripts for each locale: the javascript i18n catalog and the
+language data script from staticmedia.jslanguagedata.  Their contents only
+change when we deploy, so we build each one once per process and keep the
+result in memory.  The local views and the send_to_s3 command both use this
+module, so they serve the exact same bytes.
+"""
+
+from __future__ import absolute_import
+import os
+
+from django.conf import settings
+from django.utils import translation
+
+from staticmedia.jsi18ncompat import (get_javascript_catalog,
+                                      render_javascript_catalog)
+from staticmedia.jslanguagedata import render_js_language_script
+from utils.http import make_etag
+
+class LocaleScript(object):
+    """Compiled javascript for a locale
+
+    Attributes:
+        content: bytestring with the javascript code
+        etag: ETag for content
+    """
+    def __init__(self, content):
+        self.content = content
+        self.etag = make_etag(content.decode('utf-8'))
+
+def build_js_i18n_catalog(locale):
+    catalog, plural = get_javascript_catalog(locale, 'djangojs', [])
+    return render_javascript_catalog(catalog, plural).content
+
+def build_js_language_data(locale):
+    return render_js_language_script()
+
+_builders = {
+    'jsi18catalog': build_js_i18n_catalog,
+    'jslanguagedata': build_js_language_data,
+}
+_compiled = {}
+_all_locales = None
+
+def all_locales():
+    """Get all locales that we have javascript translations for."""
+    global _all_locales
+    if _all_locales is None:
+        locale_dir = os.path.join(settings.PROJECT_ROOT, 'locale')
+        _all_locales = frozenset(
+            child for child in os.listdir(locale_dir)
+            if os.path.exists(os.path.join(
+                locale_dir, child, 'LC_MESSAGES/djangojs.mo'))
+        )
+    return _all_locales
+
+def get_js_i18n_catalog(locale):
+    return _get_script('jsi18catalog', locale)
+
+def get_js_language_data(locale):
+    return _get_script('jslanguagedata', locale)
+
+def _get_script(script_type, locale):
+    key = (script_type, locale)
+    try:
+        return _compiled[key]
+    except KeyError:
+        pass
+    with translation.override(locale):
+        script = LocaleScript(_builders[script_type](locale))
+    # Only store scripts for locales that we know about.  The locale comes
+    # from the URL, so we don't want to grow _compiled without limit.
+    if locale in all_locales():
+        _compiled[key] = script
+    return script
+
+def clear_cache():
+    global _all_locales
+    _compiled.clear()
+    _all_locales = None
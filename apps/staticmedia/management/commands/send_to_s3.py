@@ -17,27 +17,28 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
 import datetime
 import email
 import gzip
+import hashlib
 import mimetypes
 import time
 import optparse
 import os
+import threading
 
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.utils.translation import to_locale, activate
+from django.utils.translation import to_locale
 
 from deploy.git_helpers import get_current_commit_hash
 from staticmedia import bundles
+from staticmedia import localescripts
 from staticmedia import oldembedder
 from staticmedia import utils
-from staticmedia.jsi18ncompat import (get_javascript_catalog,
-                                      render_javascript_catalog)
-from staticmedia.jslanguagedata import render_js_language_script
 
 class Command(BaseCommand):
     help = """Upload static media to S3 """
@@ -47,7 +48,11 @@ class Command(BaseCommand):
                              action='store_true', default=False,
                              help="Don't check the git commit in commit.py"),
         optparse.make_option('--no-gzip', dest='gzip', action='store_false',
-                             default=True, help="Don't gzip files")
+                             default=True, help="Don't gzip files"),
+        optparse.make_option('--threads', dest='threads', type='int',
+                             default=8,
+                             help="Number of bundles to build and files to "
+                             "upload at once"),
     )
 
     def handle(self, *args, **options):
@@ -63,6 +68,7 @@ class Command(BaseCommand):
         self.upload_js_catalogs()
         self.upload_js_language_data()
         self.upload_old_embedder()
+        self.run_uploads()
 
     def setup_s3_subdir(self):
         self.s3_subdirectory = utils.s3_subdirectory()
@@ -79,20 +85,57 @@ class Command(BaseCommand):
         self.conn = S3Connection(settings.AWS_ACCESS_KEY_ID,
                                  settings.AWS_SECRET_ACCESS_KEY)
         self.bucket = self.conn.get_bucket(settings.STATIC_MEDIA_S3_BUCKET)
+        self.thread_local = threading.local()
+        self.pending_uploads = []
+        self.existing_etags = self.fetch_existing_etags()
 
-    def log_upload(self, key):
+    def fetch_existing_etags(self):
+        """Get the ETags for files that we've already uploaded
+
+        This is used to skip uploading files that haven't changed.  It's
+        mostly useful when we re-run send_to_s3 for a commit.  The ETag only
+        covers the content, so we also check the headers before skipping a
+        file (see upload_key()).
+        """
+        keys = list(self.bucket.list(prefix=self.s3_subdirectory + '/'))
+        embed_key = self.bucket.get_key('embed.js')
+        if embed_key is not None:
+            keys.append(embed_key)
+        return dict((key.name, key.etag.strip('"')) for key in keys)
+
+    def thread_bucket(self):
+        """Get a bucket to use for the current thread
+
+        boto connections can't be shared between threads, so we create one
+        for each upload thread.
+        """
+        if not hasattr(self.thread_local, 'bucket'):
+            conn = S3Connection(settings.AWS_ACCESS_KEY_ID,
+                                settings.AWS_SECRET_ACCESS_KEY)
+            self.thread_local.bucket = conn.get_bucket(
+                settings.STATIC_MEDIA_S3_BUCKET, validate=False)
+        return self.thread_local.bucket
+
+    def log_upload(self, key_name, skipped=False):
         url_base = settings.STATIC_MEDIA_S3_URL_BASE
         if url_base.startswith("//"):
             # add http: for protocol-relative URLs
             url_base = "http:" + url_base
-        self.stdout.write("-> %s%s\n" % (url_base, key.name))
+        if skipped:
+            self.stdout.write("unchanged %s%s\n" % (url_base, key_name))
+        else:
+            self.stdout.write("-> %s%s\n" % (url_base, key_name))
 
     def build_bundles(self):
-        self.built_bundles = []
-        for bundle_name in settings.MEDIA_BUNDLES.keys():
-            bundle = bundles.get_bundle(bundle_name)
-            self.stdout.write("building %s\n" % bundle_name)
-            self.built_bundles.append((bundle, bundle.build_contents()))
+        bundle_list = [
+            bundles.get_bundle(bundle_name)
+            for bundle_name in settings.MEDIA_BUNDLES.keys()
+        ]
+        self.stdout.write("building %s bundles\n" % len(bundle_list))
+        contents = bundles.build_bundles(bundle_list,
+                                         self.options['threads'])
+        self.built_bundles = zip(bundle_list, contents)
+        bundles.prune_build_cache()
 
         self.stdout.write("building old embedder\n")
         self.old_embedder_js_code = oldembedder.js_code()
@@ -128,7 +171,10 @@ class Command(BaseCommand):
 
     def compress_string(self, data):
         zbuf = StringIO()
-        zfile = gzip.GzipFile(mode='wb', compresslevel=6, fileobj=zbuf)
+        # Use a fixed mtime so that the output only depends on data.  That
+        # way we can use the ETag to check if the file changed.
+        zfile = gzip.GzipFile(mode='wb', compresslevel=6, fileobj=zbuf,
+                              mtime=0)
         zfile.write(data)
         zfile.close()
         return zbuf.getvalue()
@@ -146,43 +192,75 @@ class Command(BaseCommand):
     def upload_js_catalogs(self):
         headers = self.cache_forever_headers()
         headers['Content-Type'] = 'application/javascript'
-        for locale in self.all_locales():
+        for locale in localescripts.all_locales():
             filename = "jsi18catalog/{}.js".format(locale)
-            activate(locale)
-            catalog, plural = get_javascript_catalog(locale, 'djangojs', [])
-            response = render_javascript_catalog(catalog, plural)
-            self.upload_string(filename, response.content, headers)
+            script = localescripts.get_js_i18n_catalog(locale)
+            self.upload_string(filename, script.content, headers)
 
     def upload_js_language_data(self):
         headers = self.cache_forever_headers()
         headers['Content-Type'] = 'application/javascript'
-        for locale in self.all_locales():
-            activate(locale)
+        for locale in localescripts.all_locales():
             filename = "jslanguagedata/{}.js".format(locale)
-            self.upload_string(filename, render_js_language_script(), headers)
-
-    def all_locales(self):
-        locale_dir = os.path.join(settings.PROJECT_ROOT, 'locale')
-        for child in os.listdir(locale_dir):
-            if os.path.exists(os.path.join(
-                    locale_dir, child, 'LC_MESSAGES/djangojs.mo')):
-                yield child
+            script = localescripts.get_js_language_data(locale)
+            self.upload_string(filename, script.content, headers)
 
     def upload_string(self, filename, content, headers,
                       store_in_s3_subdirectory=True):
+        """Queue up a file to upload
+
+        The files get uploaded when we call run_uploads().  We skip files
+        that are already on S3 with the same content and headers.
+        """
+        headers = headers.copy()
         content_type = headers.get('Content-Type', 'application/unknown')
         if self.should_gzip(content_type):
             content = self.compress_string(content)
             headers['Content-Encoding'] = 'gzip'
-        key = Key(bucket=self.bucket)
         if store_in_s3_subdirectory:
-            key.name = os.path.join(self.s3_subdirectory, filename)
+            key_name = os.path.join(self.s3_subdirectory, filename)
         else:
-            key.name = filename
-        self.log_upload(key)
+            key_name = filename
+        md5 = hashlib.md5(content).hexdigest()
+        same_content = (self.existing_etags.get(key_name) == md5)
+        self.pending_uploads.append((key_name, content, headers,
+                                     same_content))
+
+    def run_uploads(self):
+        pool = ThreadPool(self.options['threads'])
+        try:
+            pool.map(self.upload_key, self.pending_uploads)
+        finally:
+            pool.close()
+            pool.join()
+        self.pending_uploads = []
+
+    def upload_key(self, upload):
+        key_name, content, headers, same_content = upload
+        if same_content:
+            existing_key = self.thread_bucket().get_key(key_name)
+            if (existing_key is not None and
+                    self.headers_match(existing_key, headers)):
+                self.log_upload(key_name, skipped=True)
+                return
+        key = Key(bucket=self.thread_bucket(), name=key_name)
+        self.log_upload(key_name)
         key.set_contents_from_string(content, headers, replace=True,
                                      policy='public-read')
 
+    def headers_match(self, key, headers):
+        """Check if the headers stored on S3 match the ones we would send
+
+        We don't check Expires, since that's calculated from the current
+        time.  S3 doesn't store Pragma.
+        """
+        return (
+            key.cache_control == headers.get('Cache-Control') and
+            key.content_type == headers.get('Content-Type',
+                                            Key.DefaultContentType) and
+            key.content_encoding == headers.get('Content-Encoding')
+        )
+
     def upload_file(self, source_file, filename):
         self.upload_string(filename, open(source_file).read(),
                            self.headers_for_file(source_file))
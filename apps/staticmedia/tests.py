@@ -19,13 +19,18 @@
 from __future__ import absolute_import
 
 import os
+import shutil
+import tempfile
 
 from django.conf import settings
 from django.core.cache import cache
 from django.test import TestCase
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
 
 from staticmedia import bundles
+from staticmedia import localescripts
+from staticmedia import views
 from utils import test_utils
 
 @override_settings(MEDIA_BUNDLES={
@@ -163,6 +168,7 @@ class TestCaching(TestCase):
         self.assertEqual(self.bundle.cache_key(),
                          'staticmedia:bundle:bundle.js')
 
+    @override_settings(DEBUG=True)
     @test_utils.patch_for_test('staticmedia.bundles.Bundle.modified_since')
     @test_utils.patch_for_test('staticmedia.bundles.Bundle.build_contents')
     def test_get_contents(self, mock_build, mock_modified_since):
@@ -183,3 +189,113 @@ class TestCaching(TestCase):
         self.assertEqual(self.bundle.get_contents(), 'build-output')
         self.assertEqual(mock_build.call_count, 2)
         self.assertEqual(mock_modified_since.call_count, 2)
+
+    @override_settings(DEBUG=False)
+    @test_utils.patch_for_test('staticmedia.bundles.Bundle.modified_since')
+    @test_utils.patch_for_test('staticmedia.bundles.Bundle.build_contents')
+    def test_get_contents_production(self, mock_build, mock_modified_since):
+        bundles._built_contents.clear()
+        mock_build.return_value = 'build-output'
+        # When DEBUG is False, we should build the bundle once and never
+        # check the files again
+        self.assertEqual(self.bundle.get_contents(), 'build-output')
+        self.assertEqual(self.bundle.get_contents(), 'build-output')
+        self.assertEqual(mock_build.call_count, 1)
+        self.assertEqual(mock_modified_since.call_count, 0)
+        bundles._built_contents.clear()
+
+class TestBuildCache(TestCase):
+    @test_utils.patch_for_test('staticmedia.utils.run_command')
+    @test_utils.patch_for_test('staticmedia.bundles.media_directories')
+    def setUp(self, mock_media_directories, mock_run_command):
+        self.mock_run_command = mock_run_command
+        self.mock_run_command.return_value = 'test-compressed-output'
+        self.static_root = os.path.join(os.path.dirname(__file__), 'testdata')
+        mock_media_directories.return_value = [self.static_root]
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def make_bundle(self, files):
+        return bundles.JavascriptBundle('bundle.js', {
+            'files': files,
+        })
+
+    def build(self, files):
+        with self.settings(STATIC_MEDIA_COMPRESSED=True,
+                           STATIC_MEDIA_BUILD_CACHE_DIR=self.cache_dir):
+            return self.make_bundle(files).build_contents()
+
+    def test_reuse_output(self):
+        self.assertEqual(self.build(['foo.js', 'bar.js']),
+                         'test-compressed-output')
+        self.assertEqual(self.mock_run_command.call_count, 1)
+        # building with the same inputs should use the build cache
+        self.assertEqual(self.build(['foo.js', 'bar.js']),
+                         'test-compressed-output')
+        self.assertEqual(self.mock_run_command.call_count, 1)
+        # changing the inputs should result in another build
+        self.build(['bar.js', 'foo.js'])
+        self.assertEqual(self.mock_run_command.call_count, 2)
+
+    def test_unsafe_cache_dir(self):
+        # If other users can write to the cache dir, we shouldn't use it
+        os.chmod(self.cache_dir, 0777)
+        self.build(['foo.js'])
+        self.build(['foo.js'])
+        self.assertEqual(self.mock_run_command.call_count, 2)
+
+    def test_prune(self):
+        self.build(['foo.js'])
+        self.build(['bar.js'])
+        old_path, new_path = [os.path.join(self.cache_dir, filename)
+                              for filename in os.listdir(self.cache_dir)]
+        os.utime(old_path, (0, 0))
+        with self.settings(STATIC_MEDIA_BUILD_CACHE_DIR=self.cache_dir):
+            bundles.prune_build_cache(max_age=3600)
+        self.assertEqual(os.listdir(self.cache_dir),
+                         [os.path.basename(new_path)])
+
+    def test_build_bundles(self):
+        bundle_list = [
+            self.make_bundle(['foo.js']),
+            self.make_bundle(['bar.js']),
+        ]
+        with self.settings(STATIC_MEDIA_COMPRESSED=True,
+                           STATIC_MEDIA_BUILD_CACHE_DIR=self.cache_dir):
+            results = bundles.build_bundles(bundle_list, threads=2)
+        self.assertEqual(results, ['test-compressed-output'] * 2)
+        self.assertEqual(self.mock_run_command.call_count, 2)
+
+class TestLocaleScripts(TestCase):
+    def setUp(self):
+        localescripts.clear_cache()
+        self.factory = RequestFactory()
+
+    def test_compiled_once(self):
+        script = localescripts.get_js_i18n_catalog('fr')
+        self.assertIs(localescripts.get_js_i18n_catalog('fr'), script)
+        script = localescripts.get_js_language_data('fr')
+        self.assertIs(localescripts.get_js_language_data('fr'), script)
+
+    def test_unknown_locale_not_stored(self):
+        script = localescripts.get_js_i18n_catalog('not-a-locale')
+        self.assertIsNot(localescripts.get_js_i18n_catalog('not-a-locale'),
+                         script)
+
+    def test_view_headers(self):
+        script = localescripts.get_js_language_data('fr')
+        response = views.js_language_data(self.factory.get('/'), 'fr')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, script.content)
+        self.assertEqual(response['ETag'], '"{}"'.format(script.etag))
+        self.assertIn('max-age={}'.format(views.LOCALE_SCRIPT_MAX_AGE),
+                      response['Cache-Control'])
+
+    def test_if_none_match(self):
+        script = localescripts.get_js_i18n_catalog('fr')
+        request = self.factory.get(
+            '/', HTTP_IF_NONE_MATCH='"{}"'.format(script.etag))
+        response = views.js_i18n_catalog(request, 'fr')
+        self.assertEqual(response.status_code, 304)
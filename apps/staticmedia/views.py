@@ -21,15 +21,16 @@ import os
 from django.conf import settings
 from django.http import HttpResponse, Http404
 from django.shortcuts import render
-from django.utils.translation import activate
 from django.views import static
 
 from staticmedia import bundles
+from staticmedia import localescripts
 from staticmedia import oldembedder
 from staticmedia import utils
-from staticmedia.jsi18ncompat import (get_javascript_catalog,
-                                      render_javascript_catalog)
-from staticmedia.jslanguagedata import render_js_language_script
+from utils.http import not_modified, not_modified_response, set_cache_headers
+
+# Clients can use the locale scripts for this long before revalidating them
+LOCALE_SCRIPT_MAX_AGE = 60 * 60 * 24
 
 def js_bundle(request, bundle_name):
     return _bundle(request, bundle_name, bundles.JavascriptBundle)
@@ -47,12 +48,24 @@ def _bundle(request, bundle_name, correct_type):
     return HttpResponse(bundle.get_contents(), bundle.mime_type)
 
 def js_i18n_catalog(request, locale):
-    catalog, plural = get_javascript_catalog(locale, 'djangojs', [])
-    return render_javascript_catalog(catalog, plural)
+    return _locale_script(request,
+                          localescripts.get_js_i18n_catalog(locale))
 
 def js_language_data(request, locale):
-    activate(locale)
-    return HttpResponse(render_js_language_script(), 'application/javascript')
+    return _locale_script(request,
+                          localescripts.get_js_language_data(locale))
+
+def _locale_script(request, script):
+    cache_info = {
+        'etag': script.etag,
+        'public': True,
+        'max_age': LOCALE_SCRIPT_MAX_AGE,
+    }
+    if not_modified(request, script.etag):
+        return not_modified_response(**cache_info)
+    response = HttpResponse(script.content, 'application/javascript')
+    set_cache_headers(response, **cache_info)
+    return response
 
 def old_embedder_js(request):
     return HttpResponse(oldembedder.js_code(), 'text/javascript')
@@ -0,0 +1,70 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from subtitles.models import SubtitleVersion
+
+class Command(BaseCommand):
+    help = "Calculate content/timing digests for old subtitle versions"
+    option_list = BaseCommand.option_list + (
+        make_option('-b', '--batch-size', dest='batch-size', default=500,
+                    type='int',
+                    help='Number of version ids to process at once'),
+        make_option('-s', '--start-id', dest='start-id', default=0,
+                    type='int',
+                    help='Start with this version id (to resume a run)'),
+        make_option('-d', '--delay', dest='delay', default=0, type='float',
+                    help='Seconds to sleep between batches'),
+    )
+
+    def handle(self, **options):
+        max_id = SubtitleVersion.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            return
+        start_id = options['start-id']
+        while start_id <= max_id:
+            end_id = start_id + options['batch-size'] - 1
+            count = self.backfill(start_id, end_id)
+            self.stdout.write('updated {} versions up to id {}/{}\n'.format(
+                count, end_id, max_id))
+            self.stdout.flush()
+            start_id = end_id + 1
+            if options['delay']:
+                time.sleep(options['delay'])
+
+    def backfill(self, start_id, end_id):
+        versions = (SubtitleVersion.objects
+                    .filter(id__range=(start_id, end_id), content_digest='')
+                    .only('id', 'language_code', 'serialized_subtitles'))
+        count = 0
+        with transaction.commit_on_success():
+            for version in versions:
+                version.calc_digests()
+                # Use update() to avoid running SubtitleVersion.save()
+                SubtitleVersion.objects.filter(id=version.id).update(
+                    content_digest=version.content_digest,
+                    timing_digest=version.timing_digest)
+                count += 1
+        return count
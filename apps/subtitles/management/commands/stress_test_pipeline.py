@@ -0,0 +1,149 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Stress test adding subtitle versions from many threads
+
+Usage:
+
+    manage.py stress_test_pipeline [<video-id>] --threads 20 --versions 10
+
+Each thread adds --versions versions to the video, cycling through
+--languages languages.  If no video id is given, we create a new video.  At
+the end we check that each language has versions numbered 1 to N with no
+gaps or duplicates, and print the errors and the time spent waiting for
+locks.
+
+This needs a database with row locking, like MySQL.  It won't work with the
+sqlite test database.
+"""
+
+from collections import defaultdict
+from optparse import make_option
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from subtitles import pipeline
+from subtitles.models import SubtitleVersion
+from utils import codes
+from utils import metrics
+from videos.models import Video
+
+LANGUAGE_CODES = ['en', 'fr', 'de', 'es', 'it', 'pt-br', 'ja', 'ko', 'ru',
+                  'ar']
+
+class Command(BaseCommand):
+    args = '[<video-id>]'
+    help = "Add subtitle versions from many threads at once"
+    option_list = BaseCommand.option_list + (
+        make_option('-t', '--threads', dest='threads', default=10,
+                    type='int', help='Number of threads to run'),
+        make_option('-n', '--versions', dest='versions', default=10,
+                    type='int', help='Number of versions for each thread '
+                    'to add'),
+        make_option('-l', '--languages', dest='languages', default=2,
+                    type='int', help='Number of languages to add versions '
+                    'to (max {})'.format(len(LANGUAGE_CODES))),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            try:
+                video = Video.objects.get(video_id=args[0])
+            except Video.DoesNotExist:
+                raise CommandError('No video with id {}'.format(args[0]))
+        else:
+            video = Video.objects.create(video_id=codes.make_code(),
+                                         title='Pipeline stress test')
+            self.stdout.write('created video {}\n'.format(video.video_id))
+        language_codes = LANGUAGE_CODES[:options['languages']]
+        start_numbers = dict(
+            (language_code, self.version_numbers(video, language_code))
+            for language_code in language_codes)
+
+        metrics.install()
+        self.lock = threading.Lock()
+        self.errors = defaultdict(int)
+        self.lock_waits = []
+        threads = [
+            threading.Thread(target=self.run_thread,
+                             args=(video.id, i, language_codes,
+                                   options['versions']))
+            for i in xrange(options['threads'])
+        ]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+        self.stdout.write('added {} versions in {:.2f}s\n'.format(
+            len(self.lock_waits), elapsed))
+        for error, count in sorted(self.errors.items()):
+            self.stdout.write('    {} x {}\n'.format(count, error))
+        if self.lock_waits:
+            self.stdout.write(
+                'lock wait  avg: {:.3f}s  max: {:.3f}s\n'.format(
+                    sum(self.lock_waits) / len(self.lock_waits),
+                    max(self.lock_waits)))
+        self.check_version_numbers(video, language_codes, start_numbers)
+
+    def run_thread(self, video_id, thread_num, language_codes, count):
+        try:
+            video = Video.objects.get(id=video_id)
+            for i in xrange(count):
+                language_code = language_codes[(thread_num + i) %
+                                               len(language_codes)]
+                subtitles = [
+                    (i * 1000, i * 1000 + 500,
+                     'thread {} version {}'.format(thread_num, i)),
+                ]
+                metrics.start()
+                try:
+                    pipeline.add_subtitles(video, language_code, subtitles)
+                except Exception, e:
+                    with self.lock:
+                        self.errors[type(e).__name__] += 1
+                    metrics.stop()
+                    continue
+                data = metrics.stop()
+                with self.lock:
+                    self.lock_waits.append(
+                        data.get('subtitle_lock_wait_time', 0))
+        finally:
+            connection.close()
+
+    def version_numbers(self, video, language_code):
+        return list(SubtitleVersion.objects.full()
+                    .filter(video=video, language_code=language_code)
+                    .order_by('version_number')
+                    .values_list('version_number', flat=True))
+
+    def check_version_numbers(self, video, language_codes, start_numbers):
+        for language_code in language_codes:
+            numbers = self.version_numbers(video, language_code)
+            if numbers == range(1, len(numbers) + 1):
+                self.stdout.write('{}: {} new versions, numbering OK\n'.format(
+                    language_code,
+                    len(numbers) - len(start_numbers[language_code])))
+            else:
+                self.stdout.write('{}: bad version numbers: {}\n'.format(
+                    language_code, numbers))
@@ -19,11 +19,14 @@
 """Django models represention subtitles."""
 
 import collections
+import hashlib
 import itertools
 import json
 import logging
 from datetime import datetime, date, timedelta
 
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.db import models
@@ -43,6 +46,7 @@ from babelsubs import load_from
 from subtitles import signals
 from utils import dates
 from utils.compress import compress, decompress
+from utils.http import make_etag
 from utils.subtitles import create_new_subtitles
 from utils import translation
 from videos.behaviors import make_video_title
@@ -1352,6 +1356,16 @@ SUBTITLE_VERSION_ORIGINS = (
     (ORIGIN_WEB_EDITOR, _("Through web editor")),
 )
 
+def calc_digest(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+def calc_timing_digest(subtitles):
+    """Calculate a digest for the timings of a SubtitleSet."""
+    return calc_digest(','.join('{}-{}'.format(s.start_time, s.end_time)
+                                for s in subtitles))
+
 class SubtitleVersion(models.Model):
     """SubtitleVersions are the equivalent of a 'changeset' in a VCS.
 
@@ -1438,6 +1452,13 @@ class SubtitleVersion(models.Model):
     # You shouldn't be touching this field.
     serialized_subtitles = models.TextField()
 
+    # SHA1 digests of the subtitle XML and of the subtitle timings, set in
+    # set_subtitles().  These let us check if 2 versions have the same
+    # content/timings without parsing the subtitles.  They are blank for old
+    # versions that haven't been backfilled yet.
+    content_digest = models.CharField(max_length=40, blank=True, default='')
+    timing_digest = models.CharField(max_length=40, blank=True, default='')
+
     # Lineage is stored as a blob of JSON to save on DB rows.  You shouldn't
     # need to touch this field yourself, use the lineage property.
     serialized_lineage = models.TextField(blank=True)
@@ -1500,12 +1521,92 @@ class SubtitleVersion(models.Model):
                 raise TypeError("Cannot create SubtitleSet from type %s"
                                 % str(type(subtitles)))
 
+        xml = subtitles.to_xml()
         self.subtitle_count = len(subtitles)
-        self.serialized_subtitles = compress(subtitles.to_xml())
+        self.serialized_subtitles = compress(xml)
+        self.content_digest = calc_digest(xml)
+        self.timing_digest = calc_timing_digest(subtitles)
 
         # We cache the parsed subs for speed.
         self._subtitles = subtitles
 
+    def calc_digests(self):
+        """Calculate content_digest and timing_digest from the stored
+        subtitles.
+
+        This is used to backfill the digests for old versions.
+        """
+        self.content_digest = calc_digest(
+            decompress(self.serialized_subtitles))
+        self.timing_digest = calc_timing_digest(self.get_subtitles())
+
+    def has_same_content(self, other):
+        """Check if another version has the same subtitles as this one."""
+        if self.content_digest and other.content_digest:
+            return self.content_digest == other.content_digest
+        return (decompress(self.serialized_subtitles) ==
+                decompress(other.serialized_subtitles))
+
+    def has_same_timings(self, other):
+        """Check if another version has the same subtitle timings as this
+        one.
+        """
+        if self.timing_digest and other.timing_digest:
+            return self.timing_digest == other.timing_digest
+        return (calc_timing_digest(self.get_subtitles()) ==
+                calc_timing_digest(other.get_subtitles()))
+
+    @property
+    def etag(self):
+        """ETag for the subtitle data of this version."""
+        if not self.content_digest:
+            self.content_digest = calc_digest(
+                decompress(self.serialized_subtitles))
+        return self.content_digest
+
+    def http_etag(self, *extra):
+        """ETag for HTTP responses that render this version
+
+        This combines the version id, the subtitle data, and the version of
+        the video's CacheGroup, which changes when the video or its languages
+        change.  Pass any other values that the response depends on, like
+        the output format, as extra.
+        """
+        return make_etag(self.id, self.etag,
+                         self.video.cache.get_version(), *extra)
+
+    def http_cache_info(self, sub_format, *extra):
+        """Get HTTP caching info for responses that render this version
+
+        We don't send Last-Modified.  The version that these endpoints serve
+        can change without any new version being created (for example when
+        the tip gets unpublished), so the ETag is the only reliable
+        validator.
+
+        The response is only marked public if anonymous users could fetch it
+        too, including the subtitle format check.  Otherwise a shared cache
+        could serve a restricted format to everyone.
+
+        Args:
+            sub_format: subtitle format that the response renders
+            extra: other values that the response depends on
+
+        Returns:
+            dict of keyword arguments for utils.http.set_cache_headers() and
+            not_modified_response()
+        """
+        from subtitles.permissions import user_can_access_subtitles_format
+
+        anonymous_user = AnonymousUser()
+        workflow = self.video.get_workflow()
+        return {
+            'etag': self.http_etag(sub_format, *extra),
+            'public': (self.is_public() and
+                       workflow.user_can_view_video(anonymous_user) and
+                       user_can_access_subtitles_format(anonymous_user,
+                                                        sub_format)),
+            'max_age': settings.SUBTITLES_CACHE_MAX_AGE,
+        }
 
     def get_lineage(self):
         # We cache the parsed lineage for speed.
@@ -1654,6 +1755,10 @@ class SubtitleVersion(models.Model):
         if not parent:
             return (1.0, 1.0)
 
+        if self.has_same_content(parent):
+            self._text_change = self._time_change = 0.0
+            return (0.0, 0.0)
+
         self._text_change, self._time_change = calc_changes(
             parent.get_subtitles(), self.get_subtitles(),
             HTMLGenerator.MAPPINGS)
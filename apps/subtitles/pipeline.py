@@ -54,9 +54,10 @@ a nutshell:
 
 """
 
-from django.db import transaction
+import time
+
+from django.db import IntegrityError, transaction
 
-from videos.models import Video
 from subtitles.models import (
     SubtitleLanguage, SubtitleVersion, ORIGIN_ROLLBACK, ORIGIN_API,
     ORIGIN_UPLOAD, ORIGIN_WEB_EDITOR
@@ -64,6 +65,7 @@ from subtitles.models import (
 from subtitles import signals
 from subtitles import workflows
 from teams.signals import api_subtitles_edited
+from utils import metrics
 
 # Utility Functions -----------------------------------------------------------
 def _strip_nones(d):
@@ -319,10 +321,36 @@ def _update_followers(subtitle_language, author):
     if author:
         subtitle_language.followers.add(author)
 
+def _update_followers_batch(subtitle_languages, author):
+    """Update language followers for several languages at once.
+
+    This adds all the languages with 1 query to check the existing rows and
+    1 INSERT, rather than 2 queries per language.
+    """
+    if author and subtitle_languages:
+        author.new_followed_languages.add(*subtitle_languages)
+
 def _fork_dependents(subtitle_language):
     for dsl in subtitle_language.get_dependent_subtitle_languages(direct=True):
         dsl.fork()
 
+def _fork_dependents_batch(video, subtitle_languages):
+    """Fork the direct dependents of several languages of a video.
+
+    This works like calling _fork_dependents() for each language, but only
+    loads the video's languages once.
+    """
+    if not subtitle_languages:
+        return
+    source_codes = set(sl.language_code for sl in subtitle_languages)
+    for dsl in video.newsubtitlelanguage_set.exclude(is_forked=True):
+        source_code = dsl.get_translation_source_language_code()
+        if (source_code in source_codes and
+                source_code != dsl.language_code):
+            tip = dsl.get_tip()
+            if tip and source_code in tip.lineage:
+                dsl.fork()
+
 def _get_version(video, v):
     """Get the appropriate SV belonging to the given video.
 
@@ -354,14 +382,40 @@ def _get_language(video, language_code):
 
     """
     try:
-        # Use select_for_update() to lock the row for the language we're about
-        # to update.  Since we know that we're going to do some work, then
-        # update the language, locking at the start prevents deadlocks.
-        return (SubtitleLanguage.objects.select_for_update()
-              .get(video=video, language_code=language_code))
+        return _lock_language(video, language_code)
     except SubtitleLanguage.DoesNotExist:
-        return SubtitleLanguage.objects.create(video=video,
-                                               language_code=language_code)
+        pass
+    # There's no row to lock yet, so another process could be creating the
+    # language at the same time.  If it wins, our insert fails on the unique
+    # constraint.  In that case, lock the row it created instead.
+    sid = transaction.savepoint()
+    try:
+        subtitle_language = SubtitleLanguage.objects.create(
+            video=video, language_code=language_code)
+    except IntegrityError:
+        transaction.savepoint_rollback(sid)
+        return _lock_language(video, language_code)
+    else:
+        transaction.savepoint_commit(sid)
+        return subtitle_language
+
+def _lock_language(video, language_code):
+    """Fetch a SubtitleLanguage and lock its row.
+
+    Locking the language serializes adding versions to it, which is what keeps
+    version numbers unique.  Other languages for the video aren't blocked.
+    Since we know that we're going to do some work, then update the language,
+    locking at the start prevents deadlocks.
+
+    The time spent waiting for the lock is recorded as the
+    subtitle_lock_wait metric.
+    """
+    start = time.time()
+    try:
+        return (SubtitleLanguage.objects.select_for_update()
+                .get(video=video, language_code=language_code))
+    finally:
+        metrics.record('subtitle_lock_wait', time.time() - start)
 
 def _timings_changed(subtitle_language, new_version):
     """Calculate if the number of subtitles or the timings the subtitles have
@@ -370,11 +424,7 @@ def _timings_changed(subtitle_language, new_version):
     previous_version = new_version.previous_version()
     if previous_version is None:
         return False
-    new_timings = [(s.start_time, s.end_time)
-                   for s in new_version.get_subtitles()]
-    old_timings = [(s.start_time, s.end_time)
-                   for s in previous_version.get_subtitles()]
-    return new_timings != old_timings
+    return not new_version.has_same_timings(previous_version)
 
 
 def _add_subtitles(video, sl, subtitles, title, duration, description, author,
@@ -385,12 +435,28 @@ def _add_subtitles(video, sl, subtitles, title, duration, description, author,
 
     This function is the meat of the subtitle pipeline.  The user-facing
     add_subtitles is a thin wrappers around this.
+
+    The caller must have locked sl (see _get_language()) in the current
+    transaction.
     """
-    # Use select_for_update() to lock the row for our video.  We know
-    # that we're going to do some work, then potentially update the video,
-    # locking at the start prevents deadlocks.
-    Video.objects.select_for_update(id=video.id)
+    version = _add_version(video, sl, subtitles, title, duration, description,
+                           author, visibility, visibility_override, parents,
+                           rollback_of_version_number, committer, created,
+                           note, origin, metadata, action)
+    _update_followers(sl, author)
+    if _fork_for_new_version(sl, version, origin):
+        _fork_dependents(sl)
+    return version
 
+def _add_version(video, sl, subtitles, title, duration, description, author,
+                 visibility, visibility_override, parents,
+                 rollback_of_version_number, committer, created, note,
+                 origin, metadata, action):
+    """Create the new version and run the team/action code for it
+
+    This is _add_subtitles() without updating the followers and forking.
+    add_subtitles_batch() uses it to do those for all languages at once.
+    """
     data = {'title': title, 'duration': duration, 'description': description, 'author': author,
             'visibility': visibility, 'visibility_override': visibility_override,
             'parents': [_get_version(video, p) for p in (parents or [])],
@@ -403,17 +469,24 @@ def _add_subtitles(video, sl, subtitles, title, duration, description, author,
     if action:
         action.validate(author, video, sl, version)
         action.update_language(author, video, sl, version)
-    _update_followers(sl, author)
+    return version
+
+def _fork_for_new_version(sl, version, origin):
+    """Handle forking after adding a new version
+
+    Returns True if the dependents of sl should be forked.
+    """
     if origin in (ORIGIN_UPLOAD, ORIGIN_API):
-        _fork_dependents(sl)
+        return True
     elif origin == ORIGIN_WEB_EDITOR and _timings_changed(sl, version):
         # fork languages when they are edited in the new editor, since it's
         # easy to make things out-of-sync from the source language.  Once we
         # switch over to only using the new editor, we can get rid of the
         # entire concept of forking.
         sl.fork()
-        _fork_dependents(sl)
-    return version
+        return True
+    else:
+        return False
 
 def _rollback_to(video, subtitle_language, version_number, rollback_author):
     current = subtitle_language.get_tip(full=True)
@@ -471,7 +544,7 @@ def add_subtitles(video, language_code, subtitles,
                   visibility=None, visibility_override=None,
                   parents=None, committer=None, complete=None,
                   created=None, note=None, origin=None, metadata=None,
-                  action=None, duration=None):
+                  action=None, duration=None, skip_unchanged=False):
     """Add subtitles in the language to the video.  It all starts here.
 
     This function is your main entry point to the subtitle pipeline.
@@ -520,6 +593,10 @@ def add_subtitles(video, language_code, subtitles,
     Created should be a datetime that will set the "created" date for the
     resulting version.  If not given it will default to today.
 
+    If skip_unchanged is True and the new version would be identical to the
+    current tip (same subtitles and no other changes), then we don't create a
+    new version and return the tip instead.
+
     """
     # complete and action do similar things.  In _add_subtitles _add_subtitles
     # we only want to deal with action, not complete.  this 
@@ -530,6 +607,16 @@ def add_subtitles(video, language_code, subtitles,
         visibility = action.subtitle_visibility
     with transaction.commit_on_success():
         subtitle_language = _get_language(video, language_code)
+        if skip_unchanged:
+            # Parse the subtitles once here and pass the SubtitleSet along
+            new_version = SubtitleVersion(language_code=language_code,
+                                          subtitles=subtitles)
+            subtitles = new_version.get_subtitles()
+            tip = subtitle_language.get_tip()
+            if _is_unchanged(tip, new_version, title, description,
+                             visibility, visibility_override, parents,
+                             metadata, duration, action):
+                return tip
         subtitle_language.freeze()
         version = _add_subtitles(video, subtitle_language, subtitles, title,
                                  duration, description, author, visibility,
@@ -543,15 +630,101 @@ def add_subtitles(video, language_code, subtitles,
 
     return version
 
+def add_subtitles_batch(video, subtitles_list, title=None, description=None,
+                        author=None, visibility=None, visibility_override=None,
+                        committer=None, complete=None, created=None,
+                        note=None, origin=None, action=None):
+    """Add subtitles for several languages of a video at once.
+
+    This works like calling add_subtitles() for each language, but is faster
+    when adding many languages at once, for example when importing all of
+    a video's subtitles from YouTube:
+
+    * All versions are added in a single transaction.  If adding any of them
+      fails, none of them are added.
+    * The video workflow and team video are looked up once for the batch.
+    * Signals for the languages are held until all versions are created.
+    * The video cache is invalidated once and video_changed_tasks is
+      scheduled once, rather than once per language.
+    * The author is added as a follower of all the languages at once, and
+      dependent languages are forked in a single pass over the video's
+      languages.
+
+    subtitles_list should be a list of (language_code, subtitles) tuples.
+    Subtitles can be given in any format that add_subtitles() accepts.  The
+    other arguments work like add_subtitles() and apply to every language.
+
+    Returns a list of the new SubtitleVersions, in the same order as
+    subtitles_list.
+
+    """
+    from videos.tasks import video_changed_tasks
+
+    workflow = workflows.get_workflow(video)
+    actions = [
+        _calc_action_for_add_subtitles(video, language_code, author,
+                                       complete, action, workflow)
+        for language_code, subtitles in subtitles_list
+    ]
+    subtitle_languages = []
+    versions = []
+    fork_sources = []
+    with transaction.commit_on_success():
+        for (language_code, subtitles), language_action in zip(subtitles_list,
+                                                               actions):
+            if language_action:
+                language_visibility = language_action.subtitle_visibility
+            else:
+                language_visibility = visibility
+            subtitle_language = _get_language(video, language_code)
+            # Share our video object, so that lookups like get_team_video()
+            # happen once for the batch
+            subtitle_language.video = video
+            subtitle_language.freeze()
+            subtitle_languages.append(subtitle_language)
+            version = _add_version(
+                video, subtitle_language, subtitles, title, None,
+                description, author, language_visibility,
+                visibility_override, None, None, committer, created, note,
+                origin, None, language_action)
+            versions.append(version)
+            if _fork_for_new_version(subtitle_language, version, origin):
+                fork_sources.append(subtitle_language)
+        _update_followers_batch(subtitle_languages, author)
+        _fork_dependents_batch(video, fork_sources)
+    video.cache.invalidate()
+    for version, language_action in zip(versions, actions):
+        api_subtitles_edited.send(version)
+        if language_action:
+            language_action.perform(author, video, version.subtitle_language,
+                                    version)
+    for subtitle_language in subtitle_languages:
+        subtitle_language.thaw()
+    if versions:
+        video_changed_tasks.delay(video.pk)
+    return versions
+
+def _is_unchanged(tip, new_version, title, description, visibility,
+                  visibility_override, parents, metadata, duration, action):
+    """Check if adding a new version would be a no-op."""
+    if tip is None or parents or metadata or duration or action:
+        return False
+    return (tip.has_same_content(new_version) and
+            title in (None, tip.title) and
+            description in (None, tip.description) and
+            visibility in (None, tip.visibility) and
+            visibility_override in (None, tip.visibility_override))
+
 def _calc_action_for_add_subtitles(video, language_code, author, complete,
-                                   action_name):
+                                   action_name, workflow=None):
     # complete and action do similar things.  In _add_subtitles _add_subtitles
     # we only want to deal with action, not complete.  this 
 
     if action_name and complete is not None:
         raise ValueError("Both action and complete set")
 
-    workflow = workflows.get_workflow(video)
+    if workflow is None:
+        workflow = workflows.get_workflow(video)
     if action_name:
         return workflow.lookup_action(author, language_code, action_name)
     else:
@@ -577,10 +750,9 @@ def rollback_to(video, language_code, version_number,
     left in a consistent state.
 
     """
-    subtitle_language = SubtitleLanguage.objects.get(video=video,
-                                                     language_code=language_code)
-    subtitle_language.freeze()
     with transaction.commit_on_success():
+        subtitle_language = _lock_language(video, language_code)
+        subtitle_language.freeze()
         version = _rollback_to(video, subtitle_language, version_number,
                                rollback_author)
     video.cache.invalidate()
@@ -24,15 +24,17 @@ from __future__ import absolute_import
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from nose.tools import *
+import mock
 
 from babelsubs.storage import SubtitleSet, SubtitleLine
 
 from auth.models import CustomUser as User
 from subtitles import pipeline
-from subtitles.models import SubtitleLanguage, SubtitleVersion
+from subtitles.models import ORIGIN_API, SubtitleLanguage, SubtitleVersion
 from subtitles.tests.utils import make_video, make_video_2
 from subtitles.tests.test_workflows import TestAction
 from utils.factories import *
+from utils import metrics
 from utils import test_utils
 
 class TestHelperFunctions(TestCase):
@@ -632,6 +634,98 @@ class TestBasicAdding(TestCase):
                                              complete=False, author=user,
                                              action='action')
 
+    def test_digests(self):
+        subs = [(100, 200, "foo"), (300, 400, "bar")]
+        v1 = pipeline.add_subtitles(self.video, 'en', subs)
+        v2 = pipeline.add_subtitles(self.video, 'en', subs)
+        v3 = pipeline.add_subtitles(self.video, 'en',
+                                    [(100, 200, "foo"), (300, 400, "baz")])
+        v4 = pipeline.add_subtitles(self.video, 'en',
+                                    [(100, 200, "foo"), (300, 500, "baz")])
+        self.assertEqual(len(v1.content_digest), 40)
+        self.assertTrue(v1.has_same_content(v2))
+        self.assertFalse(v1.has_same_content(v3))
+        self.assertTrue(v1.has_same_timings(v3))
+        self.assertFalse(v1.has_same_timings(v4))
+        self.assertEqual(v2.get_changes(), (0.0, 0.0))
+        # versions without digests should still work, they just need to parse
+        # the subtitles
+        SubtitleVersion.objects.update(content_digest='', timing_digest='')
+        old_v4 = v4
+        v1 = SubtitleVersion.objects.get(id=v1.id)
+        v4 = SubtitleVersion.objects.get(id=v4.id)
+        self.assertFalse(v1.has_same_timings(v4))
+        self.assertEqual(v1.etag, v2.content_digest)
+        v4.calc_digests()
+        self.assertEqual(v4.content_digest, old_v4.content_digest)
+        self.assertEqual(v4.timing_digest, old_v4.timing_digest)
+
+    def test_skip_unchanged(self):
+        subs = [(100, 200, "foo"), (300, 400, "bar")]
+        v1 = pipeline.add_subtitles(self.video, 'en', subs, title='title')
+        v2 = pipeline.add_subtitles(self.video, 'en', subs,
+                                    skip_unchanged=True)
+        self.assertEqual(v2.id, v1.id)
+        v3 = pipeline.add_subtitles(self.video, 'en', subs,
+                                    title='new title', skip_unchanged=True)
+        self.assertEqual(v3.version_number, 2)
+        v4 = pipeline.add_subtitles(self.video, 'en', subs[:1],
+                                    skip_unchanged=True)
+        self.assertEqual(v4.version_number, 3)
+
+    @test_utils.patch_for_test('videos.tasks.video_changed_tasks')
+    def test_add_subtitles_batch(self, mock_video_changed_tasks):
+        user = UserFactory()
+        versions = pipeline.add_subtitles_batch(self.video, [
+            ('en', [(100, 200, "foo")]),
+            ('fr', [(100, 200, "le foo")]),
+            ('de', None),
+        ], author=user, note='batch')
+        self.assertEqual([v.language_code for v in versions],
+                         ['en', 'fr', 'de'])
+        for version in versions:
+            self.assertEqual(version.version_number, 1)
+            self.assertEqual(version.author, user)
+            self.assertEqual(version.note, 'batch')
+            self.assertEqual(version.subtitle_language.get_tip(), version)
+        self.assertEqual(versions[1].get_subtitles().to_xml(),
+                         SubtitleSet.from_list(
+                             'fr', [(100, 200, "le foo")]).to_xml())
+        self.assertEqual(mock_video_changed_tasks.delay.call_args_list,
+                         [mock.call(self.video.pk)])
+
+    @test_utils.patch_for_test('videos.tasks.video_changed_tasks')
+    def test_add_subtitles_batch_followers_and_forks(self,
+                                                     mock_video_changed_tasks):
+        user = UserFactory()
+        en1 = pipeline.add_subtitles(self.video, 'en', [(100, 200, "foo")])
+        fr1 = pipeline.add_subtitles(self.video, 'fr', [(100, 200, "le foo")],
+                                     parents=[en1])
+        pipeline.add_subtitles(self.video, 'de', None)
+        self.assertFalse(fr1.subtitle_language.is_forked)
+        pipeline.add_subtitles_batch(self.video, [
+            ('en', [(100, 200, "bar")]),
+            ('de', [(100, 200, "der bar")]),
+        ], author=user, origin=ORIGIN_API)
+        # fr is translated from en, so it should be forked
+        self.assertTrue(SubtitleLanguage.objects.get(
+            id=fr1.subtitle_language_id).is_forked)
+        self.assertEqual(
+            sorted(sl.language_code
+                   for sl in user.new_followed_languages.all()),
+            ['de', 'en'])
+
+    def test_lock_wait_metrics(self):
+        metrics.install()
+        metrics.start()
+        try:
+            pipeline.add_subtitles(self.video, 'en', None)
+            pipeline.add_subtitles(self.video, 'en', None)
+        finally:
+            data = metrics.stop()
+        self.assertEqual(data['subtitle_lock_wait_count'], 2)
+        self.assertIn('subtitle_lock_wait_time', data)
+
 class TestRollbacks(TestCase):
     def setUp(self):
         self.video = make_video()
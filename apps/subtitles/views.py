@@ -47,6 +47,7 @@ from subtitles.templatetags.new_subtitles_tags import visibility
 from subtitles.forms import SubtitlesUploadForm
 from teams.models import Task
 from teams.permissions import can_perform_task
+from utils.http import not_modified, not_modified_response, set_cache_headers
 from utils.text import fmt
 from videos.models import Video
 from videos.types import video_type_registrar
@@ -455,6 +456,9 @@ def download(request, video_id, language_code, filename, format,
     if not format in babelsubs.get_available_formats():
         raise HttpResponseServerError("Format not found")
 
+    cache_info = version.http_cache_info(format)
+    if not_modified(request, cache_info['etag']):
+        return not_modified_response(**cache_info)
     subs_text = babelsubs.to(version.get_subtitles(), format,
                              language=version.language_code)
     # since this is a download, we can afford not to escape tags, specially
@@ -462,6 +466,7 @@ def download(request, video_id, language_code, filename, format,
     # stripped out
     response = HttpResponse(subs_text, mimetype="text/plain")
     response['Content-Disposition'] = 'attachment'
+    set_cache_headers(response, **cache_info)
     return response
 
 
@@ -61,7 +61,7 @@ from videos.models import (
 from videos.tasks import import_videos_from_feed
 from videos.types import video_type_registrar, VideoTypeError
 from utils.forms import (ErrorableModelForm, get_label_for_value,
-                         UserAutocompleteField)
+                         LanguageChoiceField, UserAutocompleteField)
 from utils.panslugify import pan_slugify
 from utils.translation import get_language_choices, get_language_label
 from utils.text import fmt
@@ -1003,10 +1003,10 @@ class VideoFiltersForm(forms.Form):
     q = forms.CharField(label=_('Title/Description'), required=False)
     project = forms.ChoiceField(label=_('Project'), required=False,
                                 choices=[])
-    has_language = forms.ChoiceField(
+    has_language = LanguageChoiceField(
         label=_('Has completed language'), required=False,
         choices=get_language_choices(with_empty=True))
-    missing_language = forms.ChoiceField(
+    missing_language = LanguageChoiceField(
         label=_('Missing completed language'), required=False,
         choices=get_language_choices(with_empty=True))
     sort = forms.ChoiceField(choices=[
@@ -1080,14 +1080,11 @@ class VideoFiltersForm(forms.Form):
             except Project.DoesNotExist:
                 pass
 
-        if sort in ('subs', '-subs'):
-            qs = qs.add_num_completed_languages()
-
         qs = qs.order_by({
              'name':  'title',
             '-name': '-title',
-             'subs':  'num_completed_languages',
-            '-subs': '-num_completed_languages',
+             'subs':  'teamvideo__num_completed_languages',
+            '-subs': '-teamvideo__num_completed_languages',
              'time':  'created',
             '-time': '-created',
         }.get(sort or '-time'))
@@ -1112,10 +1109,10 @@ class ActivityFiltersForm(forms.Form):
     type = forms.ChoiceField(
         label=_('Activity Type'), required=False,
         choices=[])
-    video_language = forms.ChoiceField(
+    video_language = LanguageChoiceField(
         label=_('Video Language'), required=False,
         choices=[])
-    subtitle_language = forms.ChoiceField(
+    subtitle_language = LanguageChoiceField(
         label=_('Subtitle Language'), required=False,
         choices=[])
     sort = forms.ChoiceField(
@@ -1454,7 +1451,7 @@ class RemoveTeamVideosForm(BulkTeamVideoForm):
         return fmt(msg, count=self.count)
 
 class BulkEditTeamVideosForm(BulkTeamVideoForm):
-    primary_audio_language = forms.ChoiceField(required=False, choices=[])
+    primary_audio_language = LanguageChoiceField(required=False, choices=[])
     project = forms.ChoiceField(label=_('Project'), choices=[],
                                 required=False)
     thumbnail = forms.ImageField(label=_('Change thumbnail'), required=False)
@@ -1507,7 +1504,7 @@ class BulkEditTeamVideosForm(BulkTeamVideoForm):
 class NewAddTeamVideoDataForm(forms.Form):
     project = forms.ChoiceField(label=_('Project'), choices=[],
                                 required=False)
-    language = forms.ChoiceField(choices=(), required=False)
+    language = LanguageChoiceField(choices=(), required=False)
     thumbnail = forms.ImageField(required=False)
 
     def __init__(self, team, *args, **kwargs):
@@ -1523,7 +1520,7 @@ class NewAddTeamVideoDataForm(forms.Form):
             del self.fields['project']
 
 class NewEditTeamVideoForm(forms.Form):
-    primary_audio_language = forms.ChoiceField(required=False, choices=[])
+    primary_audio_language = LanguageChoiceField(required=False, choices=[])
     project = forms.ChoiceField(label=_('Project'), choices=[],
                                 required=False)
     thumbnail = forms.ImageField(label=_('Change thumbnail'), required=False)
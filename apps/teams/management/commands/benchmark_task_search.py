@@ -0,0 +1,147 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2015 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Benchmark searching a team's tasks
+
+Usage:
+
+    manage.py benchmark_task_search <team-slug> <query> [<query> ...]
+
+Use --populate to first add a bunch of synthetic videos and tasks to the
+team.  For example, to benchmark a team with 500k tasks:
+
+    manage.py benchmark_task_search big-team "sample" "video 42" \\
+        --populate 500000
+"""
+
+from optparse import make_option
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from teams.models import Task, Team, TeamVideo
+from utils import codes
+from utils.searching import get_terms
+from videos.models import Video, VideoIndex
+
+WORDS = ['sample', 'lecture', 'interview', 'music', 'science', 'history',
+         'cooking', 'travel', 'news', 'sports', 'keynote', 'tutorial']
+
+class Command(BaseCommand):
+    args = '<team-slug> <query> [<query> ...]'
+    help = "Benchmark searching the tasks for a team"
+    option_list = BaseCommand.option_list + (
+        make_option('-p', '--populate', dest='populate', default=0,
+                    type='int', metavar='COUNT',
+                    help='Add COUNT synthetic videos/tasks to the team first'),
+        make_option('-r', '--repeat', dest='repeat', default=5, type='int',
+                    help='Number of times to run each query'),
+        make_option('-b', '--batch-size', dest='batch-size', default=1000,
+                    type='int', help='Batch size for --populate'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 2:
+            raise CommandError('Usage: {}'.format(self.args))
+        try:
+            team = Team.objects.get(slug=args[0])
+        except Team.DoesNotExist:
+            raise CommandError('No team with slug {}'.format(args[0]))
+        if options['populate']:
+            self.populate(team, options['populate'], options['batch-size'])
+        self.stdout.write('{} open tasks for {}\n'.format(
+            Task.objects.incomplete().filter(team=team).count(), team.slug))
+        for query in args[1:]:
+            self.benchmark(team, query, options['repeat'])
+
+    def benchmark(self, team, query, repeat):
+        self.stdout.write(u'query: {}\n'.format(query))
+        for name, qs in [
+            ('icontains', self.icontains_queryset(team, query)),
+            ('search', Task.objects.search(query).filter(team=team)),
+        ]:
+            qs = qs.filter(deleted=False, completed=None).order_by('-created')
+            timings = []
+            for i in xrange(repeat):
+                start = time.time()
+                count = qs.count()
+                list(qs[:20])
+                timings.append(time.time() - start)
+            self.stdout.write(
+                '    {:<10} {} results  min: {:.3f}s  avg: {:.3f}s\n'.format(
+                    name, count, min(timings),
+                    sum(timings) / len(timings)))
+
+    def icontains_queryset(self, team, query):
+        # This is how _tasks_list searched tasks before we used the fulltext
+        # index.
+        qs = Task.objects.filter(team=team)
+        for term in get_terms(query):
+            qs = qs.filter(
+                Q(team_video__video__title__icontains=term) |
+                Q(team_video__video__meta_1_content__icontains=term) |
+                Q(team_video__video__meta_2_content__icontains=term) |
+                Q(team_video__video__meta_3_content__icontains=term))
+        return qs
+
+    def populate(self, team, count, batch_size):
+        project = team.default_project
+        now = datetime.datetime.now()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            with transaction.commit_on_success():
+                self.populate_batch(team, project, now, size)
+            created += size
+            self.stdout.write('populated {}/{} tasks\n'.format(created,
+                                                              count))
+            self.stdout.flush()
+
+    def populate_batch(self, team, project, now, size):
+        videos = []
+        for i in xrange(size):
+            title = u' '.join(random.sample(WORDS, 3) +
+                              [unicode(random.randint(0, 1000))])
+            videos.append(Video(video_id=codes.make_code(), title=title,
+                                created=now))
+        Video.objects.bulk_create(videos)
+        video_ids = dict(Video.objects
+                         .filter(video_id__in=[v.video_id for v in videos])
+                         .values_list('video_id', 'id'))
+        VideoIndex.objects.bulk_create([
+            VideoIndex(video_id=video_ids[v.video_id], text=v.title)
+            for v in videos
+        ])
+        TeamVideo.objects.bulk_create([
+            TeamVideo(team=team, project=project, created=now,
+                      video_id=video_ids[v.video_id])
+            for v in videos
+        ])
+        team_video_ids = list(TeamVideo.objects
+                              .filter(video_id__in=video_ids.values())
+                              .values_list('id', flat=True))
+        Task.objects.bulk_create([
+            Task(team=team, team_video_id=team_video_id,
+                 type=Task.TYPE_IDS['Subtitle'])
+            for team_video_id in team_video_ids
+        ])
+        TeamVideo.objects.update_counts(team_video_ids)
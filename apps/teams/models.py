@@ -21,6 +21,7 @@ from math import ceil
 import csv
 import datetime
 import logging
+import re
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
@@ -28,7 +29,7 @@ from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.core.files import File
-from django.db import connection
+from django.db import connection, transaction
 from django.db import models
 from django.db.models import query, Q, Count, Sum
 from django.db.models.signals import post_save, post_delete, pre_delete
@@ -59,6 +60,7 @@ from utils import DEFAULT_PROTOCOL
 from utils import translation
 from utils.amazon import S3EnabledImageField, S3EnabledFileField
 from utils.panslugify import pan_slugify
+from utils.searching import get_terms
 from utils.text import fmt
 from videos.models import Video, VideoUrl, SubtitleVersion, SubtitleLanguage
 from videos.tasks import video_changed_tasks
@@ -984,9 +986,73 @@ class Project(models.Model):
 
 
 # TeamVideo
+class TeamVideoManager(models.Manager):
+    def update_num_open_tasks(self, team_video_ids):
+        """Recalculate the num_open_tasks field for a list of TeamVideos."""
+        self._update_counts(['num_open_tasks'], 'id', team_video_ids)
+
+    def update_num_completed_languages(self, video_ids):
+        """Recalculate the num_completed_languages field
+
+        Args:
+            video_ids: list of ids for the Video objects whose
+                TeamVideo should be updated.  It's okay to pass in ids for
+                videos that are not part of a team.
+        """
+        self._update_counts(['num_completed_languages'], 'video_id',
+                            video_ids)
+
+    def update_counts(self, team_video_ids):
+        """Recalculate all denormalized count fields for a list of TeamVideos
+        """
+        self._update_counts(TeamVideo.COUNT_FIELDS_SQL.keys(), 'id',
+                            team_video_ids)
+
+    def update_counts_for_range(self, start_id, end_id):
+        """Recalculate all denormalized count fields for an id range.
+
+        This is used to reconcile the counts in case they get out of sync.
+        The range includes both start_id and end_id.
+        """
+        sql = ('UPDATE teams_teamvideo SET {0} '
+               'WHERE id BETWEEN %s AND %s'.format(
+                   self._count_assignments(TeamVideo.COUNT_FIELDS_SQL.keys())))
+        self._execute(sql, [start_id, end_id])
+
+    def _update_counts(self, fields, id_column, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        sql = 'UPDATE teams_teamvideo SET {0} WHERE {1} IN ({2})'.format(
+            self._count_assignments(fields), id_column,
+            ', '.join(['%s'] * len(ids)))
+        self._execute(sql, ids)
+
+    def _count_assignments(self, fields):
+        return ', '.join('{0}=({1})'.format(field,
+                                           TeamVideo.COUNT_FIELDS_SQL[field])
+                         for field in fields)
+
+    def _execute(self, sql, params):
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        transaction.commit_unless_managed()
+
 class TeamVideo(models.Model):
     THUMBNAIL_SIZE = (288, 162)
 
+    # SQL to calculate our denormalized count fields
+    COUNT_FIELDS_SQL = {
+        'num_open_tasks': (
+            'SELECT COUNT(*) FROM teams_task t '
+            'WHERE t.team_video_id=teams_teamvideo.id AND '
+            't.completed IS NULL AND t.deleted=0'),
+        'num_completed_languages': (
+            'SELECT COUNT(*) FROM subtitles_subtitlelanguage sl '
+            'WHERE sl.video_id=teams_teamvideo.video_id AND '
+            'sl.subtitles_complete'),
+    }
+
     team = models.ForeignKey(Team)
     video = models.OneToOneField(Video)
     description = models.TextField(blank=True,
@@ -1006,6 +1072,14 @@ class TeamVideo(models.Model):
 
     project = models.ForeignKey(Project)
 
+    # Denormalized counts used to sort/filter the team videos page.  These
+    # are updated by TeamVideoManager when tasks and languages change, don't
+    # set them directly.
+    num_open_tasks = models.PositiveIntegerField(default=0)
+    num_completed_languages = models.PositiveIntegerField(default=0)
+
+    objects = TeamVideoManager()
+
     class Meta:
         unique_together = (('team', 'video'),)
 
@@ -1072,6 +1146,9 @@ class TeamVideo(models.Model):
                     "%s: Team (%s) is not equal to project's (%s) team (%s)"\
                          % (self, self.team, self.project, self.project.team)
         super(TeamVideo, self).save(*args, **kwargs)
+        # We just overwrote our count fields with the values we had in memory,
+        # and may have deleted tasks above.  Recalculate them.
+        TeamVideo.objects.update_counts([self.id])
         if within_team:
             if __old_project is not None and self.project != __old_project:
                 video_moved_from_project_to_project.send(sender=self,
@@ -1966,6 +2043,8 @@ class Workflow(models.Model):
 
 # Tasks
 class TaskManager(models.Manager):
+    FULLTEXT_WORD_RE = re.compile(r'^\w+$', re.UNICODE)
+
     def not_deleted(self):
         """Return a QS of tasks that are not deleted."""
         return self.get_query_set().filter(deleted=False)
@@ -1975,6 +2054,54 @@ class TaskManager(models.Manager):
         """Return a QS of tasks that are not deleted or completed."""
         return self.not_deleted().filter(completed=None)
 
+    def search(self, query):
+        """Return a QS of tasks whose video matches a search query.
+
+        On MySQL this uses the fulltext index on VideoIndex, so that we don't
+        need to scan the video table.  Terms shorter than the fulltext
+        minimum word length can't be matched using the index, so we match
+        them against the title/metadata of the videos that the other terms
+        selected.
+
+        Other databases don't support fulltext searching, there we fall back
+        to matching every term against the title/metadata.
+        """
+        terms = get_terms(query)
+        if connection.vendor == 'mysql':
+            index_terms = [t for t in terms if len(t) >= 3]
+            other_terms = [t for t in terms if len(t) < 3]
+        else:
+            index_terms = []
+            other_terms = terms
+
+        qs = self.get_query_set()
+        if index_terms:
+            qs = qs.filter(team_video__video__index__text__search=(
+                u' '.join(self._fulltext_term(t) for t in index_terms)))
+        for term in other_terms:
+            qs = qs.filter(
+                Q(team_video__video__title__icontains=term) |
+                Q(team_video__video__meta_1_content__icontains=term) |
+                Q(team_video__video__meta_2_content__icontains=term) |
+                Q(team_video__video__meta_3_content__icontains=term))
+        return qs
+
+    def _fulltext_term(self, term):
+        if self.FULLTEXT_WORD_RE.match(term):
+            # single word, use prefix matching to work like icontains does for
+            # the start of words.
+            return u'+{}*'.format(term)
+        else:
+            return u'+"{}"'.format(term.replace('"', ''))
+
+    def expired(self, now=None):
+        """Return a QS of incomplete tasks that are past their expiration date.
+        """
+        if now is None:
+            now = Task.now()
+        return self.incomplete().filter(expiration_date__isnull=False,
+                                        expiration_date__lt=now)
+
     def complete(self):
         """Return a QS of tasks that are not deleted, but are completed."""
         return self.not_deleted().filter(completed__isnull=False)
@@ -2703,6 +2830,7 @@ class Task(models.Model):
 
         result = super(Task, self).save(*args, **kwargs)
 
+        TeamVideo.objects.update_num_open_tasks([self.team_video_id])
         Video.cache.invalidate_by_pk(self.team_video.video_id)
 
         return result
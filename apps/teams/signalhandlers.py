@@ -20,7 +20,8 @@ from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 
 from auth.models import CustomUser as User
-from teams.models import TeamVideo, TeamMember, MembershipNarrowing
+from subtitles.models import SubtitleLanguage
+from teams.models import Task, TeamVideo, TeamMember, MembershipNarrowing
 from teams.signals import api_teamvideo_new
 from videos.signals import feed_imported
 
@@ -42,3 +43,12 @@ def on_membership_narrowing_change(sender, instance, **kwargs):
         User.cache.invalidate_by_pk(instance.member.user_id)
     except TeamMember.DoesNotExist:
         pass
+
+@receiver(post_delete, sender=Task)
+def on_task_delete(sender, instance, **kwargs):
+    TeamVideo.objects.update_num_open_tasks([instance.team_video_id])
+
+@receiver(post_save, sender=SubtitleLanguage)
+@receiver(post_delete, sender=SubtitleLanguage)
+def on_subtitle_language_change(sender, instance, **kwargs):
+    TeamVideo.objects.update_num_completed_languages([instance.video_id])
@@ -10,6 +10,7 @@ from django.contrib.sites.models import Site
 from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
 import requests
+from utils import applock
 from utils import send_templated_email
 from utils.panslugify import pan_slugify
 from utils.translation import get_language_choices
@@ -63,32 +64,71 @@ def update_video_public_field(team_id):
         video.save()
         video_changed_tasks(video.id)
 
+# Number of tasks to expire with each UPDATE statement
+EXPIRE_TASKS_CHUNK_SIZE = 500
+
 @task
 def expire_tasks():
     """Find any tasks that are past their expiration date and unassign them.
 
-    We currently run this once per day (at 7 AM server time).
-
+    We currently run this once per hour.  Tasks are expired in chunks using a
+    single UPDATE per chunk, which keeps each statement short enough that we
+    don't hold locks on a large part of the tasks table.  Caches for the
+    affected videos and assignees are invalidated once at the end, rather
+    than once per task.
     """
-    from teams.models import Task
+    from auth.models import CustomUser as User
+    from videos.models import Video
 
-    expired_tasks = Task.objects.incomplete().filter(
-        expiration_date__isnull=False,
-        expiration_date__lt=datetime.now(),
-    )
-    for task in expired_tasks:
-        task.assignee = task.expiration_date = None
-        # run each inside a try/except so that one
-        # rotten apple doesn't make a huge mess
-        try:
-            task.save()
-        except Exception as e:
-            logger.error('Error on expiring tasks', extra={
-            'task': task,
-            'exception': e,
-        })
+    try:
+        with applock.lock('teams.expire_tasks'):
+            video_ids, assignee_ids = _expire_task_chunks()
+    except applock.LockBusy:
+        logger.info('expire_tasks already running, skipping')
+        return
 
+    for video_id in video_ids:
+        Video.cache.invalidate_by_pk(video_id)
+    for user_id in assignee_ids:
+        User.cache.invalidate_by_pk(user_id)
 
+def _expire_task_chunks(chunk_size=EXPIRE_TASKS_CHUNK_SIZE):
+    """Expire tasks in chunks ordered by id.
+
+    Returns:
+        (video_ids, assignee_ids) tuple, containing sets of the video and
+        user ids affected by the change.
+    """
+    from teams.models import Task
+
+    now = Task.now()
+    video_ids = set()
+    assignee_ids = set()
+    last_id = 0
+    while True:
+        rows = list(Task.objects.expired(now)
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'team_video__video_id', 'assignee_id')
+                    [:chunk_size])
+        if not rows:
+            break
+        task_ids = [task_id for (task_id, video_id, assignee_id) in rows]
+        # Re-apply the expired() filter so that we don't touch tasks that got
+        # completed since we fetched the ids.  Note that update() doesn't
+        # handle auto_now, so we need to set modified ourselves.
+        Task.objects.expired(now).filter(id__in=task_ids).update(
+            assignee=None, expiration_date=None, modified=now)
+        for task_id, video_id, assignee_id in rows:
+            video_ids.add(video_id)
+            if assignee_id is not None:
+                assignee_ids.add(assignee_id)
+        if len(rows) < chunk_size:
+            break
+        last_id = task_ids[-1]
+    if video_ids:
+        logger.info('Expired tasks for %s videos', len(video_ids))
+    return video_ids, assignee_ids
 
 @task
 def add_videos_notification_daily(*args, **kwargs):
@@ -177,6 +217,7 @@ def add_team_videos(team_pk, user_pk, videos):
     from teams.models import Team, Project, TeamVideo
     from videos.models import Video
     from videos.types import video_type_registrar
+    from videos.types.youtube import prefetch_video_info_for_video_types
     from auth.models import CustomUser as User
     from utils.subtitles import load_subtitles
     from subtitles.pipeline import add_subtitles
@@ -185,10 +226,18 @@ def add_team_videos(team_pk, user_pk, videos):
     num_successful_videos = 0
     messages = []
     if can_add_videos_bulk(user):
+        video_types = []
         for video_item in videos:
+            try:
+                video_types.append(
+                    video_type_registrar.video_type_for_url(video_item['url']))
+            except:
+                video_types.append(None)
+        # Fetch the youtube metadata in batches rather than 1 video at a time
+        prefetch_video_info_for_video_types(video_types)
+        for video_item, video_type in zip(videos, video_types):
             video_url = video_item['url']
             try:
-                video_type = video_type_registrar.video_type_for_url(video_url)
                 video_url = video_type.convert_to_video_url()
             except:
                 messages.append(fmt(_(u"Unknown video type: %(url)s\n"), url=video_url))
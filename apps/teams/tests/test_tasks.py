@@ -4,13 +4,15 @@ import datetime
 import json
 
 from django.test import TestCase
-from django.test.client import Client
+from django.test.client import Client, RequestFactory
 from django.core.urlresolvers import reverse
 
 from auth.models import CustomUser as User
 from caching.tests.utils import assert_invalidates_model_cache
 from teams.forms import TaskCreateForm, TaskAssignForm
+from teams import tasks as team_tasks
 from teams.models import Task, Team, TeamVideo, TeamMember
+from teams.views import _tasks_list
 from utils.testeditor import TestEditor
 from utils.factories import *
 from videos.models import Video
@@ -655,6 +657,70 @@ class ViewsTest(TestCase):
         self.check_task_list(tv.task_set.all(), q='pers')
 
 
+class TaskSearchTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory(workflow_enabled=True)
+        self.admin = TeamMemberFactory(team=self.team,
+                                       role=TeamMember.ROLE_ADMIN)
+        self.show_video = TeamVideoFactory(
+            team=self.team, added_by=self.admin.user,
+            video__title='Cooking Show')
+        self.class_video = TeamVideoFactory(
+            team=self.team, added_by=self.admin.user,
+            video__title='Cooking Class')
+        self.class_video.video.update_metadata({'speaker-name': 'Jamie'})
+
+    def make_task(self, team_video, language='en', **kwargs):
+        return TaskFactory(team=self.team, team_video=team_video,
+                           language=language, **kwargs)
+
+    def check_search(self, query, tasks):
+        self.assertEquals(
+            set(t.id for t in Task.objects.search(query)),
+            set(t.id for t in tasks))
+
+    def test_search(self):
+        # Tests run on sqlite, so this checks the icontains code path
+        show_task = self.make_task(self.show_video)
+        class_task = self.make_task(self.class_video)
+        self.check_search('cooking', [show_task, class_task])
+        self.check_search('SHOW', [show_task])
+        self.check_search('jam', [class_task])
+        # All terms must match, but they can match different fields
+        self.check_search('cooking show', [show_task])
+        self.check_search('class jamie', [class_task])
+        self.check_search('show jamie', [])
+
+    def test_tasks_list(self):
+        show_task = self.make_task(self.show_video)
+        show_translate_task = self.make_task(
+            self.show_video, language='fr', type=Task.TYPE_IDS['Translate'])
+        show_completed_task = self.make_task(
+            self.show_video, completed=datetime.datetime.now())
+        self.make_task(self.class_video)
+        request = RequestFactory().get('/')
+        request.user = self.admin.user
+        def check_tasks_list(tasks, **filters):
+            filters.setdefault('assignee', 'anyone')
+            filters.setdefault('language', 'all')
+            self.assertEquals(
+                set(t.id for t in _tasks_list(request, self.team, None,
+                                              filters, self.admin.user)),
+                set(t.id for t in tasks))
+        check_tasks_list([show_task, show_translate_task], q='show')
+        check_tasks_list([show_task], q='show', language='en')
+        check_tasks_list([show_translate_task], q='show', type='Translate')
+        check_tasks_list([show_completed_task], q='show', completed=True)
+        check_tasks_list([], q='show jamie')
+
+    def test_fulltext_term(self):
+        self.assertEquals(Task.objects._fulltext_term(u'word'), u'+word*')
+        self.assertEquals(Task.objects._fulltext_term(u'e-mail'),
+                          u'+"e-mail"')
+        self.assertEquals(Task.objects._fulltext_term(u'say "hi" now'),
+                          u'+"say hi now"')
+
+
 class VideoCacheTest(TestCase):
     def test_add_task_invalidates_video_cache(self):
         team_video = TeamVideoFactory()
@@ -662,3 +728,44 @@ class VideoCacheTest(TestCase):
             task = Task(team=team_video.team, team_video=team_video,
                         language='en', type=Task.TYPE_IDS['Translate'])
             task.save()
+
+class ExpireTasksTest(TestCase):
+    def setUp(self):
+        self.team_video = TeamVideoFactory()
+        self.user = UserFactory()
+        self.past = datetime.datetime.now() - datetime.timedelta(days=1)
+        self.future = datetime.datetime.now() + datetime.timedelta(days=1)
+
+    def make_task(self, **kwargs):
+        return TaskFactory(team=self.team_video.team,
+                           team_video=self.team_video, language='en',
+                           assignee=self.user, **kwargs)
+
+    def reload(self, task):
+        return Task.objects.get(pk=task.pk)
+
+    def test_expire(self):
+        expired = self.make_task(expiration_date=self.past)
+        not_expired = self.make_task(expiration_date=self.future)
+        completed = self.make_task(expiration_date=self.past,
+                                   completed=self.past)
+        team_tasks.expire_tasks()
+        self.assertEquals(self.reload(expired).assignee, None)
+        self.assertEquals(self.reload(expired).expiration_date, None)
+        self.assertEquals(self.reload(not_expired).assignee, self.user)
+        self.assertEquals(self.reload(completed).assignee, self.user)
+
+    def test_expire_in_chunks(self):
+        expired_tasks = [self.make_task(expiration_date=self.past)
+                         for i in range(5)]
+        video_ids, assignee_ids = team_tasks._expire_task_chunks(chunk_size=2)
+        for task in expired_tasks:
+            self.assertEquals(self.reload(task).assignee, None)
+        self.assertEquals(video_ids, set([self.team_video.video_id]))
+        self.assertEquals(assignee_ids, set([self.user.id]))
+
+    def test_invalidates_caches(self):
+        self.make_task(expiration_date=self.past)
+        with assert_invalidates_model_cache(self.team_video.video):
+            with assert_invalidates_model_cache(self.user):
+                team_tasks.expire_tasks()
@@ -24,7 +24,7 @@ from django.test import TestCase
 import mock
 
 from caching.tests.utils import assert_invalidates_model_cache
-from teams.models import Project, TeamVideoMigration
+from teams.models import Project, TeamVideo, TeamVideoMigration
 from utils import test_utils
 from utils.factories import *
 
@@ -83,3 +83,67 @@ class TeamMoveTest(TestCase):
         self.check_migration(migrations[2], datetime(2013, 01, 03),
                              self.team, self.team2, self.project2)
 
+
+class TeamVideoCountsTest(TestCase):
+    def setUp(self):
+        self.team_video = TeamVideoFactory()
+        self.video = self.team_video.video
+
+    def reload(self):
+        return TeamVideo.objects.get(pk=self.team_video.pk)
+
+    def make_task(self, **kwargs):
+        return TaskFactory(team=self.team_video.team,
+                           team_video=self.team_video, language='en',
+                           **kwargs)
+
+    def test_num_open_tasks(self):
+        task = self.make_task()
+        self.make_task(completed=datetime.now())
+        self.assertEquals(self.reload().num_open_tasks, 1)
+        task.completed = datetime.now()
+        task.save()
+        self.assertEquals(self.reload().num_open_tasks, 0)
+
+    def test_num_open_tasks_on_delete(self):
+        task = self.make_task()
+        self.assertEquals(self.reload().num_open_tasks, 1)
+        task.delete()
+        self.assertEquals(self.reload().num_open_tasks, 0)
+
+    def test_num_completed_languages(self):
+        language = SubtitleLanguageFactory(video=self.video,
+                                           language_code='en')
+        SubtitleLanguageFactory(video=self.video, language_code='fr')
+        self.assertEquals(self.reload().num_completed_languages, 0)
+        language.subtitles_complete = True
+        language.save()
+        self.assertEquals(self.reload().num_completed_languages, 1)
+        language.delete()
+        self.assertEquals(self.reload().num_completed_languages, 0)
+
+    def test_add_video_with_completed_languages(self):
+        video = VideoFactory()
+        SubtitleLanguageFactory(video=video, language_code='en',
+                                subtitles_complete=True)
+        team_video = TeamVideoFactory(video=video)
+        self.assertEquals(
+            TeamVideo.objects.get(pk=team_video.pk).num_completed_languages,
+            1)
+
+    def test_save_doesnt_overwrite_counts(self):
+        # self.team_video has num_open_tasks=0 in memory, saving it shouldn't
+        # clobber the value in the DB
+        self.make_task()
+        self.team_video.save()
+        self.assertEquals(self.reload().num_open_tasks, 1)
+
+    def test_update_counts_for_range(self):
+        self.make_task()
+        TeamVideo.objects.filter(pk=self.team_video.pk).update(
+            num_open_tasks=5, num_completed_languages=5)
+        TeamVideo.objects.update_counts_for_range(self.team_video.pk,
+                                                  self.team_video.pk)
+        team_video = self.reload()
+        self.assertEquals(team_video.num_open_tasks, 1)
+        self.assertEquals(team_video.num_completed_languages, 0)
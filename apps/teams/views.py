@@ -468,13 +468,13 @@ def _get_videos_for_detail_page(team, user, query, project, language_code,
         return Video.objects.none()
 
     qs = Video.objects.filter(teamvideo__team=team)
-    # add a couple of completed values that we use in the template code
-    qs = qs.add_num_completed_languages()
-    num_tasks_sql = ("""
-                     (SELECT COUNT(*) FROM teams_task WHERE
-                     completed IS NULL AND deleted=0 AND
-                     team_video_id=teams_teamvideo.id)""")
-    qs = qs.extra(select={'num_tasks': num_tasks_sql})
+    # add a couple of completed values that we use in the template code.
+    # These are denormalized on the TeamVideo so that we don't need a
+    # subquery for each row.
+    qs = qs.extra(select={
+        'num_tasks': 'teams_teamvideo.num_open_tasks',
+        'num_completed_languages': 'teams_teamvideo.num_completed_languages',
+    })
 
     if query:
         qs = qs.search(query)
@@ -487,13 +487,13 @@ def _get_videos_for_detail_page(team, user, query, project, language_code,
         if language_code is not None:
             qs = qs.missing_completed_language(language_code)
         else:
-            qs = qs.no_completed_languages()
+            qs = qs.filter(teamvideo__num_completed_languages=0)
 
     qs = qs.order_by({
          'name':  'title',
         '-name': '-title',
-         'subs':  'num_completed_languages',
-        '-subs': '-num_completed_languages',
+         'subs':  'teamvideo__num_completed_languages',
+        '-subs': '-teamvideo__num_completed_languages',
          'time':  'created',
         '-time': '-created',
     }.get(sort or '-time'))
@@ -1350,7 +1350,11 @@ def _tasks_list(request, team, project, filters, user):
     * team_video: team video ID as an integer
 
     '''
-    tasks = Task.objects.filter(team=team.id, deleted=False)
+    if filters.get('q'):
+        tasks = Task.objects.search(filters['q'])
+    else:
+        tasks = Task.objects.all()
+    tasks = tasks.filter(team=team.id, deleted=False)
 
     if project:
         tasks = tasks.filter(team_video__project = project)
@@ -1370,15 +1374,6 @@ def _tasks_list(request, team, project, filters, user):
         languages = request.user.get_languages() + ['']
         tasks = tasks.filter(language__in=languages)
 
-    if filters.get('q'):
-        terms = get_terms(filters['q'])
-        for term in terms:
-            tasks = tasks.filter(
-                Q(team_video__video__title__icontains=term) |
-                Q(team_video__video__meta_1_content__icontains=term) |
-                Q(team_video__video__meta_2_content__icontains=term) |
-                Q(team_video__video__meta_3_content__icontains=term))
-
     if filters.get('type'):
         tasks = tasks.filter(type=Task.TYPE_IDS[filters['type']])
 
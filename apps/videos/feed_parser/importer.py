@@ -68,6 +68,7 @@ class VideoImporter(object):
 
     def _create_videos(self, feed_parser):
         from videos.models import VideoUrl
+        from videos.types.youtube import prefetch_video_info_for_video_types
 
         items = list(feed_parser.items(ignore_error=True))
 
@@ -80,6 +81,10 @@ class VideoImporter(object):
                             .filter(url__in=urls)
                             .values_list('url', flat=True))
 
+        prefetch_video_info_for_video_types(
+            vt for vt, info, entry in items
+            if vt is not None and vt.convert_to_video_url() not in existing_urls)
+
         for vt, info, entry in items:
             if vt and vt.convert_to_video_url() not in existing_urls:
                 self._create_video(vt, info, entry)
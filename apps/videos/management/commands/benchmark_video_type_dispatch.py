@@ -0,0 +1,91 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""Benchmark finding the video type for URLs
+
+Usage:
+
+    manage.py benchmark_video_type_dispatch [<url-file>]
+
+URLs are read from url-file, one per line.  If it's not given, we use a
+sample of the URLs from the VideoUrl table.
+"""
+
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+
+from videos.models import VideoUrl
+from videos.types import video_type_registrar
+
+class Command(BaseCommand):
+    args = '[<url-file>]'
+    help = "Benchmark VideoTypeRegistrar.video_type_for_url()"
+    option_list = BaseCommand.option_list + (
+        make_option('-s', '--sample-size', dest='sample-size', default=10000,
+                    type='int',
+                    help='Number of VideoUrls to use if no file is given'),
+        make_option('-r', '--repeat', dest='repeat', default=5, type='int',
+                    help='Number of passes over the URLs'),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            with open(args[0]) as f:
+                urls = [line.strip() for line in f if line.strip()]
+        else:
+            urls = list(VideoUrl.objects.order_by('-id')
+                        .values_list('url', flat=True)
+                        [:options['sample-size']])
+        self.stdout.write('{} urls\n'.format(len(urls)))
+        self.check_results(urls)
+        for name, func in [
+            ('linear', self.linear_scan),
+            ('indexed', self.indexed_uncached),
+            ('cached', video_type_registrar.video_type_class_for_url),
+        ]:
+            video_type_registrar.url_cache.clear()
+            timings = []
+            for i in xrange(options['repeat']):
+                start = time.time()
+                for url in urls:
+                    func(url)
+                timings.append(time.time() - start)
+            self.stdout.write(
+                '    {:<10} min: {:.3f}s  avg: {:.3f}s  ({:.1f}us/url)\n'.format(
+                    name, min(timings), sum(timings) / len(timings),
+                    min(timings) * 1000000 / max(len(urls), 1)))
+
+    def linear_scan(self, url):
+        # This is how video_type_for_url() worked before we indexed the types
+        # by hostname
+        for video_type in video_type_registrar.type_list:
+            if video_type.matches_video_url(url):
+                return video_type
+
+    def indexed_uncached(self, url):
+        return video_type_registrar._match_url(url)[0]
+
+    def check_results(self, urls):
+        mismatches = 0
+        for url in urls:
+            if self.linear_scan(url) != self.indexed_uncached(url):
+                self.stdout.write(u'mismatch: {}\n'.format(url))
+                mismatches += 1
+        self.stdout.write('{} mismatches\n'.format(mismatches))
@@ -164,15 +164,6 @@ EXISTS(
         query = u' '.join(u'+"{}"'.format(t) for t in terms)
         return self.filter(index__text__search=query)
 
-    def add_num_completed_languages(self):
-        sql = ("""
-               (SELECT COUNT(*) FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.subtitles_complete)""")
-        return self.extra(select={
-            'num_completed_languages': sql
-        })
-
     def any_completed_languages(self):
         sql = ("""
                EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
@@ -180,13 +171,6 @@ EXISTS(
                sl.subtitles_complete)""")
         return self.extra(where=[sql])
 
-    def no_completed_languages(self):
-        sql = ("""
-               NOT EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
-               WHERE sl.video_id=videos_video.id AND
-               sl.subtitles_complete)""")
-        return self.extra(where=[sql])
-
     def has_completed_language(self, language_code):
         sql = ("""
                EXISTS (SELECT * FROM subtitles_subtitlelanguage sl
@@ -689,6 +673,14 @@ class Video(models.Model):
         Returns:
             (video, video_url) tuple
         """
+        from videos.tasks import index_video
+        # Fetching the metadata from the video provider means network
+        # requests, which can be slow.  Do that first, outside of the
+        # transaction, so that we don't hold it open while we wait.
+        vt = Video._video_type_for_url(url)
+        Video._check_url_not_added(vt)
+        metadata, owner_username = Video._fetch_metadata(vt)
+
         with transaction.commit_on_success():
             # We need to be a little careful when creating the VideoUrl
             # because it has a foreign key to Video.  We want to call
@@ -700,27 +692,59 @@ class Video(models.Model):
             # pass that to get_or_create(), and only run the setup code if we
             # end up creating a VideoUrl.
             video = Video.objects.create()
-            vt, video_url = video._add_video_url(url, user, True)
+            video_url = video._add_video_url(vt, user, True,
+                                             owner_username)
             # okay, we can now run the setup
-            video.set_values(vt)
+            for name, value in metadata.items():
+                setattr(video, name, value)
             video.user = user
             if setup_callback:
                 setup_callback(video, video_url)
             if not video.title:
                 video.title = make_title_from_url(video_url.url)
-            video.update_search_index()
             video.save()
             if user and user.notify_by_message:
                 video.followers.add(user)
         # Run post-creation code
         video_cache.invalidate_cache(video.video_id)
         video.cache.invalidate()
+        index_video.delay(video.pk)
         signals.video_added.send(sender=video, video_url=video_url)
         signals.video_url_added.send(sender=video_url, video=video,
                                      new_video=True)
 
         return (video, video_url)
 
+    # Fields that VideoType.set_values() fills in for new videos
+    METADATA_FIELDS = ('title', 'description', 'duration', 'thumbnail',
+                       'small_thumbnail')
+
+    @staticmethod
+    def _fetch_metadata(vt):
+        """Fetch metadata for a new video from its provider.
+
+        Returns:
+            (metadata, owner_username) tuple.  metadata is a dict mapping
+            the names in METADATA_FIELDS to their values.
+        """
+        video = Video()
+        video.set_values(vt)
+        metadata = dict((name, getattr(video, name))
+                        for name in Video.METADATA_FIELDS)
+        return metadata, vt.owner_username()
+
+    @staticmethod
+    def _check_url_not_added(vt):
+        # Cheap check so that we can skip fetching metadata for URLs that are
+        # already in the system.  _add_video_url() still handles the case
+        # where the URL gets added while we're fetching.
+        try:
+            video_url = VideoUrl.objects.get(url=vt.convert_to_video_url(),
+                                             type=vt.abbreviation)
+        except VideoUrl.DoesNotExist:
+            return
+        raise Video.UrlAlreadyAdded(video_url)
+
     def set_values(self, video_type):
         video_type.set_values(self)
         self.title = self.re_unicode.sub(u'\uFFFD', self.title)
@@ -740,7 +764,9 @@ class Video(models.Model):
         Raises:
             Video.UrlAlreadyAdded: The URL was already added to a different video
         """
-        vt, video_url = self._add_video_url(url, user, False)
+        vt = Video._video_type_for_url(url)
+        video_url = self._add_video_url(vt, user, False,
+                                        vt.owner_username())
 
         video_cache.invalidate_cache(self.video_id)
         self.cache.invalidate()
@@ -749,14 +775,18 @@ class Video(models.Model):
 
         return video_url
 
-    def _add_video_url(self, url, user, primary):
-        # Low-level video URL adding code for add() and add_url()
+    @staticmethod
+    def _video_type_for_url(url):
         if isinstance(url, basestring):
             vt = video_type_registrar.video_type_for_url(url)
             if vt is None:
                 raise VideoTypeError(url)
+            return vt
         else:
-            vt = url
+            return url
+
+    def _add_video_url(self, vt, user, primary, owner_username):
+        # Low-level video URL adding code for add() and add_url()
         video_url, created = VideoUrl.objects.get_or_create(
             url=vt.convert_to_video_url(), type=vt.abbreviation, defaults={
                 'video': self,
@@ -764,11 +794,11 @@ class Video(models.Model):
                 'primary': primary,
                 'original': primary,
                 'videoid': vt.video_id if vt.video_id else '',
-                'owner_username': vt.owner_username(),
+                'owner_username': owner_username,
             })
         if not created:
             raise Video.UrlAlreadyAdded(video_url)
-        return vt, video_url
+        return video_url
 
     @property
     def language(self):
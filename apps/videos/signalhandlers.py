@@ -40,9 +40,12 @@ def on_video_change(sender, instance, **kwargs):
     instance.cache.invalidate()
 
 @receiver(m2m_changed, sender=Video.followers.through)
-def on_video_followers_changed(instance, reverse, **kwargs):
+def on_video_followers_changed(instance, reverse, pk_set, **kwargs):
     if not reverse:
         instance.cache.invalidate()
+    elif pk_set:
+        for video_id in pk_set:
+            Video.cache.invalidate_by_pk(video_id)
     else:
         for video in instance.followed_videos.all():
             video.cache.invalidate()
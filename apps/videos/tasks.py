@@ -128,6 +128,14 @@ def video_changed_tasks(video_pk, new_version_id=None):
     video = Video.objects.get(pk=video_pk)
     video.update_search_index()
 
+@task
+def index_video(video_pk):
+    try:
+        video = Video.objects.get(pk=video_pk)
+    except Video.DoesNotExist:
+        return
+    video.update_search_index()
+
 @task
 def subtitles_complete_changed(language_pk):
     """
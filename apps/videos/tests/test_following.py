@@ -17,7 +17,10 @@
 # along with this program. If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+from django.test import TestCase
+
 from teams.models import Task
+from utils.factories import *
 from videos.tests.data import (
     get_user, get_video, get_team, get_team_member, get_team_video,
     make_subtitle_language, make_subtitle_version
@@ -78,3 +81,53 @@ class TestFollowingVideos(WebUseTest):
         self._assertFollowers(video, [])
         self._assertFollowers(sl_en, [en_author, editor])
         self._assertFollowers(sl_ru, [ru_author, editor])
+
+class UserVideosSyncTest(TestCase):
+    # CustomUser.videos should stay in sync with the video followers
+    def setUp(self):
+        self.user = UserFactory()
+        self.video = VideoFactory()
+        self.other_video = VideoFactory()
+
+    def check_user_videos(self, user, videos):
+        self.assertEqual(set(user.videos.values_list('id', flat=True)),
+                         set(v.id for v in videos))
+
+    def test_follow_video(self):
+        other_user = UserFactory()
+        self.video.followers.add(self.user, other_user)
+        self.check_user_videos(self.user, [self.video])
+        self.check_user_videos(other_user, [self.video])
+        # adding followers that are already in CustomUser.videos shouldn't
+        # cause errors or duplicate rows
+        self.video.followers.remove(self.user)
+        self.user.videos.add(self.video)
+        self.video.followers.add(self.user)
+        self.assertEqual(self.user.videos.count(), 1)
+
+    def test_follow_multiple_videos(self):
+        self.user.followed_videos.add(self.video, self.other_video)
+        self.check_user_videos(self.user, [self.video, self.other_video])
+        self.user.followed_videos.remove(self.video, self.other_video)
+        self.check_user_videos(self.user, [])
+
+    def test_unfollow_video(self):
+        other_user = UserFactory()
+        self.video.followers.add(self.user, other_user)
+        self.video.followers.remove(self.user, other_user)
+        self.check_user_videos(self.user, [])
+        self.check_user_videos(other_user, [])
+
+    def test_unfollow_video_still_following_language(self):
+        language = OldSubtitleLanguageFactory(video=self.video)
+        language.followers.add(self.user)
+        self.video.followers.add(self.user)
+        self.video.followers.remove(self.user)
+        self.check_user_videos(self.user, [self.video])
+
+    def test_follow_language(self):
+        language = OldSubtitleLanguageFactory(video=self.video)
+        language.followers.add(self.user)
+        self.check_user_videos(self.user, [self.video])
+        language.followers.remove(self.user)
+        self.check_user_videos(self.user, [])
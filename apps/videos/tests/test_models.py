@@ -17,6 +17,7 @@
 # along with this program. If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import contextlib
 import functools
 
 from django.db import IntegrityError
@@ -568,6 +569,38 @@ class AddVideoTest(TestCase):
                      mock.call(signal=signals.video_url_added,
                                sender=video_url, video=video, new_video=True))
 
+    def test_no_network_io_in_transaction(self):
+        # Fetching metadata from the video provider can be slow, so Video.add()
+        # should do it before starting its transaction.  Indexing should be
+        # deferred to a task that runs after the commit.
+        state = {'in_transaction': False}
+        @contextlib.contextmanager
+        def mock_commit_on_success():
+            state['in_transaction'] = True
+            try:
+                yield
+            finally:
+                state['in_transaction'] = False
+        def check_not_in_transaction(*args, **kwargs):
+            assert_false(state['in_transaction'])
+
+        mock_video_type = MockVideoType(self.url, title='vurl title')
+        set_values = mock_video_type.set_values.side_effect
+        def mock_set_values(video):
+            check_not_in_transaction()
+            set_values(video)
+        mock_video_type.set_values.side_effect = mock_set_values
+        mock_video_type.owner_username.side_effect = check_not_in_transaction
+        with mock.patch('django.db.transaction.commit_on_success',
+                        mock_commit_on_success), \
+                mock.patch('videos.tasks.index_video') as mock_index_video:
+            mock_index_video.delay.side_effect = check_not_in_transaction
+            video, video_url = Video.add(mock_video_type, self.user)
+        assert_equal(mock_video_type.set_values.call_count, 1)
+        assert_equal(mock_video_type.owner_username.call_count, 1)
+        assert_equal(mock_index_video.delay.call_args, mock.call(video.pk))
+        assert_equal(video.title, 'vurl title')
+
 class AddVideoTestWithTransactions(TransactionTestCase):
     # These tests is split off from the others because it needs to be inside a
     # TransactionTestCase.  TransactionTestCase is not needed for the other
@@ -21,6 +21,7 @@ import datetime
 import unittest
 
 from django.test import TestCase
+import mock
 
 from babelsubs.storage import SubtitleLine, SubtitleSet
 
@@ -38,6 +39,7 @@ from videos.types.htmlfive import HtmlFiveVideoType
 from videos.types.kaltura import KalturaVideoType
 from videos.types.mp3 import Mp3VideoType
 from videos.types.vimeo import VimeoVideoType
+from videos.types import youtube
 from videos.types.youtube import YoutubeVideoType
 from utils import test_utils
 from externalsites import google
@@ -102,6 +104,26 @@ class YoutubeVideoTypeTest(TestCase):
         # issue in the future
         self.assertEqual(vt.owner_username(), None)
 
+    @test_utils.patch_for_test('externalsites.google.get_video_infos')
+    @test_utils.patch_for_test('externalsites.google.get_video_info')
+    def test_prefetch_video_info(self, mock_get_video_info,
+                                 mock_get_video_infos):
+        video_info = google.VideoInfo('test-channel-id', 'title',
+                                      'description', 100,
+                                      'http://example.com/thumb.png')
+        mock_get_video_infos.return_value = {'_ShmidkrcY0': video_info}
+        vt = YoutubeVideoType('http://www.youtube.com/watch?v=_ShmidkrcY0')
+        youtube.prefetch_video_info_for_video_types([vt, None])
+        self.assertEqual(mock_get_video_infos.call_args,
+                         mock.call(['_ShmidkrcY0']))
+        # get_video_info() should use the cached value
+        self.assertEqual(vt.get_video_info(), video_info)
+        self.assertEqual(mock_get_video_info.call_count, 0)
+        # prefetching again shouldn't make any API calls
+        mock_get_video_infos.reset_mock()
+        youtube.prefetch_video_info(['_ShmidkrcY0'])
+        self.assertEqual(mock_get_video_infos.call_count, 0)
+
     def test_matches_video_url(self):
         for item in self.data:
             self.assertTrue(self.vt.matches_video_url(item['url']))
@@ -232,6 +254,59 @@ class VideoTypeRegistrarTest(TestCase):
         self.assertRaises(VideoTypeError, video_type_registrar.video_type_for_url,
                           'http://youtube.com/v=100500')
 
+    def make_video_type(self, abbreviation, matches, **attrs):
+        attrs.update({
+            'abbreviation': abbreviation,
+            'name': abbreviation,
+            'matches_video_url': mock.Mock(side_effect=matches),
+        })
+        return type('MockVideoType' + abbreviation, (VideoType,), attrs)
+
+    def test_host_dispatch(self):
+        registrar = VideoTypeRegistrar()
+        host_type = self.make_video_type(
+            'host', lambda url: '/video/' in url,
+            HOSTNAMES=('example.com',))
+        generic_type = self.make_video_type(
+            'generic', lambda url: url.endswith('.mp4'))
+        registrar.register(host_type)
+        registrar.register(generic_type)
+        # URLs with other hosts should only be checked against generic types
+        vt = registrar.video_type_for_url('http://other.com/video/foo.mp4')
+        self.assertTrue(isinstance(vt, generic_type))
+        self.assertEqual(host_type.matches_video_url.call_count, 0)
+        # URLs for example.com and its subdomains should be checked against
+        # both, in the order they were registered
+        vt = registrar.video_type_for_url('http://www.example.com/video/1')
+        self.assertTrue(isinstance(vt, host_type))
+        vt = registrar.video_type_for_url('http://example.com/foo.mp4')
+        self.assertTrue(isinstance(vt, generic_type))
+        self.assertEqual(host_type.matches_video_url.call_count, 2)
+
+    def test_url_cache(self):
+        registrar = VideoTypeRegistrar()
+        video_type = self.make_video_type('T', lambda url: True)
+        registrar.register(video_type)
+        url = 'http://example.com/video.mp4'
+        vt1 = registrar.video_type_for_url(url)
+        vt2 = registrar.video_type_for_url(url)
+        self.assertEqual(video_type.matches_video_url.call_count, 1)
+        # We should still create a new VideoType object each time
+        self.assertTrue(isinstance(vt2, video_type))
+        self.assertNotEqual(vt1, vt2)
+
+    def test_uncacheable_types(self):
+        # If we check a type with CACHE_URL_MATCHES=False, we shouldn't cache
+        # the result, since the answer might change next time.
+        registrar = VideoTypeRegistrar()
+        dynamic_type = self.make_video_type('D', lambda url: False,
+                                            CACHE_URL_MATCHES=False)
+        registrar.register(dynamic_type)
+        url = 'http://example.com/video.mp4'
+        self.assertEqual(registrar.video_type_for_url(url), None)
+        self.assertEqual(registrar.video_type_for_url(url), None)
+        self.assertEqual(dynamic_type.matches_video_url.call_count, 2)
+
 class BrightcoveVideoTypeTest(TestCase):
     player_id = '1234'
     video_id = '5678'
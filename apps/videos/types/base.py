@@ -23,8 +23,15 @@ import subprocess, sys, uuid, os
 import requests
 from django.conf import settings
 import logging
+
+from utils.memoize import LRUCache
+
 logger = logging.getLogger("Base video type")
 
+# Timeout (in seconds) for requests to video providers when fetching
+# metadata.  We don't want a slow provider to stall adding a video forever.
+METADATA_TIMEOUT = 10
+
 class VideoType(object):
 
     abbreviation = None
@@ -32,6 +39,16 @@ class VideoType(object):
 
     CAN_IMPORT_SUBTITLES = False
 
+    # Hostnames that this type's URLs can have.  URLs for subdomains of these
+    # hostnames also count.  VideoTypeRegistrar uses this to only try the
+    # types that could possibly match a URL.  Leave this as None for types
+    # that can match URLs on any host.
+    HOSTNAMES = None
+    # Set this to False if matches_video_url() can change its answer for a
+    # URL (for example if it depends on the database).  This stops
+    # VideoTypeRegistrar from caching the results.
+    CACHE_URL_MATCHES = True
+
     def __init__(self, url):
         self.url = url
 
@@ -146,11 +163,18 @@ class VideoType(object):
 class VideoTypeRegistrar(dict):
     
     domains = []
+    # Max number of URLs to remember the matching video type for
+    URL_CACHE_SIZE = 10000
     
     def __init__(self, *args, **kwargs):
         super(VideoTypeRegistrar, self).__init__(*args, **kwargs)
         self.choices = []
         self.type_list = []
+        # maps hostnames to the video types that use them
+        self.host_index = {}
+        # video types that can match URLs on any host
+        self.generic_types = []
+        self.url_cache = LRUCache(self.URL_CACHE_SIZE)
         
     def register(self, video_type):
         self[video_type.abbreviation] = video_type
@@ -158,11 +182,61 @@ class VideoTypeRegistrar(dict):
         self.choices.append((video_type.abbreviation, video_type.name))
         domain = getattr(video_type, 'site', None)
         domain and self.domains.append(domain)
+        if video_type.HOSTNAMES:
+            for hostname in video_type.HOSTNAMES:
+                self.host_index.setdefault(hostname.lower(), []).append(
+                    video_type)
+        else:
+            self.generic_types.append(video_type)
+        self.url_cache.clear()
         
     def video_type_for_url(self, url):
-        for video_type in self.type_list:
+        video_type = self.video_type_class_for_url(url)
+        if video_type is not None:
+            return video_type(url)
+
+    def video_type_class_for_url(self, url):
+        """Get the VideoType subclass that matches a URL
+
+        This is like video_type_for_url(), but it doesn't create the
+        VideoType object, which can require network requests for some types.
+        """
+        try:
+            return self.url_cache[url]
+        except KeyError:
+            video_type, cacheable = self._match_url(url)
+            if cacheable:
+                self.url_cache[url] = video_type
+            return video_type
+
+    def _match_url(self, url):
+        """Find the video type for a URL
+
+        Returns:
+            (video_type, cacheable) tuple.  video_type will be None if no
+            types match.
+        """
+        cacheable = True
+        for video_type in self._candidate_types(url):
+            cacheable = cacheable and video_type.CACHE_URL_MATCHES
             if video_type.matches_video_url(url):
-                return video_type(url)
+                return video_type, cacheable
+        return None, cacheable
+
+    def _candidate_types(self, url):
+        # Get the types that could match url, in the order they were
+        # registered
+        hostname = urlparse((url or '').strip()).hostname
+        if not hostname:
+            return self.generic_types
+        labels = hostname.split('.')
+        candidates = set()
+        for i in xrange(len(labels)):
+            candidates.update(self.host_index.get('.'.join(labels[i:]), []))
+        if not candidates:
+            return self.generic_types
+        candidates.update(self.generic_types)
+        return [t for t in self.type_list if t in candidates]
             
 class VideoTypeError(Exception):
     pass
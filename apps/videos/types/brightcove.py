@@ -22,7 +22,7 @@ import urlparse
 import requests
 
 from vidscraper.errors import Error as VidscraperError
-from base import VideoType, VideoTypeError
+from base import VideoType, VideoTypeError, METADATA_TIMEOUT
 from django.conf import settings
 from django.utils.html import strip_tags
 
@@ -40,6 +40,8 @@ class BrightcoveVideoType(VideoType):
     abbreviation = 'C'
     name = 'Brightcove'
     site = 'brightcove.com'
+    # matches_video_url() also checks the VideoTypeUrlPattern table
+    CACHE_URL_MATCHES = False
     js_url = "//admin.brightcove.com/js/BrightcoveExperiences_all.js"
 
     def __init__(self, url):
@@ -62,7 +64,8 @@ class BrightcoveVideoType(VideoType):
         raise ValueError("cant find %s in %s" % (name, self.url))
 
     def _resolve_url_redirects(self, url):
-        return requests.head(url, allow_redirects=True).url
+        return requests.head(url, allow_redirects=True,
+                             timeout=METADATA_TIMEOUT).url
 
     @property
     def video_id(self):
@@ -24,7 +24,7 @@ from django.utils.translation import ugettext_lazy as _
 import requests
 from requests.exceptions import RequestException
 
-from base import VideoType, VideoTypeError
+from base import VideoType, VideoTypeError, METADATA_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +35,7 @@ class DailymotionVideoType(VideoType):
     abbreviation = 'D'
     name = 'dailymotion.com'
     site = 'dailymotion.com'
+    HOSTNAMES = ('dailymotion.com',)
 
     def __init__(self, url):
         self.url = url
@@ -73,7 +74,7 @@ class DailymotionVideoType(VideoType):
         try:
             response = requests.get(url, params={
                 'fields': 'id,title,description,thumbnail_url'
-            })
+            }, timeout=METADATA_TIMEOUT)
             return response.json()
         except RequestException, e:
             logger.warn("Error requesting dailymotion metadata: {}", e)
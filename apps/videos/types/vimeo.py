@@ -19,7 +19,7 @@
 import requests
 from vidscraper.sites import vimeo
 from vidscraper.errors import Error as VidscraperError
-from base import VideoType, VideoTypeError
+from base import VideoType, VideoTypeError, METADATA_TIMEOUT
 from django.conf import settings
 from django.utils.html import strip_tags
 
@@ -31,6 +31,7 @@ class VimeoVideoType(VideoType):
     abbreviation = 'V'
     name = 'Vimeo.com'   
     site = 'vimeo.com'
+    HOSTNAMES = ('vimeo.com',)
     
     def __init__(self, url):
         self.url = url
@@ -75,7 +76,8 @@ class VimeoVideoType(VideoType):
             except Exception:
                 # in case the Vimeo video is private.
                 pass
-        r = requests.get("https://player.vimeo.com/video/{}/config".format(self.video_id))
+        r = requests.get("https://player.vimeo.com/video/{}/config".format(self.video_id),
+                         timeout=METADATA_TIMEOUT)
         if r.status_code == requests.codes.ok:
             try:
                 video_obj.duration = r.json()[u"video"]["duration"]
@@ -86,7 +88,8 @@ class VimeoVideoType(VideoType):
         return vimeo.VIMEO_REGEX.match(video_url).groupdict().get('video_id') 
 
     def get_direct_url(self, prefer_audio=False):
-        r = requests.get("https://player.vimeo.com/video/{}/config".format(self.video_id))
+        r = requests.get("https://player.vimeo.com/video/{}/config".format(self.video_id),
+                         timeout=METADATA_TIMEOUT)
         if r.status_code == requests.codes.ok:
             try:
                 config = r.json()
@@ -15,12 +15,71 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
+import logging
 import re
 from urlparse import urlparse
 
+from django.core.cache import cache
+
 from base import VideoType
 from externalsites import google
 
+logger = logging.getLogger(__name__)
+
+# How long to cache video info from the youtube API for
+VIDEO_INFO_CACHE_TIMEOUT = 60 * 60
+
+def _video_info_cache_key(video_id):
+    return 'youtube-video-info:{}'.format(video_id)
+
+def get_video_info(video_id):
+    """Get a VideoInfo for a youtube video
+
+    We cache the results so that multiple workers can share them.  If the
+    video info was fetched with prefetch_video_info(), we don't need to make
+    any API calls.
+    """
+    cache_key = _video_info_cache_key(video_id)
+    video_info = cache.get(cache_key)
+    if video_info is None:
+        video_info = google.get_video_info(video_id)
+        cache.set(cache_key, video_info, VIDEO_INFO_CACHE_TIMEOUT)
+    return video_info
+
+def prefetch_video_info(video_ids):
+    """Fetch video info for many youtube videos in as few API calls as possible
+
+    Use this before adding a bunch of videos at once.  The results get stored
+    in the cache, where get_video_info() will find them.
+    """
+    video_ids = set(video_ids)
+    if not video_ids:
+        return
+    cache_keys = dict((_video_info_cache_key(video_id), video_id)
+                      for video_id in video_ids)
+    cached = cache.get_many(cache_keys.keys())
+    missing = [cache_keys[key] for key in cache_keys if key not in cached]
+    if not missing:
+        return
+    try:
+        video_infos = google.get_video_infos(missing)
+    except google.APIError, e:
+        # Not a big deal, get_video_info() will fetch the videos one by one
+        logger.warn("Error prefetching youtube video info: %s", e)
+        return
+    cache.set_many(dict((_video_info_cache_key(video_id), video_info)
+                        for video_id, video_info in video_infos.items()),
+                   VIDEO_INFO_CACHE_TIMEOUT)
+
+def prefetch_video_info_for_video_types(video_types):
+    """Call prefetch_video_info() for the youtube videos in a list of
+    VideoTypes.
+
+    Non-youtube video types and None values are ignored.
+    """
+    prefetch_video_info(vt.video_id for vt in video_types
+                        if isinstance(vt, YoutubeVideoType))
+
 class YoutubeVideoType(VideoType):
 
     _url_patterns = [re.compile(x) for x in [
@@ -75,7 +134,7 @@ class YoutubeVideoType(VideoType):
 
     def get_video_info(self):
         if not hasattr(self, '_video_info'):
-            self._video_info = google.get_video_info(self.video_id)
+            self._video_info = get_video_info(self.video_id)
         return self._video_info
 
     def set_values(self, video):
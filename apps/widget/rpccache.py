@@ -0,0 +1,121 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""widget.rpccache -- Cache responses for anonymous widget RPC calls
+
+Embedded widgets call show_widget on every page load.  For anonymous users
+the response only depends on the arguments, the languages from the request
+headers, and the video data, so we can cache the JSON-encoded response and
+skip the RPC call altogether.
+
+Entries are keyed by the method name, the arguments, and the request
+languages.  Each entry stores the video id and the widget version for the
+video (see video_cache.get_widget_version()) that it was built with.  We
+rebuild the entry if the version changes or the entry is older than
+RESPONSE_TIMEOUT.
+
+To avoid a stampede when a popular entry needs to be rebuilt, only the
+process that gets the rebuild lock calls the RPC method.  The others keep
+serving the stale response until the new one is ready.
+"""
+
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.utils import translation
+
+from utils.translation import get_user_languages_from_request
+from widget import video_cache
+
+CACHEABLE_METHODS = set([
+    'show_widget',
+])
+# How long until we rebuild responses
+RESPONSE_TIMEOUT = 60
+# How long we keep responses around to serve while they're being rebuilt
+STALE_TIMEOUT = 10 * 60
+LOCK_TIMEOUT = 30
+
+def can_cache(request, method_name, args):
+    """Check if we can use the cache for an RPC call
+
+    Args:
+        request: HttpRequest for the call
+        method_name: RPC method name
+        args: dict of arguments for the method
+    """
+    return (method_name in CACHEABLE_METHODS and
+            not request.user.is_authenticated() and
+            # additional_video_urls makes show_widget save the URLs
+            not args.get('additional_video_urls'))
+
+def get_json(request, method_name, func, args):
+    """Call an RPC method and return the JSON-encoded result
+
+    If we have a cached response, we return it instead of calling func.
+    Only call this if can_cache() returns True.
+
+    Args:
+        request: HttpRequest for the call
+        method_name: RPC method name
+        func: RPC method to call
+        args: dict of arguments for the method, including request
+    """
+    cache_key = _cache_key(request, method_name, args)
+    entry = cache.get(cache_key)
+    if entry is not None and _is_fresh(entry):
+        return entry['body']
+    lock_key = cache_key + ':lock'
+    got_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if entry is not None and not got_lock:
+        # Another process is rebuilding the entry
+        return entry['body']
+    try:
+        result = func(**args)
+        body = json.dumps(result)
+        if isinstance(result, dict) and result.get('video_id'):
+            video_id = result['video_id']
+            # We fetch the version after the call, so if the video changes
+            # while it's running, we can store a stale response with the new
+            # version.  RESPONSE_TIMEOUT limits how long we serve it for.
+            cache.set(cache_key, {
+                'body': body,
+                'video_id': video_id,
+                'version': video_cache.get_widget_version(video_id),
+                'expires': time.time() + RESPONSE_TIMEOUT,
+            }, STALE_TIMEOUT)
+    finally:
+        if got_lock:
+            cache.delete(lock_key)
+    return body
+
+def _is_fresh(entry):
+    return (entry['expires'] > time.time() and
+            entry['version'] ==
+            video_cache.get_widget_version(entry['video_id']))
+
+def _cache_key(request, method_name, args):
+    key_data = json.dumps([
+        method_name,
+        dict((k, v) for k, v in args.items() if k != 'request'),
+        get_user_languages_from_request(request),
+        translation.get_language_from_request(request),
+    ], sort_keys=True)
+    return 'widget-rpc:{}'.format(hashlib.sha1(key_data).hexdigest())
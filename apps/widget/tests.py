@@ -0,0 +1,105 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+from nose.tools import *
+import mock
+
+from utils.factories import *
+from widget import rpccache, video_cache
+
+class RPCCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.video = VideoFactory()
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+        self.func = mock.Mock(return_value={
+            'video_id': self.video.video_id,
+        })
+        self.args = {
+            'request': self.request,
+            'video_url': 'http://example.com/video.mp4',
+            'is_remote': True,
+        }
+
+    def get_json(self):
+        return rpccache.get_json(self.request, 'show_widget', self.func,
+                                 self.args)
+
+    def test_can_cache(self):
+        assert_true(rpccache.can_cache(self.request, 'show_widget',
+                                       self.args))
+        assert_false(rpccache.can_cache(self.request, 'fetch_subtitles',
+                                        self.args))
+        self.args['additional_video_urls'] = ['http://example.com/2.mp4']
+        assert_false(rpccache.can_cache(self.request, 'show_widget',
+                                        self.args))
+        self.request.user = UserFactory()
+        del self.args['additional_video_urls']
+        assert_false(rpccache.can_cache(self.request, 'show_widget',
+                                        self.args))
+
+    def test_cache_hit(self):
+        assert_equal(json.loads(self.get_json()),
+                     {'video_id': self.video.video_id})
+        assert_equal(json.loads(self.get_json()),
+                     {'video_id': self.video.video_id})
+        assert_equal(self.func.call_count, 1)
+
+    def test_different_args(self):
+        self.get_json()
+        self.args['is_remote'] = False
+        self.get_json()
+        assert_equal(self.func.call_count, 2)
+
+    def test_invalidate(self):
+        self.get_json()
+        video_cache.invalidate_cache(self.video.video_id)
+        self.get_json()
+        assert_equal(self.func.call_count, 2)
+
+    def test_errors_not_cached(self):
+        self.func.return_value = {'error_msg': 'error'}
+        self.get_json()
+        self.get_json()
+        assert_equal(self.func.call_count, 2)
+
+    def test_serve_stale_while_rebuilding(self):
+        with mock.patch.object(rpccache, 'RESPONSE_TIMEOUT', -1):
+            self.get_json()
+        self.func.return_value = {'video_id': self.video.video_id, 'new': 1}
+        # Simulate another process rebuilding the response.  We should
+        # return the stale response rather than calling func again.
+        lock_key = rpccache._cache_key(self.request, 'show_widget',
+                                       self.args) + ':lock'
+        cache.add(lock_key, 1)
+        assert_equal(json.loads(self.get_json()),
+                     {'video_id': self.video.video_id})
+        assert_equal(self.func.call_count, 1)
+        # Once the lock is released, we should rebuild it
+        cache.delete(lock_key)
+        assert_equal(json.loads(self.get_json()),
+                     {'video_id': self.video.video_id, 'new': 1})
+        assert_equal(self.func.call_count, 2)
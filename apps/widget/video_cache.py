@@ -24,6 +24,7 @@ from django.utils.translation import (
     ugettext_lazy as _
 )
 
+from utils import codes
 from videos.types import video_type_registrar
 from videos.types.base import VideoTypeError
 import unilangs
@@ -67,8 +68,24 @@ def associate_extra_url(video_url, video_id):
         cache.set(cache_key, video_url.videoid, TIMEOUT)
 
 
+def get_widget_version(video_id):
+    """Get the version of the cached widget data for a video
+
+    The version changes each time the widget data is invalidated, which lets
+    widget.rpccache know when its cached responses are out of date.
+    """
+    cache_key = _widget_version_key(video_id)
+    version = cache.get(cache_key)
+    if version is None:
+        version = codes.make_code()
+        if not cache.add(cache_key, version, TIMEOUT):
+            # Another process set the version first
+            version = cache.get(cache_key) or version
+    return version
+
 # Invalidation
 def invalidate_cache(video_id):
+    cache.delete(_widget_version_key(video_id))
     cache.delete(_video_urls_key(video_id))
 
     try:
@@ -108,9 +125,11 @@ def invalidate_video_id(video_url):
     cache.delete(_video_id_key(video_url))
 
 def invalidate_video_moderation(video_id):
+    cache.delete(_widget_version_key(video_id))
     cache.delete(_video_is_moderated_key(video_id))
 
 def invalidate_video_visibility(video_id):
+    cache.delete(_widget_version_key(video_id))
     cache.delete(_video_visibility_policy_key(video_id))
 
 def on_video_url_delete(sender, instance, **kwargs):
@@ -120,6 +139,9 @@ def on_video_url_delete(sender, instance, **kwargs):
 def _video_id_key(video_url):
     return 'video_id_{0}'.format(hashlib.sha1(video_url).hexdigest())
 
+def _widget_version_key(video_id):
+    return 'widget_version_{0}'.format(video_id)
+
 def _video_urls_key(video_id):
     return 'widget_video_urls_{0}'.format(video_id)
 
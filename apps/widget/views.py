@@ -44,7 +44,9 @@ from teams.models import Task
 from teams.permissions import get_member
 from utils import DEFAULT_PROTOCOL
 from utils.decorators import staff_member_required
+from utils.http import not_modified, not_modified_response, set_cache_headers
 from videos import models
+from widget import rpccache
 from widget.models import SubtitlingSession
 from widget.null_rpc import NullRpc
 from widget.rpc import add_general_settings, Rpc
@@ -342,7 +344,10 @@ def download_subtitles(request, format):
         raise Http404
     if not format in babelsubs.get_available_formats():
         raise HttpResponseServerError("Format not found")
-    
+
+    cache_info = version.http_cache_info(format)
+    if not_modified(request, cache_info['etag']):
+        return not_modified_response(**cache_info)
     subs_text = babelsubs.to(version.get_subtitles(), format, language=version.language_code)
     # since this is a downlaod, we can afford not to escape tags, specially true
     # since speaker change is denoted by '>>' and that would get entirely stripped out
@@ -364,6 +369,7 @@ def download_subtitles(request, format):
         filename_header = 'filename*=UTF-8\'\'%s' % iri_to_uri(original_filename.encode('utf-8'))
 
     response['Content-Disposition'] = 'attachment; ' + filename_header
+    set_cache_headers(response, **cache_info)
     return response
 
 def _is_loggable(method):
@@ -390,6 +396,14 @@ def rpc(request, method_name, null=False):
     except AttributeError:
         return HttpResponseServerError('no method named ' + method_name)
 
+    if not null and rpccache.can_cache(request, method_name, args):
+        try:
+            body = rpccache.get_json(request, method_name, func, args)
+        except TypeError:
+            body = json.dumps({'error': 'Incorrect number of arguments',
+                               'traceback': traceback.format_exc()})
+        return HttpResponse(body, "application/json")
+
     try:
         result = func(**args)
     except TypeError:
@@ -430,7 +444,10 @@ def jsonp(request, method_name, null=False):
             args[k.encode('ascii')] = json.loads(v)
     rpc_module = null_rpc_views if null else rpc_views
     func = getattr(rpc_module, method_name)
-    result = func(**args)
+    if not null and rpccache.can_cache(request, method_name, args):
+        body = rpccache.get_json(request, method_name, func, args)
+    else:
+        body = json.dumps(func(**args))
     return HttpResponse(
-        "{0}({1});".format(callback, json.dumps(result)),
+        "{0}({1});".format(callback, body),
         "text/javascript")
@@ -38,6 +38,7 @@ CACHE_TIMEOUT = 60
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 NOSE_PLUGINS = ['utils.test_utils.plugin.UnisubsTestPlugin']
 CELERY_ALWAYS_EAGER = True
+STATIC_MEDIA_BUILD_CACHE_DIR = None
 
 YOUTUBE_CLIENT_ID = 'test-youtube-id'
 YOUTUBE_CLIENT_SECRET = 'test-youtube-secret'
@@ -14,6 +14,7 @@ from django.core.validators import validate_ipv4_address
 from django.utils.cache import patch_vary_headers
 from django.utils.http import cookie_date
 
+from utils import metrics
 from utils.dataprintout import DataPrinter
 
 access_logger = logging.getLogger('access')
@@ -108,10 +109,31 @@ class AmaraSecurityMiddleware(object):
             pass
 
 class LogRequest(object):
+    """Log requests to the access logger
+
+    To keep the overhead low, we only calculate the log data if we're
+    actually going to log the request.  Fast, successful requests can be
+    sampled with the ACCESS_LOG_SAMPLE_RATE setting.  Slow requests (see
+    ACCESS_LOG_SLOW_REQUEST_TIME) and error responses are always logged.
+    """
     MAX_BODY_SIZE = 2048
 
+    def __init__(self):
+        self.sample_rate = getattr(settings, 'ACCESS_LOG_SAMPLE_RATE', 1.0)
+        self.slow_request_time = getattr(settings,
+                                         'ACCESS_LOG_SLOW_REQUEST_TIME', 1.0)
+        metrics.install()
+
     def process_request(self, request):
         request._start_time = time.time()
+        metrics.reset()
+        metrics.start()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_name = '{}.{}'.format(
+            view_func.__module__,
+            getattr(view_func, '__name__', view_func.__class__.__name__))
+
     def process_exception(self, request, exception):
         try:
             msg = u'{}'.format(exception)
@@ -128,13 +150,33 @@ class LogRequest(object):
         return response
 
     def log_response(self, request, response):
+        metrics_data = metrics.stop()
+        if not hasattr(request, '_start_time'):
+            # process_request() wasn't called, for example because an
+            # earlier middleware returned a response.
+            return
         total_time = time.time() - request._start_time
+        view_name = getattr(request, '_view_name', None)
+        if view_name is not None:
+            metrics.aggregator.add(view_name, metrics_data)
+        if not self.should_log(response, total_time):
+            return
         msg = u'{} {} {} ({:.3f}s)'.format(request.method, request.path_info,
                                            response.status_code, total_time)
         extra = self.calc_extra(request, response)
         extra['time'] = total_time
+        extra['metrics'] = metrics_data
+        if view_name is not None:
+            extra['view'] = view_name
         access_logger.info(msg, extra=extra)
 
+    def should_log(self, response, total_time):
+        if not access_logger.isEnabledFor(logging.INFO):
+            return False
+        if response.status_code >= 400 or total_time >= self.slow_request_time:
+            return True
+        return random.random() < self.sample_rate
+
     def calc_extra(self, request, response=None):
         extra = {
             'method': request.method,
@@ -150,16 +192,29 @@ class LogRequest(object):
             extra['user'] = '<null>'
         if request.GET:
             extra['query'] = data_printer.printout(request.GET)
-        try:
-            post_data = request.POST
-        except StandardError, e:
-            extra['post_data'] = 'parse error: {}'.format(e)
-        else:
-            if post_data:
-                extra['post_data'] = data_printer.printout(
-                    self.scrub_post_data(post_data))
+        if self.should_print_post_data(request):
+            try:
+                post_data = request.POST
+            except StandardError, e:
+                extra['post_data'] = 'parse error: {}'.format(e)
+            else:
+                if post_data:
+                    extra['post_data'] = data_printer.printout(
+                        self.scrub_post_data(post_data))
         return extra
 
+    def should_print_post_data(self, request):
+        # Don't make django parse the POST data just for logging, unless it's
+        # small.  Large bodies like subtitle uploads have either already been
+        # parsed by the view or we skip them.
+        if hasattr(request, '_post'):
+            return True
+        try:
+            size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return False
+        return size <= self.MAX_BODY_SIZE
+
     def scrub_post_data(self, post_data):
         return dict((k, v if 'password' not in k else '*scrubbed')
                     for (k, v) in post_data.items())
@@ -371,6 +371,12 @@ DEFAULT_BUCKET = ''
 AWS_USER_DATA_BUCKET_NAME  = ''
 STATIC_MEDIA_USES_S3 = USE_AMAZON_S3 = False
 STATIC_MEDIA_COMPRESSED = False
+# Directory to store built media bundles in, keyed by a hash of their inputs.
+# Set to None to disable the build cache.  The directory must not be writable
+# by other users, since we use its contents as the bundle output.
+STATIC_MEDIA_BUILD_CACHE_DIR = rel('.bundle-build-cache')
+# Remove build cache entries that haven't been used for this many seconds
+STATIC_MEDIA_BUILD_CACHE_MAX_AGE = 60 * 60 * 24 * 30
 
 AVATAR_MAX_SIZE = 500*1024
 THUMBNAILS_SIZE = (
@@ -407,6 +413,21 @@ API_DOCS_MODULES = [
     'api.views.teams',
 ]
 
+# If True, API calls that add subtitles identical to the current version
+# don't create a new version.
+API_SKIP_UNCHANGED_SUBTITLES = False
+
+# Cache-Control max-age for subtitle downloads of public versions.  After
+# this, clients revalidate using the ETag header.
+SUBTITLES_CACHE_MAX_AGE = 60
+
+# Timeouts for values stored with CacheGroup.get_or_calc().  After the soft
+# timeout, one process recalculates the value while the others keep using
+# the previous one.  The hard timeout is how long values stay in the cache.
+# None means no timeout/the cache backend's default.
+CACHE_GROUP_SOFT_TIMEOUT = None
+CACHE_GROUP_HARD_TIMEOUT = None
+
 MEDIA_BUNDLES = {
     "base.css": {
         "files": (
@@ -720,6 +741,12 @@ LOGGING = {
 if env_flag_set('DB_LOGGING'):
     LOGGING['loggers']['django.db'] = { 'level': 'DEBUG' }
 
+# Fraction of fast, successful requests to write to the access log.  Error
+# responses and requests slower than ACCESS_LOG_SLOW_REQUEST_TIME seconds are
+# always logged.
+ACCESS_LOG_SAMPLE_RATE = 1.0
+ACCESS_LOG_SLOW_REQUEST_TIME = 1.0
+
 TMP_FOLDER = "/tmp/"
 
 SOUTH_MIGRATION_MODULES = {
@@ -34,12 +34,16 @@ CELERY_DEFAULT_QUEUE = "default"
 CELERYBEAT_SCHEDULE = {
     'expire-tasks': {
         'task': 'teams.tasks.expire_tasks',
-        'schedule': crontab(minute=0, hour=7),
+        'schedule': crontab(minute=5),
     },
     'expire-login-tokens': {
         'task': 'auth.tasks.expire_login_tokens',
         'schedule': crontab(minute=10, hour=23),
     },
+    'process-award-events': {
+        'task': 'auth.tasks.process_award_events',
+        'schedule': crontab(minute='*/5'),
+    },
     'add_videos_notification_daily': {
         'task': 'teams.tasks.add_videos_notification_daily',
         'schedule': crontab(minute=0, hour=23),
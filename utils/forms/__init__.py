@@ -11,7 +11,8 @@ from django.utils.translation import ugettext_lazy as _, ugettext
 from .autocomplete import AutocompleteTextInput
 from .dates import MonthChoiceField
 from .formrouter import FormRouter
-from .languages import MultipleLanguageChoiceField
+from .languages import (LanguageChoiceField, LanguageSelect,
+                        LanguageSelectMultiple, MultipleLanguageChoiceField)
 from .recapcha import ReCaptchaField
 from .teamautocomplete import TeamAutocompleteField, autocomplete_team_view
 from .userautocomplete import UserAutocompleteField, autocomplete_user_view
@@ -27,6 +28,8 @@ class AjaxForm(object):
         return output
 
 class LanguageCodeField(forms.ChoiceField):
+    widget = LanguageSelect
+
     def __init__(self, *args, **kwargs):
         self.with_any = kwargs.pop('with_any', None)
         kwargs['choices'] = self.static_choices() + get_language_choices()
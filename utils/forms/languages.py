@@ -18,13 +18,88 @@
 
 """utils.forms.languages -- form fields for selecting languages."""
 
+from itertools import chain
+
 from django import forms
+from django.utils.encoding import force_unicode
+from django.utils.html import escape
+from django.utils.translation import get_language
 
 from utils.translation import get_language_choices
 
+# Maps (locale, choices) -> rendered <option> tags, with nothing selected
+_rendered_options_cache = {}
+RENDERED_OPTIONS_CACHE_SIZE = 100
+
+class CachedOptionsMixin(object):
+    """Mixin for Select widgets that caches the rendered <option> tags
+
+    Language selects have hundreds of options and a page like the team videos
+    page has several of them, so rendering the options adds up.  This class
+    renders the options once per locale/choice list, then marks the selected
+    options by replacing their opening tag.
+    """
+
+    def render_options(self, choices, selected_choices):
+        choices = list(chain(self.choices, choices))
+        key = (get_language(), _choices_cache_key(choices))
+        try:
+            output = _rendered_options_cache[key]
+        except TypeError:
+            # unhashable choices, render them without the cache
+            output = self.render_unselected_options(choices)
+        except KeyError:
+            output = self.render_unselected_options(choices)
+            if len(_rendered_options_cache) >= RENDERED_OPTIONS_CACHE_SIZE:
+                _rendered_options_cache.clear()
+            _rendered_options_cache[key] = output
+        if self.allow_multiple_selected:
+            count = -1
+        else:
+            count = 1
+        for value in set(force_unicode(v) for v in selected_choices):
+            value = escape(value)
+            output = output.replace(
+                u'<option value="%s">' % value,
+                u'<option value="%s" selected="selected">' % value,
+                count)
+        return output
+
+    def render_unselected_options(self, choices):
+        output = []
+        for option_value, option_label in choices:
+            if isinstance(option_label, (list, tuple)):
+                output.append(u'<optgroup label="%s">' %
+                              escape(force_unicode(option_value)))
+                for option in option_label:
+                    output.append(self.render_option(set(), *option))
+                output.append(u'</optgroup>')
+            else:
+                output.append(self.render_option(set(), option_value,
+                                                 option_label))
+        return u'\n'.join(output)
+
+def _choices_cache_key(choices):
+    # The choices usually come from get_language_choices(), where the
+    # (code, label) items are already tuples of unicode strings.  Use them
+    # as-is and only convert the optgroup lists to tuples, since this runs
+    # on every render.
+    return tuple(
+        (value, tuple(label) if isinstance(label, list) else label)
+        for value, label in choices)
+
+class LanguageSelect(CachedOptionsMixin, forms.Select):
+    pass
+
+class LanguageSelectMultiple(CachedOptionsMixin, forms.SelectMultiple):
+    pass
+
+class LanguageChoiceField(forms.ChoiceField):
+    widget = LanguageSelect
+
 class MultipleLanguageChoiceField(forms.MultipleChoiceField):
     # TODO: implement a nicer widget for selecting multiple languages
-    widget = forms.SelectMultiple
+    widget = LanguageSelectMultiple
 
     def __init__(self, *args, **kwargs):
         super(MultipleLanguageChoiceField, self).__init__(*args, **kwargs)
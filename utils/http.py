@@ -15,6 +15,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 import requests
 
 def url_exists(url):
@@ -28,3 +33,60 @@ def url_exists(url):
         return 200 <= requests.head(url, timeout=15.0).status_code < 400
     except (requests.ConnectionError, requests.Timeout):
         return False
+
+def make_etag(*parts):
+    """Make an ETag value by hashing a list of parts."""
+    data = u':'.join(unicode(part) for part in parts)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def not_modified(request, etag):
+    """Check if the client's copy of a resource is current
+
+    This handles the If-None-Match header for GET and HEAD requests.  Call it
+    before doing any expensive work to build the response.  If it returns
+    True, return not_modified_response().
+
+    We only support ETags.  Our responses usually depend on more than one
+    object (the subtitle version being served, the video's cache version,
+    etc.), so there's no single timestamp that we could use for
+    Last-Modified/If-Modified-Since.
+
+    Args:
+        request: HttpRequest
+        etag: ETag for the current version of the resource
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is None:
+        return False
+    etags = parse_etags(if_none_match)
+    return etag in etags or '*' in etags
+
+def not_modified_response(etag=None, **cache_kwargs):
+    response = HttpResponseNotModified()
+    set_cache_headers(response, etag, **cache_kwargs)
+    return response
+
+def set_cache_headers(response, etag=None, public=False, max_age=0,
+                      vary=None):
+    """Set the ETag and Cache-Control headers for a response
+
+    Args:
+        response: HttpResponse to change
+        etag: ETag value
+        public: can the response be stored by shared caches?  Only set this
+            if anonymous users can see the resource.
+        max_age: Number of seconds clients can use the response for before
+            revalidating it.
+        vary: list of headers that the response varies on
+    """
+    if etag is not None:
+        response['ETag'] = quote_etag(etag)
+    if public:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True, max_age=0,
+                            must_revalidate=True)
+    if vary:
+        patch_vary_headers(response, vary)
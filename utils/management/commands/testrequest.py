@@ -16,39 +16,147 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+"""Run a test request
+
+Usage:
+
+    manage.py testrequest <url> [<username>]
+
+By default, we run the request once and print out the response.  Use the
+--runs/--profile/--baseline options to benchmark the request instead:
+
+    - We run the request N times with a warm cache.  If --clear-cache is
+      given, we also run it N times cold (clearing the cache before each
+      run).
+    - For each set of runs, we print the median time, DB query count and
+      cache call count
+    - --profile runs the warm requests under cProfile
+    - --save-baseline saves the results to a JSON file.  --baseline compares
+      the results against a saved baseline and exits with an error if the
+      request got worse.
+
+--clear-cache calls cache.clear(), so we only allow it when the default cache
+is the locmem cache.  The dev and test settings use the shared memcached
+server, so you need a settings file that overrides CACHES for cold runs:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+Use a test database to avoid touching real data, for example:
+
+    manage.py testrequest --settings=dev_settings_test --test-db \\
+        --runs=10 /videos/watch/ admin
+"""
+
+from optparse import make_option
 from urlparse import urlparse, parse_qs
+import cProfile
+import json
+import pstats
+import time
 
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.sessions.middleware import SessionMiddleware
-from django.core.management.base import BaseCommand
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.core.urlresolvers import resolve
+from django.db import connection
+from django.conf import settings
 from django.test import RequestFactory
 
 from auth.models import CustomUser as User
 from localeurl.utils import strip_path
 from auth.middleware import AmaraAuthenticationMiddleware
+from utils import metrics
 
 middleware_to_apply = [
     SessionMiddleware(),
     AmaraAuthenticationMiddleware(),
 ]
 
+# Stats that we compare against the baseline
+BASELINE_STATS = ['time', 'db_count', 'cache_count']
+
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
 class Command(BaseCommand):
     help = u'Run a test request'
-    
-    def handle(self, *args, **kwargs):
+    option_list = BaseCommand.option_list + (
+        make_option('-n', '--runs', dest='runs', default=None, type='int',
+                    help='Number of times to run the request'),
+        make_option('-p', '--profile', dest='profile', default=None,
+                    help='Profile the warm runs and save the stats to a '
+                    'file'),
+        make_option('--baseline', dest='baseline', default=None,
+                    help='Compare against a baseline JSON file'),
+        make_option('--save-baseline', dest='save-baseline', default=None,
+                    help='Save the results to a baseline JSON file'),
+        make_option('--time-tolerance', dest='time-tolerance', default=0.5,
+                    type='float',
+                    help='Fail if the median time is this fraction slower '
+                    'than the baseline (default: 0.5)'),
+        make_option('--clear-cache', dest='clear-cache', action='store_true',
+                    default=False,
+                    help='Also run the request cold, clearing the cache '
+                    'before each run.  Requires the locmem cache.'),
+        make_option('--test-db', dest='test-db', action='store_true',
+                    default=False,
+                    help='Create a test database, populated with '
+                    'setup_test_data'),
+    )
+
+    def handle(self, *args, **options):
         try:
             url = args[0]
         except IndexError:
             self.stderr.write("manage testrequest url [username]\n")
             return
+        if options['clear-cache']:
+            self.check_can_clear_cache()
+        if options['test-db']:
+            old_db_name = self.setup_test_db()
         try:
-            username = args[1]
-        except IndexError:
-            user = AnonymousUser()
+            user = self.get_user(args[1] if len(args) > 1 else None)
+            path, query = self.parse_url(url)
+            if (options['runs'] or options['profile'] or
+                    options['baseline'] or options['save-baseline'] or
+                    options['clear-cache']):
+                self.benchmark(path, query, user, options)
+            else:
+                response = self.run_request(path, query, user)
+                print response.status_code
+                print response.content
+        finally:
+            if options['test-db']:
+                connection.creation.destroy_test_db(old_db_name, verbosity=0)
+
+    def check_can_clear_cache(self):
+        backend = settings.CACHES['default']['BACKEND']
+        if backend != LOCMEM_CACHE_BACKEND:
+            raise CommandError(
+                "--clear-cache would clear the {} cache.  Use settings with "
+                "the locmem cache for cold runs.".format(backend))
+
+    def setup_test_db(self):
+        if 'south' in settings.INSTALLED_APPS:
+            from south.management.commands import patch_for_test_db_setup
+            patch_for_test_db_setup()
+        old_db_name = settings.DATABASES['default']['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        call_command('setup_test_data')
+        return old_db_name
+
+    def get_user(self, username):
+        if username is None:
+            return AnonymousUser()
         else:
-            user = User.objects.get(username=username)
-        path, query = self.parse_url(url)
+            return User.objects.get(username=username)
+
+    def run_request(self, path, query, user):
         request = RequestFactory().get(path, query)
         request.LANGUAGE_CODE = 'en'
         request.user = user
@@ -58,11 +166,99 @@ class Command(BaseCommand):
         response = match.func(request, *match.args, **match.kwargs)
         if hasattr(response, 'render'):
             response.render()
-        print response.status_code
-        print response.content
+        return response
+
+    def benchmark(self, path, query, user, options):
+        runs = options['runs'] or 1
+        metrics.install()
+        results = {}
+        if options['clear-cache']:
+            results['cold'] = self.run_many(path, query, user, runs,
+                                            cold=True)
+        results['warm'] = self.run_many(path, query, user, runs, cold=False,
+                                        profile=options['profile'])
+        for name in sorted(results):
+            self.stdout.write('{:<5} {}\n'.format(name, ' '.join(
+                '{}: {}'.format(stat, results[name][stat])
+                for stat in BASELINE_STATS)))
+        if options['profile']:
+            self.stdout.write('profile saved to {}\n'.format(
+                options['profile']))
+            stats = pstats.Stats(options['profile'], stream=self.stdout)
+            stats.sort_stats('cumulative').print_stats(30)
+        if options['save-baseline']:
+            with open(options['save-baseline'], 'w') as f:
+                json.dump(results, f, indent=4)
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.check_baseline(results, baseline,
+                                              options['time-tolerance'])
+            if regressions:
+                raise CommandError('Regressions:\n{}'.format(
+                    '\n'.join(regressions)))
+            self.stdout.write('No regressions\n')
+
+    def run_many(self, path, query, user, runs, cold, profile=None):
+        """Run a request multiple times
+
+        Returns:
+            dict containing the median time, DB query count and cache call
+            count.
+        """
+        if not cold:
+            # warm the cache
+            self.run_request(path, query, user)
+        if profile:
+            profiler = cProfile.Profile()
+        samples = []
+        for i in xrange(runs):
+            if cold:
+                cache.clear()
+            metrics.reset()
+            metrics.start()
+            if profile:
+                profiler.enable()
+            response = self.run_request(path, query, user)
+            if profile:
+                profiler.disable()
+            data = metrics.stop()
+            if response.status_code >= 400:
+                raise CommandError('Bad response: {}'.format(
+                    response.status_code))
+            samples.append(data)
+        if profile:
+            profiler.dump_stats(profile)
+        return dict((stat, median([s.get(stat, 0) for s in samples]))
+                    for stat in BASELINE_STATS)
+
+    def check_baseline(self, results, baseline, time_tolerance):
+        regressions = []
+        for name in sorted(results):
+            for stat in BASELINE_STATS:
+                value = results[name][stat]
+                try:
+                    baseline_value = baseline[name][stat]
+                except KeyError:
+                    continue
+                if stat == 'time':
+                    limit = baseline_value * (1 + time_tolerance)
+                else:
+                    limit = baseline_value
+                if value > limit:
+                    regressions.append('{} {}: {} (baseline: {})'.format(
+                        name, stat, value, baseline_value))
+        return regressions
 
     def parse_url(self, url):
         parsed = urlparse(url)
         locale, path = strip_path(parsed.path)
         return path, parse_qs(parsed.query)
 
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    else:
+        return (values[middle - 1] + values[middle]) / 2.0
@@ -0,0 +1,54 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from utils import metrics
+
+class Command(BaseCommand):
+    help = u'Print percentiles for the aggregated view/task metrics'
+    option_list = BaseCommand.option_list + (
+        make_option('-m', '--metric', dest='metric', default='time',
+                    help='Metric to print (time, db_count, db_time, '
+                    'cache_count, cache_time, celery_enqueue_count)'),
+        make_option('-l', '--limit', dest='limit', default=50, type='int',
+                    help='Number of views/tasks to print'),
+        make_option('--reset', dest='reset', action='store_true',
+                    default=False, help='Clear the aggregated metrics'),
+    )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            metrics.reset_aggregates()
+            return
+        metric = options['metric']
+        rows = []
+        for name, data in metrics.get_aggregates().items():
+            if metric in data:
+                rows.append((name, data[metric]))
+        # sort by p90, then by count
+        rows.sort(key=lambda (name, info): (info['p90'], info['count']),
+                  reverse=True)
+        self.stdout.write('{:<70} {:>8} {:>8} {:>8} {:>8}\n'.format(
+            metric, 'count', 'p50', 'p90', 'p99'))
+        for name, info in rows[:options['limit']]:
+            self.stdout.write('{:<70} {:>8} {:>8} {:>8} {:>8}\n'.format(
+                name, info['count'], info['p50'], info['p90'], info['p99']))
@@ -18,7 +18,9 @@
 
 """memoize -- simple memoization utilities."""
 
+import collections
 import functools
+import threading
 
 NOT_COMPUTED = object()
 
@@ -52,3 +54,37 @@ def memoize(func):
             memo.set_value(func())
         return memo.value
     return wrapper
+
+class LRUCache(object):
+    """Dict-like cache that holds at most max_size items.
+
+    When the cache is full, adding a new item evicts the least recently used
+    one.  It's safe to share an LRUCache between threads.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = self.data.pop(key)
+            self.data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            if len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
@@ -0,0 +1,372 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""utils.metrics -- Count DB queries, cache calls, and celery tasks
+
+This module tracks the number of DB queries, cache calls, and celery tasks
+enqueued, and the time spent on them, while a unit of work (for example a
+request or a celery task) runs.
+
+Usage:
+
+    metrics.install()
+    metrics.start()
+    ... do some work ...
+    data = metrics.stop()
+
+install() patches the DB connections, the cache, and celery's apply_async()
+once, per-process.  The patched methods check if there's a Metrics object
+active for the current thread and only do extra work if there is one.
+
+start()/stop() calls can be nested.  For example, when a celery task runs
+eagerly inside a request, its queries are counted for the task rather than
+the request.
+
+Aggregated metrics
+------------------
+
+We also aggregate metrics for each view and task, so that we can calculate
+percentiles.  To keep the overhead low, values are stored in histograms
+in-process, then merged into the histograms stored in the cache every
+FLUSH_INTERVAL seconds.  The merge isn't atomic, so a few samples can get
+lost if 2 processes flush at the same time, which is fine for stats like
+these.  Use get_aggregates() to get the percentiles.
+"""
+
+from __future__ import absolute_import
+import bisect
+import functools
+import math
+import threading
+import time
+
+from celery.app.task import Task
+from django.core.cache import cache
+from django.db.backends import BaseDatabaseWrapper
+
+CACHE_METHODS = [
+    'get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many',
+    'incr', 'decr',
+]
+
+# Histogram buckets for the aggregated metrics.  Values higher than the last
+# bucket go in an overflow bucket.
+TIME_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000,
+                30000] # milliseconds
+COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+AGGREGATE_METRICS = [
+    ('time', TIME_BUCKETS),
+    ('db_count', COUNT_BUCKETS),
+    ('db_time', TIME_BUCKETS),
+    ('cache_count', COUNT_BUCKETS),
+    ('cache_time', TIME_BUCKETS),
+    ('celery_enqueue_count', COUNT_BUCKETS),
+    ('subtitle_lock_wait_time', TIME_BUCKETS),
+]
+PERCENTILES = [50, 90, 99]
+FLUSH_INTERVAL = 60
+AGGREGATE_TIMEOUT = 7 * 24 * 60 * 60
+AGGREGATE_NAMES_KEY = 'metrics-aggregate-names'
+
+_local = threading.local()
+_installed = False
+
+class Metrics(object):
+    """Tracks counts and times for one unit of work."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.counts = {}
+        self.times = {}
+
+    def record(self, name, elapsed):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.times[name] = self.times.get(name, 0.0) + elapsed
+
+    def incr(self, name):
+        """Count an event that we don't time."""
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def data(self):
+        """Get a dict of the metrics, suitable for logging."""
+        data = {}
+        for name, count in self.counts.items():
+            data['{}_count'.format(name)] = count
+            if name in self.times:
+                data['{}_time'.format(name)] = round(self.times[name], 4)
+        return data
+
+def current():
+    """Get the active Metrics object for this thread, or None."""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+def start():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    metrics = Metrics()
+    _local.stack.append(metrics)
+    return metrics
+
+def stop():
+    """Stop tracking metrics
+
+    Returns:
+        dict of metrics data.  This has the count/time for each type of
+        operation, and the total time.
+    """
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return {}
+    metrics = stack.pop()
+    data = metrics.data()
+    data['time'] = round(time.time() - metrics.start_time, 4)
+    return data
+
+def incr(name):
+    """Count an event for the current unit of work, if there is one."""
+    metrics = current()
+    if metrics is not None:
+        metrics.incr(name)
+
+def record(name, elapsed):
+    """Record a timed event for the current unit of work, if there is one.
+    """
+    metrics = current()
+    if metrics is not None:
+        metrics.record(name, elapsed)
+
+def reset():
+    """Stop tracking all metrics for this thread
+
+    Call this at the start of a new request, in case an earlier request
+    didn't call stop().
+    """
+    _local.stack = []
+
+class InstrumentedCursor(object):
+    def __init__(self, cursor, metrics):
+        self.cursor = cursor
+        self.metrics = metrics
+
+    def execute(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return self.cursor.execute(*args, **kwargs)
+        finally:
+            self.metrics.record('db', time.time() - start)
+
+    def executemany(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return self.cursor.executemany(*args, **kwargs)
+        finally:
+            self.metrics.record('db', time.time() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+def _patch_db():
+    orig_cursor = BaseDatabaseWrapper.cursor
+    @functools.wraps(orig_cursor)
+    def cursor(self):
+        cursor = orig_cursor(self)
+        metrics = current()
+        if metrics is None:
+            return cursor
+        return InstrumentedCursor(cursor, metrics)
+    BaseDatabaseWrapper.cursor = cursor
+
+def _make_cache_wrapper(orig_method):
+    @functools.wraps(orig_method)
+    def wrapper(*args, **kwargs):
+        metrics = current()
+        if metrics is None:
+            return orig_method(*args, **kwargs)
+        start = time.time()
+        try:
+            return orig_method(*args, **kwargs)
+        finally:
+            metrics.record('cache', time.time() - start)
+    return wrapper
+
+def _patch_cache():
+    for name in CACHE_METHODS:
+        setattr(cache, name, _make_cache_wrapper(getattr(cache, name)))
+
+def _patch_celery():
+    orig_apply_async = Task.apply_async
+    @functools.wraps(orig_apply_async)
+    def apply_async(self, *args, **kwargs):
+        metrics = current()
+        if metrics is None:
+            return orig_apply_async(self, *args, **kwargs)
+        start = time.time()
+        try:
+            return orig_apply_async(self, *args, **kwargs)
+        finally:
+            metrics.record('celery_enqueue', time.time() - start)
+    Task.apply_async = apply_async
+
+def install():
+    """Patch the DB connections, cache, and celery to track metrics
+
+    It's safe to call this multiple times.
+    """
+    global _installed
+    if _installed:
+        return
+    _patch_db()
+    _patch_cache()
+    _patch_celery()
+    _installed = True
+
+class Histogram(object):
+    """Count values using a fixed list of buckets
+
+    Histograms are simple to merge, which lets us combine the data from
+    different processes.
+    """
+    def __init__(self, buckets, counts=None):
+        self.buckets = buckets
+        if counts is None:
+            counts = [0] * (len(buckets) + 1)
+        self.counts = counts
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    def merge(self, counts):
+        if len(counts) == len(self.counts):
+            for i, count in enumerate(counts):
+                self.counts[i] += count
+
+    def total(self):
+        return sum(self.counts)
+
+    def percentile(self, percent):
+        """Estimate a percentile
+
+        Returns:
+            upper bound of the bucket that contains the percentile.  If the
+            percentile is in the overflow bucket, returns float('inf').
+            Returns None if there are no values.
+        """
+        total = self.total()
+        if total == 0:
+            return None
+        target = int(math.ceil(total * percent / 100.0))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                break
+        if i < len(self.buckets):
+            return self.buckets[i]
+        else:
+            return float('inf')
+
+def _aggregate_value(name, data):
+    value = data.get(name, 0)
+    if name.endswith('_time') or name == 'time':
+        # convert to milliseconds
+        value *= 1000
+    return value
+
+class Aggregator(object):
+    """Aggregates metrics data for views/tasks."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = time.time()
+
+    def add(self, name, data):
+        with self.lock:
+            if name not in self.pending:
+                self.pending[name] = dict(
+                    (metric, Histogram(buckets))
+                    for metric, buckets in AGGREGATE_METRICS)
+            histograms = self.pending[name]
+            for metric, buckets in AGGREGATE_METRICS:
+                histograms[metric].add(_aggregate_value(metric, data))
+            need_flush = time.time() - self.last_flush >= FLUSH_INTERVAL
+        if need_flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.last_flush = time.time()
+        if not pending:
+            return
+        keys = dict((name, _aggregate_key(name)) for name in pending)
+        current_data = cache.get_many(keys.values() + [AGGREGATE_NAMES_KEY])
+        to_set = {}
+        for name, histograms in pending.items():
+            stored = current_data.get(keys[name]) or {}
+            for metric, histogram in histograms.items():
+                if metric in stored:
+                    histogram.merge(stored[metric])
+            to_set[keys[name]] = dict(
+                (metric, histogram.counts)
+                for metric, histogram in histograms.items())
+        names = set(current_data.get(AGGREGATE_NAMES_KEY) or [])
+        names.update(pending)
+        to_set[AGGREGATE_NAMES_KEY] = names
+        cache.set_many(to_set, AGGREGATE_TIMEOUT)
+
+aggregator = Aggregator()
+
+def _aggregate_key(name):
+    return 'metrics-aggregate:{}'.format(name)
+
+def get_aggregates():
+    """Get percentiles for the aggregated metrics
+
+    Returns:
+        dict mapping view/task names to dicts that map metric names to
+        {'count': <sample count>, 'p50': value, 'p90': value, 'p99': value}
+        Times are in milliseconds.
+    """
+    names = cache.get(AGGREGATE_NAMES_KEY) or []
+    keys = dict((name, _aggregate_key(name)) for name in names)
+    stored = cache.get_many(keys.values())
+    rv = {}
+    for name in names:
+        data = stored.get(keys[name])
+        if data is None:
+            continue
+        rv[name] = {}
+        for metric, buckets in AGGREGATE_METRICS:
+            histogram = Histogram(buckets)
+            histogram.merge(data.get(metric, []))
+            info = {'count': histogram.total()}
+            for percent in PERCENTILES:
+                info['p{}'.format(percent)] = histogram.percentile(percent)
+            rv[name][metric] = info
+    return rv
+
+def reset_aggregates():
+    names = cache.get(AGGREGATE_NAMES_KEY) or []
+    cache.delete_many([_aggregate_key(name) for name in names] +
+                      [AGGREGATE_NAMES_KEY])
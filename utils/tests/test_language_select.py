@@ -0,0 +1,60 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django import forms
+from django.test import TestCase
+from nose.tools import *
+
+from utils.forms import LanguageSelect, LanguageSelectMultiple
+from utils.translation import get_language_choices
+
+class LanguageSelectTest(TestCase):
+    def setUp(self):
+        self.choices = get_language_choices(with_empty=True)
+
+    def check_render(self, widget, django_widget, value):
+        assert_equal(widget.render('lang', value),
+                     django_widget.render('lang', value))
+
+    def test_render(self):
+        widget = LanguageSelect(choices=self.choices)
+        django_widget = forms.Select(choices=self.choices)
+        # render twice to test both the uncached and cached code paths
+        for i in range(2):
+            self.check_render(widget, django_widget, None)
+            self.check_render(widget, django_widget, 'en')
+            self.check_render(widget, django_widget, 'fr')
+
+    def test_render_multiple(self):
+        widget = LanguageSelectMultiple(choices=self.choices)
+        django_widget = forms.SelectMultiple(choices=self.choices)
+        for i in range(2):
+            self.check_render(widget, django_widget, [])
+            self.check_render(widget, django_widget, ['en', 'fr'])
+
+    def test_choices_change(self):
+        widget = LanguageSelect(choices=self.choices)
+        widget.render('lang', 'en')
+        widget.choices = [('', '---------'), ('en', 'English')]
+        self.check_render(widget, forms.Select(choices=widget.choices), 'en')
+
+    def test_unhashable_choices(self):
+        choices = [('', '---------'),
+                   ('Group', [['en', 'English'], ['fr', 'French']])]
+        widget = LanguageSelect(choices=choices)
+        self.check_render(widget, forms.Select(choices=choices), 'en')
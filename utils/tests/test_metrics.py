@@ -0,0 +1,97 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2016 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from auth.models import CustomUser as User
+from utils import metrics
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.install()
+
+    def tearDown(self):
+        metrics.stop()
+
+    def test_metrics(self):
+        metrics.start()
+        list(User.objects.all())
+        cache.set('foo', 'bar')
+        cache.get('foo')
+        data = metrics.stop()
+        self.assertEqual(data['db_count'], 1)
+        self.assertEqual(data['cache_count'], 2)
+        self.assertEqual(set(data.keys()), set([
+            'db_count', 'db_time', 'cache_count', 'cache_time', 'time',
+        ]))
+
+    def test_record(self):
+        metrics.record('foo', 0.5)
+        metrics.start()
+        metrics.record('foo', 0.25)
+        metrics.record('foo', 0.5)
+        data = metrics.stop()
+        self.assertEqual(data['foo_count'], 2)
+        self.assertEqual(data['foo_time'], 0.75)
+
+    def test_inactive(self):
+        list(User.objects.all())
+        cache.get('foo')
+        self.assertEqual(metrics.current(), None)
+        self.assertEqual(metrics.stop(), {})
+
+    def test_nested(self):
+        metrics.start()
+        cache.get('foo')
+        metrics.start()
+        cache.get('foo')
+        cache.get('foo')
+        self.assertEqual(metrics.stop()['cache_count'], 2)
+        cache.get('foo')
+        self.assertEqual(metrics.stop()['cache_count'], 2)
+
+class AggregateTest(TestCase):
+    def test_histogram(self):
+        histogram = metrics.Histogram([1, 10, 100])
+        self.assertEqual(histogram.percentile(50), None)
+        for value in [0, 1, 5, 5, 50, 50, 50, 50, 50, 500]:
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 2, 5, 1])
+        self.assertEqual(histogram.percentile(20), 1)
+        self.assertEqual(histogram.percentile(50), 100)
+        self.assertEqual(histogram.percentile(99), float('inf'))
+
+    def test_aggregate(self):
+        aggregator = metrics.Aggregator()
+        aggregator.add('view', {'time': 0.015, 'db_count': 3})
+        aggregator.add('view', {'time': 0.150, 'db_count': 3})
+        aggregator.flush()
+        aggregator.add('view', {'time': 0.150, 'db_count': 30})
+        aggregator.flush()
+        aggregates = metrics.get_aggregates()
+        self.assertEqual(aggregates.keys(), ['view'])
+        self.assertEqual(aggregates['view']['time'], {
+            'count': 3, 'p50': 200, 'p90': 200, 'p99': 200,
+        })
+        self.assertEqual(aggregates['view']['db_count'], {
+            'count': 3, 'p50': 5, 'p90': 50, 'p99': 50,
+        })
+        self.assertEqual(aggregates['view']['cache_count']['p50'], 0)
+        metrics.reset_aggregates()
+        self.assertEqual(metrics.get_aggregates(), {})
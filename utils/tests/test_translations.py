@@ -36,3 +36,22 @@ def test_babel_language_lookup_unique():
     if duplicate_languages:
         raise AssertionError("Duplicate language lookups: {}".format(
             duplicate_languages))
+
+def test_get_language_choices_returns_new_lists():
+    choices = translation.get_language_choices()
+    choices[0][1].append(('xx', 'Not a language'))
+    choices.append(('yy', 'Not a language'))
+    flat_choices = translation.get_language_choices(flat=True)
+    flat_choices.sort(reverse=True)
+    assert translation.get_language_choices() == [
+        (label, list(items))
+        for label, items in translation.get_language_choice_table()
+    ]
+    assert (translation.get_language_choices(flat=True) ==
+            list(translation.get_language_choice_table()[1][1]))
+
+def test_get_language_choices_filtering():
+    choices = translation.get_language_choices(flat=True,
+                                               limit_to=['en', 'fr', 'de'],
+                                               exclude=['fr'])
+    assert [code for code, label in choices] == ['de', 'en']
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import copy
 import json
 import os
 import time
@@ -69,7 +68,7 @@ def _only_supported_languages(language_codes):
     # TODO: Figure out the codec issue here.
     return [code for code in language_codes if code in SUPPORTED_LANGUAGE_CODES]
 
-_get_language_choices_cache = {}
+_language_choice_tables = {}
 def get_language_choices(with_empty=False, with_any=False, flat=False,
                          top_section=None, limit_to=None, exclude=None):
     """Get a list of language choices
@@ -92,17 +91,12 @@ def get_language_choices(with_empty=False, with_any=False, flat=False,
         exclude: exclude choices from the list of language codes
     """
 
-    language_code = get_language()
-    try:
-        languages = _get_language_choices_cache[language_code]
-    except KeyError:
-        languages = calc_language_choices(language_code)
-        _get_language_choices_cache[language_code] = languages
-
-    # make a copy of languages before we alter it
-    languages = copy.deepcopy(languages)
-    if top_section:
-        languages[0] = top_section
+    sections = get_language_choice_table()
+    if flat:
+        # only the "All" section is used for flat lists
+        sections = sections[1:]
+    elif top_section:
+        sections = (top_section,) + sections[1:]
     if limit_to or exclude:
         if limit_to is not None:
             limit_to = set(limit_to)
@@ -110,17 +104,42 @@ def get_language_choices(with_empty=False, with_any=False, flat=False,
             limit_to = set(SUPPORTED_LANGUAGE_CODES)
         if exclude is not None:
             limit_to = limit_to.difference(exclude)
-        def filter_optgroup(og):
-            return (og[0], [item for item in og[1] if item[0] in limit_to])
-        languages = [filter_optgroup(o) for o in languages]
+        languages = [
+            (label, [item for item in choices if item[0] in limit_to])
+            for label, choices in sections
+        ]
+    else:
+        # The table is shared between calls, so build new lists for our
+        # callers to alter.  The (code, label) tuples inside are immutable
+        # and don't need to be copied.
+        languages = [(label, list(choices)) for label, choices in sections]
     if flat:
-        languages = languages[1][1]
+        languages = languages[0][1]
     if with_any:
         languages.insert(0, ('', _('--- Any Language ---')))
     if with_empty:
         languages.insert(0, ('', '---------'))
     return languages
 
+def get_language_choice_table(language_code=None):
+    """Get the precomputed language choices for a locale
+
+    This returns the same data as calc_language_choices(), but as nested
+    tuples so that it can be shared between calls.  Use
+    get_language_choices() to get a list that you can alter.
+    """
+    if language_code is None:
+        language_code = get_language()
+    try:
+        return _language_choice_tables[language_code]
+    except KeyError:
+        table = tuple(
+            (label, tuple(choices))
+            for label, choices in calc_language_choices(language_code)
+        )
+        _language_choice_tables[language_code] = table
+        return table
+
 def calc_language_choices(language_code):
     """Do the work for get_language_choices() """
     languages = []